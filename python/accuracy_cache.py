@@ -0,0 +1,52 @@
+"""
+Version-keyed memoization for model accuracy results.
+
+Every model type has a dataset version, bumped whenever its labeled data
+changes, and a model version, bumped whenever its weights are replaced. An
+accuracy computed for one (dataset version, model version) pair stays valid
+until either counter moves, so repeat lookups cost O(1) and invalidation is
+exact.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class VersionCounters:
+    """
+    Monotonic per-key version counters.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self.versions: Dict[str, int] = {key: 0 for key in keys}
+
+    def get(self, key: str) -> int:
+        return self.versions.get(key, 0)
+
+    def bump(self, key: str) -> int:
+        self.versions[key] = self.get(key) + 1
+        return self.versions[key]
+
+    def bump_all(self) -> None:
+        for key in self.versions:
+            self.bump(key)
+
+
+class VersionedCache:
+    """
+    Cache holding one value per name, valid only for the version it was stored with.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[Hashable, Any]] = {}
+
+    def get(self, name: str, version: Hashable) -> Optional[Any]:
+        """
+        Return the value cached for `name` if it was stored for `version`, else None.
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def put(self, name: str, version: Hashable, value: Any) -> None:
+        self.entries[name] = (version, value)
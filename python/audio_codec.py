@@ -0,0 +1,104 @@
+"""
+Decoding of binary PCM audio sent by clients.
+
+Clips can be sent as raw little-endian PCM bytes (`application/octet-stream`)
+or as base64 text inside JSON, instead of a JSON list of floats. Float32 PCM is
+viewed in place with `np.frombuffer`, so no per-sample parsing or copying takes
+place; int16 PCM needs a single vectorized conversion to float32.
+"""
+
+import base64
+import binascii
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Supported PCM sample encodings; all are little-endian
+PCM_DTYPES: Dict[str, np.dtype] = {
+    "float32": np.dtype("<f4"),
+    "int16": np.dtype("<i2"),
+}
+
+# Scale that maps int16 PCM onto [-1.0, 1.0)
+INT16_SCALE = 1.0 / 32768.0
+
+
+def decode_pcm(payload: bytes, encoding: str = "float32") -> np.ndarray:
+    """
+    Decode raw little-endian PCM bytes into a 1-D float32 waveform.
+
+    Raises
+    ------
+    ValueError
+        If the encoding is unknown or the payload is not a whole number of samples.
+    """
+    if encoding not in PCM_DTYPES:
+        raise ValueError(
+            f"Unsupported audio encoding {encoding!r}, expected one of {sorted(PCM_DTYPES)}"
+        )
+    dtype = PCM_DTYPES[encoding]
+    if len(payload) == 0 or len(payload) % dtype.itemsize != 0:
+        raise ValueError(
+            f"Audio payload of {len(payload)} bytes is not a whole number of {encoding} samples"
+        )
+
+    samples = np.frombuffer(payload, dtype=dtype)
+    if encoding == "int16":
+        return samples.astype(np.float32) * np.float32(INT16_SCALE)
+    return samples.astype(np.float32, copy=False)
+
+
+def decode_base64_pcm(text: str, encoding: str = "float32") -> np.ndarray:
+    """
+    Decode base64-encoded little-endian PCM into a 1-D float32 waveform.
+
+    Raises
+    ------
+    ValueError
+        If the text is not valid base64 or does not decode to valid PCM.
+    """
+    try:
+        payload = base64.b64decode(text, validate=True)
+    except binascii.Error as error:
+        raise ValueError(f"Audio payload is not valid base64: {error}") from error
+    return decode_pcm(payload, encoding)
+
+
+def decode_float_list(raw_audio: List[float]) -> np.ndarray:
+    """
+    Convert a JSON list of floats into a 1-D float32 waveform.
+
+    Raises
+    ------
+    ValueError
+        If the list is empty, nested, or holds something other than numbers.
+    """
+    try:
+        waveform = np.asarray(raw_audio, dtype=np.float32)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Audio samples must be a list of numbers: {error}") from error
+    if waveform.ndim != 1 or waveform.size == 0:
+        raise ValueError(f"Audio samples must be a non-empty flat list, got shape {waveform.shape}")
+    return waveform
+
+
+def decode_audio_fields(
+    raw_audio: Optional[List[float]],
+    raw_audio_b64: Optional[str],
+    encoding: str = "float32",
+) -> np.ndarray:
+    """
+    Decode a clip sent either as a JSON list of floats (`raw_audio`) or as base64
+    PCM (`raw_audio_b64`). Exactly one of the two must be given.
+
+    Raises
+    ------
+    ValueError
+        If neither or both fields are given, or the given one is not a valid,
+        non-empty clip.
+    """
+    if (raw_audio is None) == (raw_audio_b64 is None):
+        raise ValueError("Exactly one of `raw_audio` or `raw_audio_b64` must be provided")
+    if raw_audio_b64 is not None:
+        return decode_base64_pcm(raw_audio_b64, encoding)
+    return decode_float_list(raw_audio)
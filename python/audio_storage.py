@@ -0,0 +1,118 @@
+"""
+Compact storage format for raw audio in MongoDB.
+
+Instead of a BSON array of doubles (9+ bytes per sample), `raw_audio` is stored
+as a small header plus one BSON binary blob of packed samples:
+
+    "raw_audio": {
+        "format": 1,
+        "dtype": "int16",          # "int16", "float16" or "float32"
+        "scale": 0.0000305,        # int16 only: sample = int16 value * scale
+        "sample_rate": 44100,
+        "num_samples": 22050,
+        "compression": "zlib",     # "none", "zlib" or "zstd"
+        "data": Binary(...),
+    }
+
+int16 samples are scaled by the clip's own peak, so quiet and loud clips both
+use the full 16-bit range. zstd compression requires the optional `zstandard`
+package. Documents written before this format (plain arrays) are still decoded.
+"""
+
+import zlib
+from typing import Any, Dict, List, Union
+
+import numpy as np
+from bson.binary import Binary
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+AUDIO_STORAGE_FORMAT = 1
+
+# Supported storage dtypes; all are stored little-endian
+STORAGE_DTYPES: Dict[str, np.dtype] = {
+    "int16": np.dtype("<i2"),
+    "float16": np.dtype("<f2"),
+    "float32": np.dtype("<f4"),
+}
+
+COMPRESSIONS = ("none", "zlib", "zstd")
+
+
+def _compress(payload: bytes, compression: str) -> bytes:
+    if compression == "none":
+        return payload
+    if compression == "zlib":
+        return zlib.compress(payload, 1)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd audio compression requires the `zstandard` package")
+        return zstandard.ZstdCompressor().compress(payload)
+    raise ValueError(f"Unsupported audio compression {compression!r}, expected one of {COMPRESSIONS}")
+
+
+def _decompress(payload: bytes, compression: str) -> bytes:
+    if compression == "none":
+        return payload
+    if compression == "zlib":
+        return zlib.decompress(payload)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd audio compression requires the `zstandard` package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unsupported audio compression {compression!r}, expected one of {COMPRESSIONS}")
+
+
+def encode_stored_audio(
+    waveform: np.ndarray,
+    sample_rate: int,
+    dtype: str = "int16",
+    compression: str = "zlib",
+) -> Dict[str, Any]:
+    """
+    Encode a 1-D waveform into the compact `raw_audio` sub-document.
+
+    Raises
+    ------
+    ValueError
+        If `dtype` or `compression` is not supported.
+    """
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unsupported audio storage dtype {dtype!r}, expected one of {sorted(STORAGE_DTYPES)}")
+
+    waveform = np.asarray(waveform, dtype=np.float32).ravel()
+    document: Dict[str, Any] = {
+        "format": AUDIO_STORAGE_FORMAT,
+        "dtype": dtype,
+        "sample_rate": sample_rate,
+        "num_samples": int(waveform.size),
+        "compression": compression,
+    }
+
+    if dtype == "int16":
+        peak = float(np.max(np.abs(waveform))) if waveform.size else 0.0
+        scale = peak / 32767 if peak > 0 else 1.0
+        samples = np.round(waveform / scale).astype(STORAGE_DTYPES[dtype])
+        document["scale"] = scale
+    else:
+        samples = waveform.astype(STORAGE_DTYPES[dtype])
+
+    document["data"] = Binary(_compress(samples.tobytes(), compression))
+    return document
+
+
+def decode_stored_audio(raw_audio: Union[Dict[str, Any], List[float]]) -> np.ndarray:
+    """
+    Decode a stored `raw_audio` value, compact or legacy list, into a float32 waveform.
+    """
+    if not isinstance(raw_audio, dict):
+        return np.asarray(raw_audio, dtype=np.float32)
+
+    payload = _decompress(bytes(raw_audio["data"]), raw_audio["compression"])
+    samples = np.frombuffer(payload, dtype=STORAGE_DTYPES[raw_audio["dtype"]])
+    if raw_audio["dtype"] == "int16":
+        return samples.astype(np.float32) * np.float32(raw_audio["scale"])
+    return samples.astype(np.float32)
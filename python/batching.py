@@ -0,0 +1,250 @@
+"""
+Dynamic micro-batching for single-clip prediction requests.
+
+Concurrent `/predict_one/` requests for the same model are collected for a few
+milliseconds (or until `max_batch_size` requests are waiting) and run through
+the model as one batch, and each request then receives its own result.
+
+Batches run on an `InferenceExecutor`, a thread pool with a bounded backlog, so
+model compute never blocks the event loop, and requests beyond the backlog are
+turned away at once (`Overloaded`) instead of queueing without limit.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import PREDICTION_BATCH_SIZE
+
+# A batch prediction function maps a stacked array of inputs with shape
+# (batch_size, ...) to one prediction per row
+BatchPredictFunction = Callable[[np.ndarray], Sequence[Any]]
+
+
+def predict_grouped(
+    predict_batch: BatchPredictFunction,
+    items: Sequence[np.ndarray],
+    max_batch_size: int,
+) -> List[Any]:
+    """
+    Run `predict_batch` over `items`, stacking items of equal shape into batches
+    of at most `max_batch_size`. Clips of different lengths cannot share a batch,
+    so each distinct shape is predicted separately.
+
+    A batch that raises does not fail the others: each of its items gets the
+    exception in place of a prediction.
+
+    Returns
+    -------
+    List[Any]
+        One prediction (or exception) per item, in the order of `items`.
+    """
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(np.shape(item), []).append(index)
+
+    predictions: List[Any] = [None] * len(items)
+    for indices in groups.values():
+        for start in range(0, len(indices), max_batch_size):
+            chunk = indices[start:start + max_batch_size]
+            try:
+                batch_predictions = predict_batch(np.stack([items[i] for i in chunk]))
+            except Exception as error:
+                batch_predictions = [error] * len(chunk)
+            for index, prediction in zip(chunk, batch_predictions):
+                predictions[index] = prediction
+    return predictions
+
+
+class Overloaded(Exception):
+    """
+    Raised when an `InferenceExecutor` already holds as much work as it may queue.
+    """
+
+
+class InferenceExecutor:
+    """
+    Thread pool that runs inference off the event loop, with a bounded backlog.
+
+    Work is admitted in items (clips): `reserve` fails fast with `Overloaded`
+    once `max_queued` items are waiting or running, rather than letting the
+    backlog, and the latency of every request in it, grow without bound. A
+    single request larger than `max_queued` is admitted only into an empty
+    backlog. `reserve` and `release` must be called from the event loop.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of batches run at the same time.
+    max_queued : int
+        Most items waiting or running at once.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queued: int = 128):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.queued = 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+
+    def reserve(self, n_items: int = 1) -> None:
+        """
+        Admit `n_items` items into the backlog.
+
+        Raises
+        ------
+        Overloaded
+            If the backlog has no room for them.
+        """
+        if self.queued and self.queued + n_items > self.max_queued:
+            raise Overloaded(f"{self.queued} of at most {self.max_queued} items are queued for inference")
+        self.queued += n_items
+
+    def release(self, n_items: int = 1) -> None:
+        self.queued -= n_items
+
+    async def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run `function(*args)` on the pool and wait for its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item predictions and runs them as one batch.
+
+    Parameters
+    ----------
+    predict_batch : BatchPredictFunction
+        Function that predicts a stacked batch of inputs.
+    max_batch_size : int
+        A batch is run as soon as this many requests are waiting.
+    max_wait_ms : float
+        Longest time the first request of a batch waits for others to arrive.
+    name : str
+        Label of this batcher's metrics.
+    executor : Optional[InferenceExecutor]
+        Pool the batches run on, and whose backlog bounds the requests waiting
+        here. Without one, batches run on the event loop.
+    """
+
+    def __init__(
+        self,
+        predict_batch: BatchPredictFunction,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "default",
+        executor: Optional[InferenceExecutor] = None,
+    ):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.executor = executor
+        self.pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.running_batches = 0
+
+    async def predict(self, item: np.ndarray) -> Any:
+        """
+        Queue `item` for the next batch and wait for its prediction.
+
+        Raises
+        ------
+        Overloaded
+            If the executor's backlog is full.
+        """
+        if self.executor is not None:
+            self.executor.reserve()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.pending.append((item, future))
+
+            if len(self.pending) >= self.max_batch_size:
+                self.flush()
+            elif self.flush_handle is None:
+                self.flush_handle = loop.call_later(self.max_wait_ms / 1000, self.flush)
+
+            return await future
+        finally:
+            if self.executor is not None:
+                self.executor.release()
+
+    def flush(self) -> None:
+        """
+        Run every pending request as a batch and fan the results back out.
+
+        While every executor thread is busy with this batcher's earlier batches,
+        requests keep collecting and go out together once one finishes, so
+        batches grow with the load.
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        if not self.pending:
+            return
+        if self.executor is not None and self.running_batches >= self.executor.max_workers:
+            return
+
+        batch, self.pending = self.pending, []
+        items = [item for item, _ in batch]
+        PREDICTION_BATCH_SIZE.observe(len(items), batcher=self.name)
+
+        if self.executor is not None:
+            self.running_batches += 1
+            batch_future = self.executor.executor.submit(
+                predict_grouped, self.predict_batch, items, self.max_batch_size
+            )
+            loop = asyncio.get_running_loop()
+            batch_future.add_done_callback(
+                lambda done: loop.call_soon_threadsafe(self._finish_batch, batch, done)
+            )
+            return
+
+        try:
+            # Run outside the context of whichever request triggered the flush,
+            # so the batch's timing spans are not charged to that request alone
+            predictions = contextvars.Context().run(
+                predict_grouped, self.predict_batch, items, self.max_batch_size
+            )
+        except Exception as error:
+            self._fail(batch, error)
+            return
+        self._resolve(batch, predictions)
+
+    def _finish_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]], done: Future) -> None:
+        self.running_batches -= 1
+        error = asyncio.CancelledError() if done.cancelled() else done.exception()
+        if error is not None:
+            self._fail(batch, error)
+        else:
+            self._resolve(batch, done.result())
+
+        # Requests that arrived while the executor was busy go out right away
+        if self.pending:
+            self.flush()
+
+    @staticmethod
+    def _resolve(batch: List[Tuple[np.ndarray, asyncio.Future]], predictions: Sequence[Any]) -> None:
+        for (_, future), prediction in zip(batch, predictions):
+            if future.done():
+                continue
+            if isinstance(prediction, Exception):
+                future.set_exception(prediction)
+            else:
+                future.set_result(prediction)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[np.ndarray, asyncio.Future]], error: BaseException) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,436 @@
+#!usr/bin/python
+"""
+Benchmark the serving and training hot paths of the FastAPI server offline.
+
+The server runs in-process against an in-memory MongoDB stand-in
+(`mongomock-motor`, required only for benchmarking) with synthetic audio: a
+sine tone per label plus noise. Requests go through the full ASGI stack with
+`httpx`, and models are written to a temporary directory, never to
+`../ml_models`. Training jobs run in a thread instead of the spawned process
+pool, so that workers can read the in-memory database; retrain times therefore
+exclude process start-up and pickling.
+
+Reported:
+    predict     p50/p95/p99/mean latency and throughput of `/predict_one/`,
+                per model type, clip length and concurrency level
+    batch       cost per clip of the batch prediction function behind the
+                micro-batcher, per batch size, without the HTTP stack
+    retrain     upload-to-trained-model time against dataset size N, and the
+                cold (uncached) and warm cost of `/model_accuracies/`
+
+Clips are sent as base64 float32 PCM by default. Encoding and parsing a JSON
+list of 22050 floats costs more than predicting the clip, which on a single
+core hides most of what micro-batching saves; `--audio-format json` measures
+that path instead.
+
+Results are written as JSON, tagged with the git commit, so runs can be compared
+across commits with `--compare`.
+
+Usage:
+    python benchmark.py [--output benchmark_results.json]
+                        [--clip-samples 4410 22050 44100] [--concurrency 1 8]
+                        [--audio-format base64] [--batch-sizes 1 4 16 32]
+                        [--requests 200] [--retrain-sizes 10 100 1000 10000]
+                        [--model-types "Logistic Regression" "Spectrogram CNN"]
+                        [--compare previous_results.json]
+"""
+
+import argparse
+import asyncio
+import base64
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MODEL_TYPES = ("Logistic Regression", "Spectrogram CNN")
+LABEL_FREQUENCIES = {"Chris": 220.0, "Reece": 330.0}  # Hz of each label's synthetic tone
+SAMPLE_RATE = 44100
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--model-types", nargs="+", default=list(MODEL_TYPES), choices=MODEL_TYPES)
+    parser.add_argument("--clip-samples", type=int, nargs="+", default=[4410, 22050, 44100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--audio-format", default="base64", choices=("base64", "json"),
+                        help="How /predict_one/ clips are sent")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per configuration")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--train-points", type=int, default=20, help="Points trained on before predicting")
+    parser.add_argument("--retrain-sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--retrain-clip-samples", type=int, default=22050)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    return parser.parse_args()
+
+
+# ---------------------------------------------------------------
+# Environment
+# ---------------------------------------------------------------
+
+def load_server(work_dir: str) -> Any:
+    """
+    Import `main` against an in-memory MongoDB, with models stored under `work_dir`.
+    """
+    try:
+        import mongomock
+        import mongomock_motor
+    except ImportError:
+        sys.exit("benchmark.py requires `mongomock-motor`: pip install mongomock-motor")
+    import motor.motor_asyncio
+
+    # One in-memory store, shared by the server's async client and the
+    # synchronous clients that training workers open
+    store = mongomock.MongoClient()
+    motor.motor_asyncio.AsyncIOMotorClient = (
+        lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=store)
+    )
+    import dataset_loader
+    dataset_loader.MongoClient = lambda *args, **kwargs: store
+
+    # `main` keeps models in `../ml_models`, relative to the working directory
+    run_dir = os.path.join(work_dir, "run")
+    os.makedirs(os.path.join(work_dir, "ml_models"))
+    os.makedirs(run_dir)
+    os.chdir(run_dir)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+    main.training_executor = ThreadPoolExecutor(max_workers=1)
+    return main
+
+
+def synthetic_clip(rng: np.random.Generator, label: str, n_samples: int) -> np.ndarray:
+    """
+    A sine tone at the label's frequency with a random phase, plus noise.
+    """
+    t = np.arange(n_samples) / SAMPLE_RATE
+    tone = np.sin(2 * np.pi * LABEL_FREQUENCIES[label] * t + rng.uniform(0, 2 * np.pi))
+    return (0.5 * tone + 0.1 * rng.standard_normal(n_samples)).astype(np.float32)
+
+
+def predict_payload(clip: np.ndarray, model_type: str, audio_format: str) -> Dict[str, Any]:
+    if audio_format == "base64":
+        return {"raw_audio_b64": base64.b64encode(clip.astype("<f4").tobytes()).decode(), "ml_model_type": model_type}
+    return {"raw_audio": clip.tolist(), "ml_model_type": model_type}
+
+
+def latency_summary(latencies: List[float], wall_time: float) -> Dict[str, float]:
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "throughput_rps": round(len(latencies) / wall_time, 2),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------
+
+async def wait_for_job(client: Any, job_id: str) -> Dict[str, Any]:
+    while True:
+        job = (await client.get(f"/training_jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+
+
+async def train_on_synthetic_data(
+    client: Any,
+    rng: np.random.Generator,
+    model_type: str,
+    n_points: int,
+    n_samples: int,
+) -> Dict[str, Any]:
+    """
+    Replace the stored data with `n_points` uploaded clips and wait for the retrain.
+    """
+    await client.delete("/clear_database/")
+    labels = list(LABEL_FREQUENCIES)
+    for index in range(n_points):
+        label = labels[index % len(labels)]
+        response = await client.post("/upload_labeled_datapoint_and_update_model/", json={
+            "raw_audio": synthetic_clip(rng, label, n_samples).tolist(),
+            "audio_label": label,
+            "ml_model_type": model_type,
+        })
+    return await wait_for_job(client, response.json()["job_id"])
+
+
+async def benchmark_predict(
+    client: Any,
+    rng: np.random.Generator,
+    model_type: str,
+    n_samples: int,
+    concurrency: int,
+    n_requests: int,
+    n_warmup: int,
+    audio_format: str,
+) -> Dict[str, Any]:
+    """
+    Time `/predict_one/` requests issued by `concurrency` concurrent clients.
+    """
+    payloads = [
+        predict_payload(synthetic_clip(rng, label, n_samples), model_type, audio_format)
+        for label in LABEL_FREQUENCIES
+    ]
+    for index in range(n_warmup):
+        await client.post("/predict_one/", json=payloads[index % len(payloads)])
+
+    latencies: List[float] = []
+    remaining = iter(range(n_requests))
+
+    async def issue_requests() -> None:
+        for index in remaining:
+            start = time.perf_counter()
+            response = await client.post("/predict_one/", json=payloads[index % len(payloads)])
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(issue_requests() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - start
+
+    return {
+        "model_type": model_type,
+        "clip_samples": n_samples,
+        "concurrency": concurrency,
+        "audio_format": audio_format,
+        "requests": n_requests,
+        **latency_summary(latencies, wall_time),
+    }
+
+
+def benchmark_batch(
+    server: Any,
+    rng: np.random.Generator,
+    model_type: str,
+    n_samples: int,
+    batch_size: int,
+    n_clips: int,
+) -> Dict[str, Any]:
+    """
+    Time the batch prediction function of `model_type` on batches of
+    `batch_size` clips, i.e. the work of one micro-batch.
+    """
+    labels = list(LABEL_FREQUENCIES)
+    batch = np.stack([synthetic_clip(rng, labels[index % len(labels)], n_samples) for index in range(batch_size)])
+    predict_batch = server.prediction_functions[model_type]
+    predict_batch(batch)
+
+    n_batches = max(1, n_clips // batch_size)
+    start = time.perf_counter()
+    for _ in range(n_batches):
+        predict_batch(batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "model_type": model_type,
+        "clip_samples": n_samples,
+        "batch_size": batch_size,
+        "ms_per_clip": round(elapsed * 1000 / (n_batches * batch_size), 3),
+        "clips_per_s": round(n_batches * batch_size / elapsed, 2),
+    }
+
+
+async def benchmark_retrain(
+    server: Any,
+    client: Any,
+    rng: np.random.Generator,
+    model_type: str,
+    n_points: int,
+    n_samples: int,
+) -> Dict[str, Any]:
+    """
+    Time one upload and the retrain it triggers with `n_points` stored data
+    points, then the cold and warm cost of `/model_accuracies/`.
+    """
+    # Seed the database directly; featurizing through the API would dominate
+    await client.delete("/clear_database/")
+    labels = list(LABEL_FREQUENCIES)
+    documents = [
+        server.feature_store.build_document(
+            synthetic_clip(rng, labels[index % len(labels)], n_samples),
+            labels[index % len(labels)],
+            model_type,
+        )
+        for index in range(n_points - 1)
+    ]
+    if documents:
+        await server.db.labeledinstances.insert_many(documents)
+        await server.dataset_counts.add(model_type, [document["audio_label"] for document in documents])
+
+    start = time.perf_counter()
+    response = await client.post("/upload_labeled_datapoint_and_update_model/", json={
+        "raw_audio": synthetic_clip(rng, labels[0], n_samples).tolist(),
+        "audio_label": labels[0],
+        "ml_model_type": model_type,
+    })
+    upload_time = time.perf_counter() - start
+    job = await wait_for_job(client, response.json()["job_id"])
+    trained_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await client.get("/model_accuracies/")
+    accuracy_cold_time = time.perf_counter() - start
+    start = time.perf_counter()
+    await client.get("/model_accuracies/")
+    accuracy_warm_time = time.perf_counter() - start
+
+    return {
+        "model_type": model_type,
+        "n_points": n_points,
+        "clip_samples": n_samples,
+        "job_status": job["status"],
+        "resub_accuracy": job["resub_accuracy"],
+        "upload_request_ms": round(upload_time * 1000, 3),
+        "upload_to_trained_s": round(trained_time, 3),
+        "accuracy_cold_ms": round(accuracy_cold_time * 1000, 3),
+        "accuracy_warm_ms": round(accuracy_warm_time * 1000, 3),
+    }
+
+
+async def run_benchmarks(server: Any, arguments: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    rng = np.random.default_rng(arguments.seed)
+    results: Dict[str, Any] = {"predict": [], "batch": [], "retrain": []}
+
+    for handler in server.app.router.on_startup:
+        result = handler()
+        if inspect.isawaitable(result):
+            await result
+    # Models load in the background after startup; time the benchmarks once they are warm
+    await server.model_loading_task
+    results["cold_start"] = server.model_readiness.describe()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for model_type in arguments.model_types:
+                for n_samples in arguments.clip_samples:
+                    # Train on clips of the length being benchmarked
+                    job = await train_on_synthetic_data(
+                        client, rng, model_type, arguments.train_points, n_samples
+                    )
+                    if job["status"] != "succeeded":
+                        print(f"Skipping {model_type} at {n_samples} samples: {job['error']}")
+                        continue
+                    for concurrency in arguments.concurrency:
+                        result = await benchmark_predict(
+                            client, rng, model_type, n_samples, concurrency,
+                            arguments.requests, arguments.warmup, arguments.audio_format,
+                        )
+                        print(result)
+                        results["predict"].append(result)
+                    for batch_size in arguments.batch_sizes:
+                        result = benchmark_batch(server, rng, model_type, n_samples, batch_size, arguments.requests)
+                        print(result)
+                        results["batch"].append(result)
+
+            for model_type in arguments.model_types:
+                for n_points in arguments.retrain_sizes:
+                    result = await benchmark_retrain(
+                        server, client, rng, model_type, n_points, arguments.retrain_clip_samples
+                    )
+                    print(result)
+                    results["retrain"].append(result)
+    finally:
+        for handler in server.app.router.on_shutdown:
+            result = handler()
+            if inspect.isawaitable(result):
+                await result
+    return results
+
+
+# ---------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """
+    Print the ratio of each timing to the matching entry of an earlier run.
+    """
+    sections = {
+        "predict": (("model_type", "clip_samples", "concurrency"), ("p50_ms", "p95_ms", "p99_ms")),
+        "batch": (("model_type", "clip_samples", "batch_size"), ("ms_per_clip",)),
+        "retrain": (("model_type", "n_points"), ("upload_to_trained_s", "accuracy_cold_ms")),
+    }
+    print(f"Compared with {previous['meta'].get('commit')} (ratio > 1 is slower):")
+    for section, (keys, metrics) in sections.items():
+        earlier = {tuple(entry[key] for key in keys): entry for entry in previous.get(section, [])}
+        for entry in current[section]:
+            match = earlier.get(tuple(entry[key] for key in keys))
+            if match is None:
+                continue
+            ratios = ", ".join(
+                f"{metric} x{entry[metric] / match[metric]:.2f}" for metric in metrics if match[metric]
+            )
+            print(f"  {section} {dict((key, entry[key]) for key in keys)}: {ratios}")
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    output_path = os.path.abspath(arguments.output)
+    compare_path = os.path.abspath(arguments.compare) if arguments.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as work_dir:
+        server = load_server(work_dir)
+        import torch
+        results = asyncio.run(run_benchmarks(server, arguments))
+
+    results["meta"] = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "arguments": vars(arguments),
+        "config": {
+            name: getattr(server, name)
+            for name in (
+                "LOGISTIC_REGRESSION_MODE",
+                "CNN_INFERENCE_VARIANT",
+                "PREDICTION_MAX_BATCH_SIZE",
+                "PREDICTION_MAX_WAIT_MS",
+                "AUDIO_STORAGE_DTYPE",
+                "AUDIO_STORAGE_COMPRESSION",
+            )
+        },
+    }
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Wrote {output_path}")
+
+    if compare_path:
+        with open(compare_path) as compare_file:
+            compare_results(results, json.load(compare_file))
+
+
+if __name__ == "__main__":
+    main()
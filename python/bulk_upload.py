@@ -0,0 +1,184 @@
+"""
+Parsing of bulk uploads of labeled clips.
+
+A bulk upload sends many labeled clips in one request body, which is read as a
+stream, so a session of hundreds of clips never has to be held in memory at
+once. Two formats are accepted:
+
+JSON lines (`application/x-ndjson`): one `DataPoint` JSON object per line,
+exactly as sent to `/upload_labeled_datapoint_and_update_model/`:
+
+    {"raw_audio_b64": "...", "audio_encoding": "int16", "audio_label": "Reece", "ml_model_type": "Spectrogram CNN"}
+
+Binary archive (`application/octet-stream`): a sequence of records, each a
+little-endian uint32 header length, a UTF-8 JSON header, then the clip itself
+as raw little-endian PCM:
+
+    [uint32 header_length][header JSON][n_samples PCM samples]
+
+    header: {"audio_label": "Reece", "ml_model_type": "Spectrogram CNN",
+             "audio_encoding": "int16", "n_samples": 44100}
+
+`audio_encoding` is optional and defaults to "float32".
+"""
+
+import json
+import struct
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+
+import numpy as np
+
+from audio_codec import PCM_DTYPES, decode_audio_fields, decode_pcm
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+ARCHIVE_CONTENT_TYPE = "application/octet-stream"
+
+# Largest accepted archive record header, to reject corrupt length prefixes early
+MAX_HEADER_BYTES = 64 * 1024
+
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+class LabeledClip(NamedTuple):
+    waveform: np.ndarray
+    audio_label: str
+    model_type: str
+
+
+class _StreamReader:
+    """
+    Reads exact byte counts from an async iterator of arbitrarily sized chunks.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks
+        self.buffer = bytearray()
+        self.exhausted = False
+
+    async def _fill(self, size: int) -> None:
+        while len(self.buffer) < size and not self.exhausted:
+            try:
+                self.buffer += await self.chunks.__anext__()
+            except StopAsyncIteration:
+                self.exhausted = True
+
+    async def read_exactly(self, size: int) -> Optional[bytes]:
+        """
+        Return the next `size` bytes, or None at the end of the stream.
+
+        Raises
+        ------
+        ValueError
+            If the stream ends part way through the `size` bytes.
+        """
+        await self._fill(size)
+        if not self.buffer and self.exhausted:
+            return None
+        if len(self.buffer) < size:
+            raise ValueError(f"Body ended {size - len(self.buffer)} bytes short of a complete record")
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def read_line(self) -> Optional[bytes]:
+        """
+        Return the next line without its line break, or None at the end of the stream.
+        """
+        while True:
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self.buffer[:end])
+                del self.buffer[:end + 1]
+                return line
+            if self.exhausted:
+                if not self.buffer:
+                    return None
+                line = bytes(self.buffer)
+                self.buffer.clear()
+                return line
+            await self._fill(len(self.buffer) + 1)
+
+
+def _required_field(record: Dict[str, Any], name: str) -> Any:
+    if not isinstance(record.get(name), str):
+        raise ValueError(f"Missing string field {name!r}")
+    return record[name]
+
+
+async def read_ndjson_clips(chunks: AsyncIterator[bytes]) -> AsyncIterator[LabeledClip]:
+    """
+    Decode the labeled clips of a JSON lines body. Blank lines are skipped.
+
+    Raises
+    ------
+    ValueError
+        If a line is not a valid data point; the message names the line.
+    """
+    reader = _StreamReader(chunks)
+    line_number = 0
+    while True:
+        line = await reader.read_line()
+        if line is None:
+            return
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+            waveform = decode_audio_fields(
+                record.get("raw_audio"),
+                record.get("raw_audio_b64"),
+                record.get("audio_encoding", "float32"),
+            )
+            yield LabeledClip(
+                waveform, _required_field(record, "audio_label"), _required_field(record, "ml_model_type")
+            )
+        except (ValueError, TypeError) as error:
+            raise ValueError(f"Line {line_number}: {error}") from None
+
+
+async def read_archive_clips(chunks: AsyncIterator[bytes]) -> AsyncIterator[LabeledClip]:
+    """
+    Decode the labeled clips of a binary archive body.
+
+    Raises
+    ------
+    ValueError
+        If a record is truncated or its header is invalid; the message names the record.
+    """
+    reader = _StreamReader(chunks)
+    record_number = 0
+    while True:
+        record_number += 1
+        try:
+            prefix = await reader.read_exactly(_HEADER_LENGTH.size)
+            if prefix is None:
+                return
+            (header_length,) = _HEADER_LENGTH.unpack(prefix)
+            if not 0 < header_length <= MAX_HEADER_BYTES:
+                raise ValueError(f"Header length {header_length} is out of range")
+            header = json.loads(await reader.read_exactly(header_length) or b"")
+            if not isinstance(header, dict):
+                raise ValueError("Expected a JSON object header")
+
+            encoding = header.get("audio_encoding", "float32")
+            if encoding not in PCM_DTYPES:
+                raise ValueError(
+                    f"Unsupported audio encoding {encoding!r}, expected one of {sorted(PCM_DTYPES)}"
+                )
+            n_samples = header.get("n_samples")
+            if not isinstance(n_samples, int) or n_samples <= 0:
+                raise ValueError("Missing positive integer field 'n_samples'")
+
+            payload = await reader.read_exactly(n_samples * PCM_DTYPES[encoding].itemsize)
+            if payload is None:
+                raise ValueError("Body ended before the record's audio")
+            yield LabeledClip(
+                decode_pcm(payload, encoding),
+                _required_field(header, "audio_label"),
+                _required_field(header, "ml_model_type"),
+            )
+        except (ValueError, TypeError) as error:
+            raise ValueError(f"Record {record_number}: {error}") from None
@@ -0,0 +1,92 @@
+"""
+Incrementally maintained counts of labeled data points.
+
+Counting the data points of every (model type, label) pair with a `$group`
+aggregation scans the whole `labeledinstances` collection. Instead, a small
+`datasetcounts` collection holds one counter document per pair,
+
+    {"_id": {"model_type": "Spectrogram CNN", "audio_label": "Reece"}, "count": 42}
+
+which every insert and delete updates with an atomic `$inc`. Reading the
+counts then costs one tiny query, whatever the size of the dataset. Counters
+are rebuilt from the labeled data once if they are missing (e.g. for a
+database that predates them), or on request if they ever drift.
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+class DatasetCounts:
+    """
+    Per (model type, label) counts of the labeled data points.
+
+    Parameters
+    ----------
+    collection : AsyncIOMotorCollection
+        The `datasetcounts` collection holding the counters.
+    instances : AsyncIOMotorCollection
+        The `labeledinstances` collection being counted.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, instances: AsyncIOMotorCollection):
+        self.collection = collection
+        self.instances = instances
+
+    async def add(self, model_type: str, audio_labels: Iterable[str], sign: int = 1) -> None:
+        """
+        Count newly inserted data points of `model_type` with the given labels
+        (or, with `sign=-1`, deleted ones).
+        """
+        for audio_label, count in Counter(audio_labels).items():
+            await self.collection.update_one(
+                {"_id": {"model_type": model_type, "audio_label": audio_label}},
+                {"$inc": {"count": sign * count}},
+                upsert=True,
+            )
+
+    async def remove(self, model_type: str, audio_labels: Iterable[str]) -> None:
+        await self.add(model_type, audio_labels, sign=-1)
+
+    async def clear(self) -> None:
+        await self.collection.delete_many({})
+
+    async def counts(self) -> List[Dict[str, Any]]:
+        """
+        Return the non-zero counts, sorted by model type and label.
+        """
+        cursor = self.collection.find({"count": {"$gt": 0}})
+        counts = [
+            {**document["_id"], "count": document["count"]}
+            async for document in cursor
+        ]
+        return sorted(counts, key=lambda count: (count["model_type"], count["audio_label"]))
+
+    async def rebuild(self) -> None:
+        """
+        Recount every (model type, label) pair with a full aggregation over the
+        labeled data, covered by the `model_type`/`audio_label` index.
+        """
+        cursor = self.instances.aggregate([
+            {"$group": {
+                "_id": {"model_type": "$model_type", "audio_label": "$audio_label"},
+                "count": {"$sum": 1},
+            }},
+        ])
+        groups = await cursor.to_list(length=None)
+        await self.collection.delete_many({
+            "_id": {"$nin": [group["_id"] for group in groups]},
+        })
+        for group in groups:
+            await self.collection.update_one(
+                {"_id": group["_id"]}, {"$set": {"count": group["count"]}}, upsert=True
+            )
+
+    async def ensure_initialized(self) -> None:
+        """
+        Rebuild the counters if there are labeled data points but no counters.
+        """
+        if await self.collection.find_one({}) is None and await self.instances.find_one({}, {"_id": 1}) is not None:
+            await self.rebuild()
@@ -0,0 +1,131 @@
+"""
+Streaming export of the labeled dataset.
+
+Documents are read from a MongoDB cursor one batch at a time and written to the
+response as they arrive, so the server's memory use does not grow with the
+size of the export. Two formats are produced:
+
+NDJSON (`application/x-ndjson`): one JSON object per clip, in the same shape
+`/upload_labeled_datapoints_bulk/` accepts, so an export can be uploaded again:
+
+    {"id": "...", "audio_label": "Reece", "ml_model_type": "Spectrogram CNN",
+     "sample_rate": 44100, "audio_encoding": "float32", "raw_audio_b64": "..."}
+
+NPZ (`application/zip`): a NumPy `.npz` archive written in chunks of up to
+`chunk_size` clips. Clips of a chunk are packed end to end into one float32
+array, with `offsets` marking where each clip starts and ends:
+
+    chunk_000000/audio        float32, all samples of the chunk
+    chunk_000000/offsets      int64, clip i is audio[offsets[i]:offsets[i + 1]]
+    chunk_000000/labels       str
+    chunk_000000/model_types  str
+    chunk_000000/ids          str
+    chunk_000001/...
+
+Read it with `np.load(path)`, one chunk at a time.
+"""
+
+import base64
+import json
+import zipfile
+from typing import Any, AsyncIterator, Dict, List
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+from audio_storage import decode_stored_audio
+
+# Number of NDJSON lines written to the response together
+NDJSON_LINES_PER_WRITE = 64
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "npz": ("application/zip", "npz"),
+}
+
+
+def _stored_sample_rate(document: Dict[str, Any], default: int) -> int:
+    raw_audio = document["raw_audio"]
+    return raw_audio.get("sample_rate", default) if isinstance(raw_audio, dict) else default
+
+
+async def export_ndjson(cursor: AsyncIOMotorCursor, sample_rate: int = 44100) -> AsyncIterator[bytes]:
+    """
+    Yield the documents of `cursor` as NDJSON, `NDJSON_LINES_PER_WRITE` lines at a time.
+    """
+    lines: List[bytes] = []
+    async for document in cursor:
+        waveform = decode_stored_audio(document["raw_audio"])
+        lines.append(json.dumps({
+            "id": str(document["_id"]),
+            "audio_label": document["audio_label"],
+            "ml_model_type": document["model_type"],
+            "sample_rate": _stored_sample_rate(document, sample_rate),
+            "audio_encoding": "float32",
+            "raw_audio_b64": base64.b64encode(waveform.astype("<f4").tobytes()).decode("ascii"),
+        }).encode() + b"\n")
+        if len(lines) >= NDJSON_LINES_PER_WRITE:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+class _ByteSink:
+    """
+    Write-only, unseekable file object that collects what `zipfile` writes
+    until it is drained into the response.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _write_chunk(archive: zipfile.ZipFile, index: int, documents: List[Dict[str, Any]]) -> None:
+    waveforms = [decode_stored_audio(document["raw_audio"]) for document in documents]
+    offsets = np.zeros(len(waveforms) + 1, dtype=np.int64)
+    np.cumsum([len(waveform) for waveform in waveforms], out=offsets[1:])
+    arrays = {
+        "audio": np.concatenate(waveforms).astype(np.float32, copy=False),
+        "offsets": offsets,
+        "labels": np.array([document["audio_label"] for document in documents]),
+        "model_types": np.array([document["model_type"] for document in documents]),
+        "ids": np.array([str(document["_id"]) for document in documents]),
+    }
+    for name, array in arrays.items():
+        with archive.open(f"chunk_{index:06d}/{name}.npy", "w", force_zip64=True) as member:
+            np.lib.format.write_array(member, array, allow_pickle=False)
+
+
+async def export_npz(cursor: AsyncIOMotorCursor, chunk_size: int = 256) -> AsyncIterator[bytes]:
+    """
+    Yield the documents of `cursor` as a chunked `.npz` archive, one chunk of
+    up to `chunk_size` clips at a time.
+    """
+    sink = _ByteSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        documents: List[Dict[str, Any]] = []
+        index = 0
+        async for document in cursor:
+            documents.append(document)
+            if len(documents) >= chunk_size:
+                _write_chunk(archive, index, documents)
+                documents = []
+                index += 1
+                yield sink.drain()
+        if documents:
+            _write_chunk(archive, index, documents)
+    # Closing the archive writes its central directory
+    yield sink.drain()
@@ -0,0 +1,251 @@
+"""
+Streaming, bounded-memory loading of stored features from MongoDB.
+
+Instead of materializing a whole collection with `cursor.to_list(length=None)`
+and stacking every spectrogram into one tensor, training and evaluation read
+documents through a batched cursor and decode features on the fly. A small,
+bounded prefetch queue overlaps database reads with compute, and an optional
+shuffle buffer replaces full-dataset shuffling. Peak memory therefore depends
+on the batch, prefetch and shuffle-buffer sizes, not on the size of the dataset.
+
+- `MongoFeatureDataset` is a synchronous `IterableDataset` for use in training
+  worker processes, which open their own connection with pymongo.
+- `stream_feature_batches` is an async generator over the server's Motor
+  collection, for evaluation on the event loop.
+"""
+
+import asyncio
+import random
+import threading
+from queue import Empty, Full, Queue
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import MongoClient
+from torch.utils.data import IterableDataset
+
+from feature_store import decode_features
+
+# Fields read by every feature scan; raw audio is never transferred
+FEATURE_PROJECTION = {"audio_label": 1, "features": 1}
+
+_END_OF_STREAM = object()
+
+# How often a blocked prefetch thread checks whether its consumer has gone away
+PREFETCH_POLL_INTERVAL_S = 0.1
+
+
+def prefetch(items: Iterable[Any], size: int) -> Iterator[Any]:
+    """
+    Iterate over `items` in a background thread, keeping at most `size` items
+    buffered ahead of the consumer.
+
+    If the consumer stops early (a `break`, an exception, or the generator being
+    closed or collected), the thread stops too and closes `items`, so a partial
+    iteration leaks neither the thread nor an open cursor.
+    """
+    queue: Queue = Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=PREFETCH_POLL_INTERVAL_S)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_END_OF_STREAM)
+        except Exception as error:
+            put(error)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = queue.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue right away
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+
+
+def shuffle_buffer(items: Iterable[Any], size: int, rng: random.Random) -> Iterator[Any]:
+    """
+    Approximately shuffle a stream while holding at most `size` items in memory.
+    """
+    buffer: List[Any] = []
+    for item in items:
+        if len(buffer) < size:
+            buffer.append(item)
+            continue
+        index = rng.randrange(size)
+        yield buffer[index]
+        buffer[index] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+class MongoFeatureDataset(IterableDataset):
+    """
+    Streams (features, label index) pairs of one model type from MongoDB.
+
+    Parameters
+    ----------
+    mongo_url : str
+        Connection string of the MongoDB server.
+    database : str
+        Name of the database holding `labeledinstances`.
+    model_type : str
+        Only documents of this model type are read.
+    label_names : Sequence[str]
+        Class names, in class index order.
+    batch_size : int
+        Number of documents fetched from the server per round trip.
+    prefetch_size : int
+        Number of decoded samples buffered ahead of the consumer.
+    shuffle_buffer_size : int
+        Size of the shuffle buffer; `0` reads documents in storage order.
+    instance_ids : Optional[Sequence[Any]]
+        If given, only these documents are read (e.g. one evaluation split).
+    """
+
+    def __init__(
+        self,
+        mongo_url: str,
+        database: str,
+        model_type: str,
+        label_names: Sequence[str],
+        batch_size: int = 64,
+        prefetch_size: int = 256,
+        shuffle_buffer_size: int = 0,
+        instance_ids: Optional[Sequence[Any]] = None,
+    ):
+        super().__init__()
+        self.mongo_url = mongo_url
+        self.database = database
+        self.model_type = model_type
+        self.label_indices: Dict[str, int] = {label: index for index, label in enumerate(label_names)}
+        self.instance_ids = list(instance_ids) if instance_ids is not None else None
+        self.batch_size = batch_size
+        self.prefetch_size = prefetch_size
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self.rng = random.Random()
+        self._client: Optional[MongoClient] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections cannot be pickled; each process opens its own
+        state = dict(self.__dict__)
+        state["_client"] = None
+        return state
+
+    def shuffled(self, shuffle_buffer_size: int) -> "MongoFeatureDataset":
+        """
+        Return a copy of this dataset that reads through a shuffle buffer.
+        """
+        dataset = MongoFeatureDataset.__new__(MongoFeatureDataset)
+        dataset.__dict__.update(self.__getstate__())
+        dataset.shuffle_buffer_size = shuffle_buffer_size
+        return dataset
+
+    def _documents(self) -> Iterator[Dict[str, Any]]:
+        if self._client is None:
+            self._client = MongoClient(self.mongo_url)
+        collection = self._client[self.database].labeledinstances
+        query: Dict[str, Any] = {"model_type": self.model_type}
+        if self.instance_ids is not None:
+            query["_id"] = {"$in": self.instance_ids}
+        return iter(collection.find(
+            query,
+            projection=FEATURE_PROJECTION,
+            batch_size=self.batch_size,
+        ))
+
+    def _samples(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        documents = self._documents()
+        try:
+            for document in documents:
+                features = torch.tensor(decode_features(document["features"]))
+                label = torch.tensor(self.label_indices[document["audio_label"]])
+                yield features, label
+        finally:
+            # Free the server-side cursor if iteration stops early
+            close = getattr(documents, "close", None)
+            if close is not None:
+                close()
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        samples = prefetch(self._samples(), self.prefetch_size)
+        if self.shuffle_buffer_size > 0:
+            samples = shuffle_buffer(samples, self.shuffle_buffer_size, self.rng)
+        return samples
+
+
+async def stream_feature_batches(
+    collection: AsyncIOMotorCollection,
+    model_type: str,
+    label_names: Sequence[str],
+    batch_size: int = 32,
+    prefetch_batches: int = 2,
+) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Asynchronously yield (features, label indices) batches of one model type,
+    fetching the next batches from MongoDB while the current one is processed.
+    """
+    label_indices = {label: index for index, label in enumerate(label_names)}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch_batches)
+
+    async def produce() -> None:
+        features: List[np.ndarray] = []
+        labels: List[int] = []
+        try:
+            cursor = collection.find(
+                {"model_type": model_type},
+                projection=FEATURE_PROJECTION,
+                batch_size=batch_size,
+            )
+            async for document in cursor:
+                features.append(decode_features(document["features"]))
+                labels.append(label_indices[document["audio_label"]])
+                if len(features) == batch_size:
+                    await queue.put((np.stack(features), np.array(labels)))
+                    features, labels = [], []
+            if features:
+                await queue.put((np.stack(features), np.array(labels)))
+        except Exception as error:
+            await queue.put(error)
+        await queue.put(_END_OF_STREAM)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
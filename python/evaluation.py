@@ -0,0 +1,215 @@
+"""
+Stratified k-fold and held-out evaluation of the model types.
+
+Resubstitution accuracy scores a model on the data it was trained on, which
+says little about how it does on new clips. An evaluation here trains a fresh
+model per split on the training part only and scores it on the rest:
+
+    "kfold"   -> stratified k-fold: every data point is scored exactly once
+    "holdout" -> one stratified split holding out `holdout_fraction` of the data
+
+Splits are independent, so each runs in its own worker of a process pool
+(the split evaluators are plain top-level functions for that reason). The
+Spectrogram CNN's workers stream the spectrograms of their split from MongoDB,
+like a full retrain does, so memory does not grow with the dataset. The small
+Logistic Regression features of a dataset are written once to `.npy` files by
+`FeatureCache` instead, and every worker memory-maps them.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.model_selection import StratifiedKFold, StratifiedShuffleSplit
+from torch.utils.data import DataLoader
+
+from dataset_loader import MongoFeatureDataset
+from featurizer import CNN_WINDOW_FRAMES, MEL_SPECTROGRAM_PARAMS
+from networks import MelSpectrogramCNN
+from training import retrain_logistic_regression_model
+
+EVALUATION_METHODS = ("kfold", "holdout")
+
+# How the Spectrogram CNN of each split is trained, the way a full retrain does
+CNN_TRAINING_CONFIG: Dict[str, Any] = {
+    "epochs": 5,
+    "learning_rate": 0.001,
+    "batch_size": 32,
+    "shuffle_buffer_size": 1024,
+}
+
+Split = Tuple[np.ndarray, np.ndarray]  # (train indices, test indices)
+
+
+def make_splits(
+    labels: np.ndarray,
+    method: str,
+    n_folds: int = 5,
+    holdout_fraction: float = 0.2,
+    seed: int = 0,
+) -> List[Split]:
+    """
+    Build stratified train/test index splits of `labels`.
+
+    Raises
+    ------
+    ValueError
+        If the method is unknown, or there are too few points of a label to
+        stratify them over the requested splits.
+    """
+    placeholder = np.zeros(len(labels))
+    if method == "kfold":
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    elif method == "holdout":
+        splitter = StratifiedShuffleSplit(n_splits=1, test_size=holdout_fraction, random_state=seed)
+    else:
+        raise ValueError(f"Unknown evaluation method {method!r}, expected one of {EVALUATION_METHODS}")
+    return list(splitter.split(placeholder, labels))
+
+
+def _train_cnn(dataset: MongoFeatureDataset, seed: int) -> MelSpectrogramCNN:
+    """
+    Train a freshly initialized Spectrogram CNN on the features streamed by
+    `dataset`, as configured by `CNN_TRAINING_CONFIG`.
+    """
+    torch.manual_seed(seed)
+    model = MelSpectrogramCNN(n_mels=MEL_SPECTROGRAM_PARAMS["n_mels"], n_frames=CNN_WINDOW_FRAMES)
+    shuffled = dataset.shuffled(CNN_TRAINING_CONFIG["shuffle_buffer_size"])
+    shuffled.rng = random.Random(seed)
+    dataloader = DataLoader(shuffled, batch_size=CNN_TRAINING_CONFIG["batch_size"])
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=CNN_TRAINING_CONFIG["learning_rate"])
+
+    model.train()
+    for epoch in range(CNN_TRAINING_CONFIG["epochs"]):
+        for batch_features, batch_labels in dataloader:
+            loss = criterion(model(batch_features), batch_labels)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+    return model.eval()
+
+
+def evaluate_cnn_split(
+    train_dataset: MongoFeatureDataset,
+    test_dataset: MongoFeatureDataset,
+    seed: int = 0,
+) -> Tuple[int, int]:
+    """
+    Train a fresh Spectrogram CNN on the data points of `train_dataset` and
+    score it on those of `test_dataset`, both streamed from MongoDB in bounded
+    memory.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The number of correctly classified test points, and of test points.
+    """
+    model = _train_cnn(train_dataset, seed)
+    correct, total = 0, 0
+    with torch.inference_mode():
+        for batch_features, batch_labels in DataLoader(test_dataset, batch_size=CNN_TRAINING_CONFIG["batch_size"]):
+            correct += int((model(batch_features).argmax(dim=1) == batch_labels).sum())
+            total += len(batch_labels)
+    return correct, total
+
+
+def evaluate_logistic_regression_split(
+    paths: Tuple[str, str],
+    split: Split,
+    logistic_regression_model: Any,
+) -> Tuple[int, int]:
+    """
+    Train `logistic_regression_model`, an untrained Logistic Regression model
+    of the configured mode, on the training part of `split` and score it on
+    the test part. Features and labels are memory-mapped from the `.npy` files
+    at `paths`.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The number of correctly classified test points, and of test points.
+    """
+    features = np.load(paths[0], mmap_mode="r")
+    labels = np.load(paths[1])
+    train_index, test_index = split
+
+    # Fancy indexing copies only the rows of this split out of the map
+    train_features, test_features = np.asarray(features[train_index]), np.asarray(features[test_index])
+    train_labels, test_labels = labels[train_index], labels[test_index]
+
+    model, _ = retrain_logistic_regression_model(logistic_regression_model, train_features, train_labels)
+    predicted = model.predict(test_features)
+    return int((predicted == test_labels).sum()), len(test_labels)
+
+
+def summarize_splits(results: List[Tuple[int, int]]) -> Dict[str, Any]:
+    """
+    Combine per-split (correct, total) counts into an overall accuracy, the
+    accuracy of every split, and their standard deviation, as percentages.
+    """
+    correct = sum(split_correct for split_correct, _ in results)
+    total = sum(split_total for _, split_total in results)
+    split_accuracies = [100 * split_correct / split_total for split_correct, split_total in results]
+    return {
+        "accuracy": round(100 * correct / total, 1),
+        "split_accuracies": [round(accuracy, 1) for accuracy in split_accuracies],
+        "accuracy_std": round(float(np.std(split_accuracies)), 1),
+        "n_samples": total,
+    }
+
+
+class FeatureCache:
+    """
+    Features and labels of the latest evaluated dataset of each model type,
+    saved as `.npy` files that evaluation workers memory-map.
+
+    Datasets are identified by a fingerprint of their instance ids and
+    featurizer version, so the files are reused until the data changes.
+
+    Parameters
+    ----------
+    directory : Optional[str]
+        Where to keep the files; a new temporary directory by default.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or tempfile.mkdtemp(prefix="evaluation-features-")
+        os.makedirs(self.directory, exist_ok=True)
+        self.entries: Dict[str, Tuple[str, Tuple[str, str]]] = {}
+
+    def get(self, model_type: str, fingerprint: str) -> Optional[Tuple[str, str]]:
+        """
+        Return the feature and label paths cached for `fingerprint`, else None.
+        """
+        entry = self.entries.get(model_type)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def put(self, model_type: str, fingerprint: str, features: np.ndarray, labels: np.ndarray) -> Tuple[str, str]:
+        """
+        Save the features and labels of a dataset, replacing the previous
+        dataset of `model_type`, and return their paths.
+        """
+        prefix = os.path.join(self.directory, f"{model_type.replace(' ', '_')}-{fingerprint}")
+        paths = (f"{prefix}-features.npy", f"{prefix}-labels.npy")
+        np.save(paths[0], np.ascontiguousarray(features))
+        np.save(paths[1], labels)
+
+        previous = self.entries.get(model_type)
+        self.entries[model_type] = (fingerprint, paths)
+        if previous is not None and previous[1] != paths:
+            # Evaluations of a model type run one at a time, so nothing reads them now
+            for path in previous[1]:
+                os.remove(path)
+        return paths
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.entries.clear()
@@ -1,25 +1,19 @@
-# Import CoreML Tools for converting PyTorch to CoreML type
-import coremltools as ct
-
 # Import PyTorch
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-import torchaudio.transforms as T
+
+# Import the featurizer config shared with the server, so that the features
+# computed on the device are defined in one place
+from featurizer import COREML_MEL_SPECTROGRAM_PARAMS, COREML_WINDOW_SAMPLES, build_mel_spectrogram_transform
 
 
 # Create Machine Learning model class
 class MelSpectrogramCNN(nn.Module):
-    def __init__(self, n_mels=256, n_fft=4410, win_length=None, hop_length=200, sample_rate=44100, n_classes=12):
+    def __init__(self, mel_spectrogram_params=COREML_MEL_SPECTROGRAM_PARAMS, n_classes=12, n_samples=COREML_WINDOW_SAMPLES):
         super(MelSpectrogramCNN, self).__init__()
-        # Define Mel Spectrogram layer
-        self.mel_spectrogram = T.MelSpectrogram(
-            sample_rate=sample_rate,
-            n_fft=n_fft,
-            win_length=win_length,
-            hop_length=hop_length,
-            n_mels=n_mels,
-        )
+        # Define Mel Spectrogram layer from the shared featurizer config
+        self.mel_spectrogram = build_mel_spectrogram_transform(mel_spectrogram_params)
         
         # Define a small CNN for demonstration purposes
         self.conv1 = nn.Conv2d(1, 16, kernel_size=3, stride=1, padding=1)
@@ -27,17 +21,11 @@ class MelSpectrogramCNN(nn.Module):
         self.conv3 = nn.Conv2d(32, 64, kernel_size=3, stride=1, padding=1)
         self.pool = nn.MaxPool2d(2, 2)
 
-        # Number of pooling layers
-        num_pool_layers = 3
-
-        # After each pooling layer with kernel size 2, the size is halved
-        # Initial size is [32, 1, 256, 23]
-        conv_output_height = n_mels // (2**num_pool_layers)  # After pooling layers
-        conv_output_width = 23 // (2**num_pool_layers)  # After pooling layers
-        
-        # Calculate the correct number of flattened features after the conv and pooling layers
-        # Number of output channels from the last conv layer is 64
-        flattened_size = 64 * conv_output_height * conv_output_width
+        # Calculate the number of flattened features after the conv and pooling
+        # layers from the input shape, e.g. [1, 1, 256, 23] for 4410 samples
+        with torch.no_grad():
+            mel_spectrogram = self.mel_spectrogram(torch.zeros(1, 1, n_samples))
+            flattened_size = self.conv_features(mel_spectrogram).size(1)
         self.fc1 = nn.Linear(flattened_size, 500)
         self.fc2 = nn.Linear(500, n_classes)
 
@@ -47,21 +35,31 @@ class MelSpectrogramCNN(nn.Module):
 
         # Convert waveform to Mel Spectrogram
         mel_spectrogram = self.mel_spectrogram(waveform)
-        
-        # Pass through CNN layers
+        return self.classify_mel_spectrogram(mel_spectrogram)
+
+    def classify_mel_spectrogram(self, mel_spectrogram):
+        # Pass through CNN layers; also used by `transcribe.py` on Mel
+        # Spectrograms sliced from a whole recording
+        x = self.conv_features(mel_spectrogram)
+        x = F.relu(self.fc1(x))
+        x = self.fc2(x)
+        return x
+
+    def conv_features(self, mel_spectrogram):
         x = self.pool(F.relu(self.conv1(mel_spectrogram)))
         x = self.pool(F.relu(self.conv2(x)))
         x = self.pool(F.relu(self.conv3(x)))
-        
+
         # Flatten the tensor for the fully connected layer
-        x = x.view(x.size(0), -1)
-        x = F.relu(self.fc1(x))
-        x = self.fc2(x)
-        return x
+        return x.view(x.size(0), -1)
 
 
 # Main method for loading CoreML model into its file
 def main() -> None:
+    # Import CoreML Tools for converting PyTorch to CoreML type, only needed here
+    # so that the model class can be imported without it
+    import coremltools as ct
+
     # Load the trained PyTorch model
     model = MelSpectrogramCNN()
     model.load_state_dict(torch.load('./pytorch_model/mel_spectrogram_cnn.pth'))
@@ -71,7 +69,7 @@ def main() -> None:
 
     # Create some dummy input data that matches the model's input shape
     # The input to the MelSpectrogramCNN model is raw audio data
-    dummy_input = torch.rand(1, 4410)  # Batch size of 1, 1 channel, 4410 samples
+    dummy_input = torch.rand(1, COREML_WINDOW_SAMPLES)  # Batch size of 1, COREML_WINDOW_SAMPLES samples
 
     # Trace the model with a dummy input
     traced_model = torch.jit.trace(model, dummy_input)
@@ -0,0 +1,213 @@
+"""
+Feature store for labeled audio instances.
+
+Features are computed once, when a data point is inserted, and are stored next
+to the raw audio in the same MongoDB document under the `features` field:
+
+    {
+        "raw_audio": {...},  # Compact binary audio, see `audio_storage.py`
+        "audio_label": "Reece",
+        "model_type": "Spectrogram CNN",
+        "features": {
+            "version": "3f1c2a9b0d4e",
+            "dtype": "float32",
+            "shape": [1, 128, 44],
+            "data": Binary(...),
+        },
+    }
+
+The `version` is derived from the featurizer parameters (see `featurizer.py`).
+Documents whose features were built with different parameters, or that predate
+the feature store, are rebuilt the next time features for that model are loaded.
+"""
+
+import asyncio
+from typing import Any, Dict, List
+
+import numpy as np
+from bson.binary import Binary
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, UpdateOne
+
+from audio_storage import COMPRESSIONS, STORAGE_DTYPES, decode_stored_audio, encode_stored_audio
+from featurizer import featurize, featurize_batch, featurizer_version
+
+# Number of stale documents featurized together when rebuilding features
+REBUILD_BATCH_SIZE = 64
+
+
+def encode_features(features: np.ndarray, version: str) -> Dict[str, Any]:
+    """
+    Encode a feature array as a BSON-friendly sub-document.
+    """
+    features = np.ascontiguousarray(features)
+    return {
+        "version": version,
+        "dtype": str(features.dtype),
+        "shape": list(features.shape),
+        "data": Binary(features.tobytes()),
+    }
+
+
+def decode_features(document: Dict[str, Any]) -> np.ndarray:
+    """
+    Decode a sub-document produced by `encode_features` back into a NumPy array.
+    """
+    array = np.frombuffer(document["data"], dtype=np.dtype(document["dtype"]))
+    return array.reshape(document["shape"])
+
+
+class FeatureStore:
+    """
+    Reads and writes precomputed features stored on `labeledinstances` documents.
+
+    Parameters
+    ----------
+    collection : AsyncIOMotorCollection
+        The `labeledinstances` collection.
+    sample_rate : int
+        Sample rate recorded in the header of stored audio.
+    audio_dtype : str
+        Storage dtype of raw audio: "int16", "float16" or "float32".
+    audio_compression : str
+        Compression of raw audio: "none", "zlib" or "zstd".
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        sample_rate: int = 44100,
+        audio_dtype: str = "int16",
+        audio_compression: str = "zlib",
+    ):
+        if audio_dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported audio storage dtype {audio_dtype!r}")
+        if audio_compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported audio compression {audio_compression!r}")
+
+        self.collection = collection
+        self.sample_rate = sample_rate
+        self.audio_dtype = audio_dtype
+        self.audio_compression = audio_compression
+
+    def build_document(
+        self,
+        raw_audio: np.ndarray,
+        audio_label: str,
+        model_type: str,
+    ) -> Dict[str, Any]:
+        """
+        Build the document to insert for a new labeled data point, features included.
+        Features are computed from the original waveform, before compact encoding.
+        """
+        return {
+            "raw_audio": encode_stored_audio(
+                raw_audio, self.sample_rate, self.audio_dtype, self.audio_compression
+            ),
+            "audio_label": audio_label,
+            "model_type": model_type,
+            "features": encode_features(
+                featurize(model_type, raw_audio), featurizer_version(model_type)
+            ),
+        }
+
+    def build_documents(
+        self,
+        raw_audios: List[np.ndarray],
+        audio_labels: List[str],
+        model_type: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Same as `build_document` for many data points of one model type, whose
+        features are computed with a single vectorized call.
+        """
+        version = featurizer_version(model_type)
+        return [
+            {
+                "raw_audio": encode_stored_audio(
+                    raw_audio, self.sample_rate, self.audio_dtype, self.audio_compression
+                ),
+                "audio_label": audio_label,
+                "model_type": model_type,
+                "features": encode_features(features, version),
+            }
+            for raw_audio, audio_label, features in zip(
+                raw_audios, audio_labels, featurize_batch(model_type, raw_audios)
+            )
+        ]
+
+    async def ensure_indexes(self) -> None:
+        """
+        Create the indexes the training, accuracy and export queries filter on:
+        model type and label, and model type and feature version (to find stale
+        features). Existing indexes are left as they are.
+        """
+        await self.collection.create_index([("model_type", ASCENDING), ("audio_label", ASCENDING)])
+        await self.collection.create_index([("model_type", ASCENDING), ("features.version", ASCENDING)])
+
+    @staticmethod
+    def build_feature_updates(documents: List[Dict[str, Any]], model_type: str) -> List[UpdateOne]:
+        """
+        Featurize the stored audio of `documents` with a single vectorized call
+        and return the updates that store the new features.
+        """
+        version = featurizer_version(model_type)
+        clips = [decode_stored_audio(document["raw_audio"]) for document in documents]
+        return [
+            UpdateOne({"_id": document["_id"]}, {"$set": {"features": encode_features(features, version)}})
+            for document, features in zip(documents, featurize_batch(model_type, clips))
+        ]
+
+    async def rebuild_stale_features(self, model_type: str) -> int:
+        """
+        Recompute features for every document of `model_type` whose features are
+        missing or were built with a different featurizer version.
+
+        Each cursor batch is featurized on the default executor, so requests
+        keep being served during a rebuild, and written with one `bulk_write`.
+
+        Returns
+        -------
+        int
+            The number of documents that were rebuilt.
+        """
+        version = featurizer_version(model_type)
+        cursor = self.collection.find(
+            {"model_type": model_type, "features.version": {"$ne": version}},
+            projection={"raw_audio": 1},
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+        loop = asyncio.get_running_loop()
+        rebuilt = 0
+        while True:
+            documents = await cursor.to_list(length=REBUILD_BATCH_SIZE)
+            if not documents:
+                return rebuilt
+
+            updates = await loop.run_in_executor(None, self.build_feature_updates, documents, model_type)
+            await self.collection.bulk_write(updates, ordered=False)
+            rebuilt += len(documents)
+
+    async def load_feature_documents(self, model_type: str) -> List[Dict[str, Any]]:
+        """
+        Return the label and current features of every document of `model_type`,
+        rebuilding stale features first. Raw audio is never transferred.
+        """
+        await self.rebuild_stale_features(model_type)
+        cursor = self.collection.find(
+            {"model_type": model_type},
+            projection={"audio_label": 1, "features": 1},
+        )
+        return await cursor.to_list(length=None)
+
+    async def load_feature_documents_by_id(self, instance_ids: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Return the label and features of the given documents only, used for
+        incremental updates on newly inserted data points.
+        """
+        cursor = self.collection.find(
+            {"_id": {"$in": instance_ids}},
+            projection={"audio_label": 1, "features": 1},
+        )
+        return await cursor.to_list(length=None)
@@ -0,0 +1,251 @@
+"""
+Featurizer parameters and helpers used to turn raw audio into model features.
+
+The parameters below are the single source of truth for how features are built,
+on the server and on the device (see `export_to_coreml.py`). Every stored feature
+matrix is tagged with a version string derived from these parameters, so
+changing any of them causes stale features to be rebuilt.
+
+Mel Spectrogram transforms are cached per parameter set, so the window and Mel
+filterbank are computed once per process rather than once per clip.
+"""
+
+import functools
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+import torchaudio.transforms as T
+
+# Parameters for the spectral features used by the Logistic Regression model:
+# the mean power of a clip in `n_bands` log-spaced frequency bands between
+# `f_min` and `f_max` Hz, in decibels. Their size does not depend on the length
+# of the clip, so the model accepts clips of any length.
+SPECTRAL_PARAMS: Dict[str, Any] = {
+    "sample_rate": 44100,
+    "n_bands": 64,
+    "f_min": 50.0,
+    "f_max": 11025.0,
+    "dtype": "float32",
+}
+
+# Parameters for the Mel Spectrogram features used by the Spectrogram CNN
+MEL_SPECTROGRAM_PARAMS: Dict[str, Any] = {
+    "sample_rate": 44100,
+    "n_fft": 2048,  # This can be adjusted based on the desired time resolution
+    "win_length": None,  # Window length, can be set to n_fft by default
+    "hop_length": 512,  # This controls the overlap between frames; adjust as needed
+    "n_mels": 128,  # Number of Mel filters
+}
+
+# Length of the analysis window of the Spectrogram CNN. Clips are cropped or
+# zero-padded to this length before featurization, and the CNN is built for the
+# resulting number of frames. Shorter windows are cheaper and answer sooner at
+# some cost in accuracy; `profile_window_sizes.py` reports the cost of each.
+CNN_WINDOW_MS: float = float(os.environ.get("CNN_WINDOW_MS", "500"))
+CNN_WINDOW_SAMPLES: int = int(round(MEL_SPECTROGRAM_PARAMS["sample_rate"] * CNN_WINDOW_MS / 1000))
+
+# Parameters of the on-device pitch detector exported by `export_to_coreml.py`,
+# which takes 100 ms of raw audio and computes its own Mel Spectrogram
+COREML_MEL_SPECTROGRAM_PARAMS: Dict[str, Any] = {
+    "sample_rate": 44100,
+    "n_fft": 4410,
+    "win_length": None,
+    "hop_length": 200,
+    "n_mels": 256,
+}
+COREML_WINDOW_SAMPLES: int = 4410
+
+FEATURIZER_PARAMS: Dict[str, Dict[str, Any]] = {
+    "Logistic Regression": SPECTRAL_PARAMS,
+    "Spectrogram CNN": {**MEL_SPECTROGRAM_PARAMS, "window_samples": CNN_WINDOW_SAMPLES},
+}
+
+
+def mel_frame_count(n_samples: int) -> int:
+    """
+    Return the number of Mel Spectrogram frames computed for `n_samples` samples.
+    """
+    # `T.MelSpectrogram` centers frames, padding n_fft // 2 samples on each side
+    return 1 + n_samples // MEL_SPECTROGRAM_PARAMS["hop_length"]
+
+
+# Width, in Mel frames, of the Spectrogram CNN input (44 for a 500 ms window)
+CNN_WINDOW_FRAMES: int = mel_frame_count(CNN_WINDOW_SAMPLES)
+
+
+def fit_to_window(waveforms: np.ndarray, window_samples: int = CNN_WINDOW_SAMPLES) -> np.ndarray:
+    """
+    Crop or zero-pad the last axis of `waveforms` to `window_samples` samples,
+    keeping the start of each clip.
+    """
+    n_samples = waveforms.shape[-1]
+    if n_samples >= window_samples:
+        return waveforms[..., :window_samples]
+    padding = [(0, 0)] * (waveforms.ndim - 1) + [(0, window_samples - n_samples)]
+    return np.pad(waveforms, padding)
+
+
+def featurizer_version(model_type: str) -> str:
+    """
+    Return a short, stable version string for the featurizer of `model_type`.
+    """
+    params = {"model_type": model_type, **FEATURIZER_PARAMS[model_type]}
+    encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def build_mel_spectrogram_transform(params: Optional[Dict[str, Any]] = None) -> T.MelSpectrogram:
+    """
+    Create a new Mel Spectrogram transform, by default with MEL_SPECTROGRAM_PARAMS.
+    Use this when the transform becomes part of another module, e.g. for export.
+    """
+    return T.MelSpectrogram(**(params if params is not None else MEL_SPECTROGRAM_PARAMS))
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_mel_spectrogram_transform(params_key: str) -> T.MelSpectrogram:
+    return build_mel_spectrogram_transform(json.loads(params_key))
+
+
+def mel_spectrogram_transform(params: Optional[Dict[str, Any]] = None) -> T.MelSpectrogram:
+    """
+    Return the shared Mel Spectrogram transform for `params` (by default
+    MEL_SPECTROGRAM_PARAMS). It is created once per parameter set and must not
+    be modified.
+    """
+    params = params if params is not None else MEL_SPECTROGRAM_PARAMS
+    return _cached_mel_spectrogram_transform(json.dumps(params, sort_keys=True))
+
+
+@functools.lru_cache(maxsize=32)
+def spectral_band_matrix(n_samples: int) -> np.ndarray:
+    """
+    Return the (n_samples // 2 + 1, n_bands) matrix that averages the power
+    spectrum bins of an `n_samples` clip into the SPECTRAL_PARAMS bands. A band
+    too narrow to hold a bin takes the power at its center frequency,
+    interpolated between the two nearest bins. The matrix must not be modified.
+    """
+    sample_rate: int = SPECTRAL_PARAMS["sample_rate"]
+    n_bands: int = SPECTRAL_PARAMS["n_bands"]
+    n_bins = n_samples // 2 + 1
+
+    edges = np.geomspace(SPECTRAL_PARAMS["f_min"], SPECTRAL_PARAMS["f_max"], n_bands + 1)
+    bin_frequencies = np.fft.rfftfreq(n_samples, d=1 / sample_rate)
+    band_of_bin = np.searchsorted(edges, bin_frequencies, side="right") - 1
+
+    matrix = np.zeros((n_bins, n_bands), dtype=np.float32)
+    for band in range(n_bands):
+        members = np.flatnonzero(band_of_bin == band)
+        if members.size > 0:
+            matrix[members, band] = 1 / members.size
+            continue
+        position = np.sqrt(edges[band] * edges[band + 1]) * n_samples / sample_rate
+        low = min(int(position), n_bins - 1)
+        high = min(low + 1, n_bins - 1)
+        weight = position - int(position)
+        matrix[low, band] += 1 - weight
+        matrix[high, band] += weight
+    matrix.setflags(write=False)
+    return matrix
+
+
+def compute_spectral_features_batch(waveforms: np.ndarray) -> np.ndarray:
+    """
+    Compute the spectral features of a batch of equal-length clips of shape
+    (batch_size, n_samples) for the Logistic Regression model, in one pass.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (batch_size, n_bands).
+    """
+    waveforms = np.asarray(waveforms, dtype=np.float32)
+    n_samples = waveforms.shape[-1]
+    spectrum = np.fft.rfft(waveforms, axis=-1)
+
+    # Power per bin, scaled by the clip length so that it does not depend on it
+    power = (spectrum.real ** 2 + spectrum.imag ** 2) / n_samples
+    band_power = power @ spectral_band_matrix(n_samples)
+    return (10 * np.log10(band_power + 1e-10)).astype(SPECTRAL_PARAMS["dtype"])
+
+
+def compute_spectral_features(raw_audio: Sequence[float]) -> np.ndarray:
+    """
+    Compute the spectral features of a single clip, of shape (n_bands,).
+    """
+    waveform = np.asarray(raw_audio, dtype=np.float32).reshape(1, -1)
+    return compute_spectral_features_batch(waveform)[0]
+
+
+def compute_mel_spectrogram_batch(waveforms: np.ndarray) -> np.ndarray:
+    """
+    Compute the Mel Spectrograms of a batch of clips of shape (batch_size, n_samples)
+    in one call, from the first CNN_WINDOW_SAMPLES samples of each clip.
+
+    Returns
+    -------
+    np.ndarray
+        Float32 array of shape (batch_size, 1, n_mels, CNN_WINDOW_FRAMES).
+    """
+    waveforms = fit_to_window(np.asarray(waveforms, dtype=np.float32))
+    with torch.inference_mode():
+        mel_spectrograms = mel_spectrogram_transform()(torch.from_numpy(waveforms))
+    return mel_spectrograms.unsqueeze(1).numpy()
+
+
+def compute_mel_spectrogram_features(raw_audio: Sequence[float]) -> np.ndarray:
+    """
+    Compute a Mel Spectrogram of shape (1, n_mels, CNN_WINDOW_FRAMES) for the
+    Spectrogram CNN, from the first CNN_WINDOW_SAMPLES samples of the clip.
+    """
+    waveform = np.asarray(raw_audio, dtype=np.float32).reshape(1, -1)
+    return compute_mel_spectrogram_batch(waveform)[0]
+
+
+def featurize(model_type: str, raw_audio: Sequence[float]) -> np.ndarray:
+    """
+    Compute the features used by `model_type` for a single clip.
+
+    Raises
+    ------
+    KeyError
+        If no featurizer is registered for `model_type`.
+    """
+    if model_type == "Logistic Regression":
+        return compute_spectral_features(raw_audio)
+    elif model_type == "Spectrogram CNN":
+        return compute_mel_spectrogram_features(raw_audio)
+    raise KeyError(f"No featurizer registered for {model_type}")
+
+
+def featurize_batch(model_type: str, clips: Sequence[np.ndarray]) -> List[np.ndarray]:
+    """
+    Compute the features used by `model_type` for many clips. Mel Spectrograms
+    are computed in a single vectorized call, since every clip is first fitted
+    to the CNN window; spectral features in one call per distinct clip length.
+
+    Raises
+    ------
+    KeyError
+        If no featurizer is registered for `model_type`.
+    """
+    if model_type == "Spectrogram CNN":
+        if len(clips) == 0:
+            return []
+        waveforms = np.stack([fit_to_window(np.asarray(clip, dtype=np.float32)) for clip in clips])
+        return list(compute_mel_spectrogram_batch(waveforms))
+    if model_type == "Logistic Regression":
+        lengths: Dict[int, List[int]] = {}
+        for index, clip in enumerate(clips):
+            lengths.setdefault(len(clip), []).append(index)
+        features: List[np.ndarray] = [None] * len(clips)
+        for indices in lengths.values():
+            batch = compute_spectral_features_batch(np.stack([clips[i] for i in indices]))
+            for index, clip_features in zip(indices, batch):
+                features[index] = clip_features
+        return features
+    return [featurize(model_type, clip) for clip in clips]
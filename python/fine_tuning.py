@@ -0,0 +1,144 @@
+"""
+Incremental fine-tuning state for the Spectrogram CNN.
+
+In "finetune" mode a CNN upload no longer retrains on the whole dataset. The
+worker takes a few optimizer steps on the new points mixed with a bounded,
+class-balanced replay buffer of earlier points (see
+`training.fine_tune_pytorch_model`), so the cost of an update does not grow with
+the dataset. `CnnFineTuningState` lives in the training process's event loop and
+keeps the replay buffer, a running accuracy estimate, and when the next full
+retrain is due.
+"""
+
+import random
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class ReplayBuffer:
+    """
+    Bounded, class-balanced sample of stored instance ids.
+
+    Every label gets an equal share of `capacity`, filled by reservoir sampling,
+    so each share is a uniform sample of the instances seen with that label.
+
+    Parameters
+    ----------
+    capacity : int
+        Most instance ids held in total.
+    labels : Sequence[str]
+        All labels.
+    seed : Optional[int]
+        Seed of the sampling, for reproducible buffers.
+    """
+
+    def __init__(self, capacity: int, labels: Sequence[str], seed: Optional[int] = None):
+        self.capacity_per_label = max(1, capacity // len(labels))
+        self.reservoirs: Dict[str, List[Any]] = {label: [] for label in labels}
+        self.seen: Dict[str, int] = {label: 0 for label in labels}
+        self.rng = random.Random(seed)
+
+    def add(self, instance_id: Any, label: str) -> None:
+        reservoir = self.reservoirs[label]
+        if instance_id in reservoir:
+            # Uploads stored while a full retrain ran are in its refill already
+            return
+        self.seen[label] += 1
+        if len(reservoir) < self.capacity_per_label:
+            reservoir.append(instance_id)
+            return
+        slot = self.rng.randrange(self.seen[label])
+        if slot < self.capacity_per_label:
+            reservoir[slot] = instance_id
+
+    def clear(self) -> None:
+        for label in self.reservoirs:
+            self.reservoirs[label] = []
+            self.seen[label] = 0
+
+    def instance_ids(self) -> List[Any]:
+        return [instance_id for reservoir in self.reservoirs.values() for instance_id in reservoir]
+
+    def __len__(self) -> int:
+        return sum(len(reservoir) for reservoir in self.reservoirs.values())
+
+
+class CnnFineTuningState:
+    """
+    Replay buffer, running accuracy and full-retrain schedule of the CNN.
+
+    The running accuracy is prequential, as in `OnlineLogisticRegression`:
+    each new point is scored before the model is fine-tuned on it. It is reset
+    to the resubstitution accuracy of every full retrain.
+
+    Parameters
+    ----------
+    replay_capacity : int
+        Size of the replay buffer.
+    labels : Sequence[str]
+        All labels.
+    full_retrain_interval : int
+        Number of fine-tunes after which the next update is a full retrain.
+        `0` disables periodic full retrains.
+    """
+
+    def __init__(self, replay_capacity: int, labels: Sequence[str], full_retrain_interval: int = 0):
+        self.replay = ReplayBuffer(replay_capacity, labels)
+        self.full_retrain_interval = full_retrain_interval
+        self.fine_tunes_since_full_retrain = 0
+        self.has_baseline = False
+        self.correct = 0
+        self.seen = 0
+
+    def reset(self) -> None:
+        """
+        Forget the replay buffer and running accuracy, e.g. after the data was
+        cleared, so that the next update is a full retrain.
+        """
+        self.replay.clear()
+        self.fine_tunes_since_full_retrain = 0
+        self.has_baseline = False
+        self.correct = 0
+        self.seen = 0
+
+    def needs_full_retrain(self) -> bool:
+        """
+        Whether the next update should be a full retrain instead of a fine-tune:
+        before the first full retrain of this process, or once the interval is up.
+        """
+        if not self.has_baseline:
+            return True
+        return 0 < self.full_retrain_interval <= self.fine_tunes_since_full_retrain
+
+    def record_full_retrain(self, accuracy: float, instances: Iterable[Tuple[Any, str]]) -> None:
+        """
+        Restart the running accuracy from a full retrain's resubstitution
+        `accuracy`, and refill the replay buffer from all (id, label) `instances`.
+        """
+        self.replay.clear()
+        for instance_id, label in instances:
+            self.replay.add(instance_id, label)
+        self.seen = sum(self.replay.seen.values())
+        self.correct = round(accuracy / 100 * self.seen)
+        self.fine_tunes_since_full_retrain = 0
+        self.has_baseline = True
+
+    def record_fine_tune(self, correct: int, instances: Sequence[Tuple[Any, str]]) -> float:
+        """
+        Count the new points scored before a fine-tune, add them to the replay
+        buffer, and return the running accuracy.
+        """
+        self.correct += correct
+        self.seen += len(instances)
+        for instance_id, label in instances:
+            self.replay.add(instance_id, label)
+        self.fine_tunes_since_full_retrain += 1
+        return self.accuracy
+
+    @property
+    def accuracy(self) -> float:
+        """
+        Running accuracy as a percentage.
+        """
+        if self.seen == 0:
+            return 0.0
+        return 100 * self.correct / self.seen
@@ -0,0 +1,181 @@
+"""
+Compiled CPU inference for the Spectrogram CNN.
+
+A trained `MelSpectrogramCNN` is served as one of three variants:
+
+- "eager": the PyTorch module itself, in `eval()` mode under `inference_mode`.
+- "float": a TorchScript graph, frozen (weights folded in as constants) and
+  passed through `torch.jit.optimize_for_inference`.
+- "int8":  the same, after dynamic int8 quantization of the Linear layers. `fc1`
+  holds almost all of the weights, so this shrinks the model about 4x. It is
+  only served if its predictions agree with the float model on a parity set.
+
+Building a variant also measures its single-request latency against the eager
+model, so the speedup on the serving hardware can be reported.
+"""
+
+import copy
+import io
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+INFERENCE_VARIANTS = ("eager", "float", "int8")
+
+
+@dataclass
+class InferenceModel:
+    """
+    A model prepared for serving, with the measurements taken while preparing it.
+    """
+    module: Callable[[torch.Tensor], torch.Tensor]
+    variant: str
+    report: Dict[str, Any] = field(default_factory=dict)
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.module(inputs)
+
+
+def compile_model(model: nn.Module, variant: str) -> Callable[[torch.Tensor], torch.Tensor]:
+    """
+    Build the inference module of `variant` from a copy of `model`.
+
+    Raises
+    ------
+    ValueError
+        If `variant` is not one of `INFERENCE_VARIANTS`.
+    """
+    if variant not in INFERENCE_VARIANTS:
+        raise ValueError(f"Unsupported inference variant {variant!r}, expected one of {INFERENCE_VARIANTS}")
+
+    # Never touch the published model, which may be serving or being copied for training
+    model = copy.deepcopy(model).eval()
+    if variant == "eager":
+        return model
+    if variant == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    return torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.script(model)))
+
+
+def serialized_size(module: Callable[[torch.Tensor], torch.Tensor]) -> int:
+    """
+    Return the size in bytes of a module's serialized weights.
+    """
+    buffer = io.BytesIO()
+    if isinstance(module, torch.jit.ScriptModule):
+        torch.jit.save(module, buffer)
+    else:
+        torch.save(module.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+
+def measure_latency_ms(
+    module: Callable[[torch.Tensor], torch.Tensor],
+    inputs: torch.Tensor,
+    repeats: int = 20,
+    warmup: int = 3,
+) -> float:
+    """
+    Return the median latency of `module(inputs)` in milliseconds.
+    """
+    timings = []
+    with torch.inference_mode():
+        for _ in range(warmup):
+            module(inputs)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            module(inputs)
+            timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def check_parity(
+    reference: Callable[[torch.Tensor], torch.Tensor],
+    candidate: Callable[[torch.Tensor], torch.Tensor],
+    inputs: torch.Tensor,
+) -> Dict[str, float]:
+    """
+    Compare the predictions of `candidate` with those of `reference`.
+
+    Returns
+    -------
+    Dict[str, float]
+        `agreement`, the percentage of inputs given the same class,
+        `max_abs_diff`, the largest difference between their outputs, and
+        `samples`, the number of inputs compared.
+    """
+    with torch.inference_mode():
+        reference_outputs = reference(inputs)
+        candidate_outputs = candidate(inputs)
+    agreement = (reference_outputs.argmax(dim=1) == candidate_outputs.argmax(dim=1)).float().mean()
+    return {
+        "agreement": float(agreement * 100),
+        "max_abs_diff": float((reference_outputs - candidate_outputs).abs().max()),
+        "samples": len(inputs),
+    }
+
+
+def prepare_inference_model(
+    model: nn.Module,
+    variant: str,
+    example_input: torch.Tensor,
+    parity_inputs: Optional[torch.Tensor] = None,
+    min_agreement: float = 99.0,
+) -> InferenceModel:
+    """
+    Compile `model` as `variant` and measure it against the eager model.
+
+    An "int8" model whose predictions agree with the float model on fewer than
+    `min_agreement` percent of `parity_inputs` is not used; the "float" variant
+    is returned instead, with the failed parity check in its report.
+
+    Parameters
+    ----------
+    model : nn.Module
+        The trained float model.
+    variant : str
+        One of `INFERENCE_VARIANTS`.
+    example_input : torch.Tensor
+        A single-request input, used to measure latency.
+    parity_inputs : Optional[torch.Tensor]
+        Inputs on which "int8" is compared with the float model. Defaults to
+        `example_input`.
+    min_agreement : float
+        Minimum percentage of matching predictions required to serve "int8".
+
+    Returns
+    -------
+    InferenceModel
+        The module to serve and a report with its variant, latency, speedup
+        over eager, serialized size and (for "int8") parity results.
+    """
+    eager = compile_model(model, "eager")
+    module = compile_model(model, variant)
+    report: Dict[str, Any] = {"requested_variant": variant}
+
+    if variant == "int8":
+        parity = check_parity(eager, module, parity_inputs if parity_inputs is not None else example_input)
+        report["parity"] = parity
+        if parity["agreement"] < min_agreement:
+            report["fallback_reason"] = (
+                f"int8 agreement {parity['agreement']:.1f}% is below {min_agreement:.1f}%"
+            )
+            variant = "float"
+            module = compile_model(model, variant)
+
+    eager_latency = measure_latency_ms(eager, example_input)
+    latency = measure_latency_ms(module, example_input)
+    report.update({
+        "variant": variant,
+        "eager_latency_ms": round(eager_latency, 3),
+        "latency_ms": round(latency, 3),
+        "speedup": round(eager_latency / latency, 2) if latency > 0 else None,
+        "eager_size_bytes": serialized_size(eager),
+        "size_bytes": serialized_size(module),
+    })
+    return InferenceModel(module, variant, report)
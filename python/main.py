@@ -9,26 +9,135 @@ IMPORTS
 =========================================================
 """
 
+# Taken before the heavy imports below, to measure the cold start of the process
+import time
+IMPORT_STARTED_AT = time.perf_counter()
+
 # Imports for managing server access, routing, and database logic
 import uvicorn
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel
 from motor.motor_asyncio import AsyncIOMotorClient
 
 # Imports for handling data and ML model development & execution
 import numpy as np
 from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import LabelEncoder, OneHotEncoder
+from sklearn.preprocessing import LabelEncoder
 import torch
-import torch.nn as nn
-import torch.nn.functional as F 
-from torch.utils.data import DataLoader, TensorDataset
-import torchaudio.transforms as T
+
+# Imports for computing and storing features once per labeled data point
+from feature_store import FeatureStore, decode_features
+from featurizer import (
+    CNN_WINDOW_FRAMES,
+    CNN_WINDOW_SAMPLES,
+    FEATURIZER_PARAMS,
+    MEL_SPECTROGRAM_PARAMS,
+    SPECTRAL_PARAMS,
+    compute_mel_spectrogram_batch,
+    compute_spectral_features_batch,
+    featurizer_version,
+)
+
+# Imports for incrementally updating the Logistic Regression model
+from online_learning import OnlineLogisticRegression
+
+# Imports for streaming stored features in bounded memory
+from dataset_loader import MongoFeatureDataset, stream_feature_batches
+
+# Imports for fine-tuning the CNN on new uploads with a replay buffer
+from fine_tuning import CnnFineTuningState
+
+# Imports for training models in background worker processes
+from networks import MelSpectrogramCNN
+from training import (
+    fine_tune_pytorch_model,
+    initialize_training_worker,
+    retrain_logistic_regression_model,
+    retrain_pytorch_model,
+    update_logistic_regression_model,
+)
+from training_jobs import SharedTrainingJobScheduler, TrainingJob, TrainingJobScheduler
+
+# Imports for batching concurrent prediction requests together
+from batching import InferenceExecutor, MicroBatcher, Overloaded, predict_grouped
+
+# Imports for decoding binary PCM audio payloads
+from audio_codec import decode_audio_fields, decode_base64_pcm, decode_float_list, decode_pcm
+
+# Imports for streamed bulk uploads of labeled clips
+from bulk_upload import (
+    ARCHIVE_CONTENT_TYPE,
+    NDJSON_CONTENT_TYPES,
+    LabeledClip,
+    read_archive_clips,
+    read_ndjson_clips,
+)
+
+# Imports for incremental Mel Spectrograms over streamed audio
+from streaming import StreamingMelSpectrogram
+
+# Imports for versioning, hot-swapping and persisting trained models
+from model_registry import ModelFormat, ModelRegistry, ModelVersion
+
+# Imports for compiled and quantized CNN inference
+from inference import INFERENCE_VARIANTS, InferenceModel, prepare_inference_model
+
+# Imports for hot-path timing spans and Prometheus metrics
+from fastapi.responses import JSONResponse, Response
+from metrics import (
+    CONTENT_TYPE,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    INFERENCE_BACKLOG,
+    PREDICTION_QUEUE_DEPTH,
+    PREDICTIONS,
+    PREDICTIONS_REJECTED,
+    REGISTRY,
+    TRAINING_QUEUE_DEPTH,
+    record_since_request_start,
+    server_timing_header,
+    span,
+    start_request_timing,
+)
+
+# Imports for loading models in the background and reporting readiness
+from readiness import ModelReadiness
+
+# Imports for memoizing accuracy results against data and model versions
+from accuracy_cache import VersionCounters, VersionedCache
+
+# Imports for incrementally maintained dataset counts
+from dataset_counts import DatasetCounts
+
+# Imports for transcribing long recordings with batched sliding windows
+from transcription import transcribe, transcription_hop_frames, transcription_window_count
+
+# Imports for streaming dataset exports
+from bson import ObjectId
+from bson.errors import InvalidId
+from dataset_export import EXPORT_FORMATS, export_ndjson, export_npz
+from fastapi.responses import StreamingResponse
+
+# Imports for parallel k-fold and held-out evaluation
+from evaluation import (
+    CNN_TRAINING_CONFIG,
+    EVALUATION_METHODS,
+    FeatureCache,
+    evaluate_cnn_split,
+    evaluate_logistic_regression_split,
+    make_splits,
+    summarize_splits,
+)
 
 # Standard library imports
+import asyncio
+import hashlib
 import joblib  # To save and load Scikit-Learn models
+import logging
+import multiprocessing
 import os
-from typing import List, Tuple, Dict, Union, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Dict, Union, Any
 
 """
 =========================================================
@@ -39,116 +148,427 @@ GLOBAL VARIABLES, CLASSES, AND NECESSARY CODE BLOCKS TO EXECUTE
 # Initialize FastAPI app
 app = FastAPI()
 
+# Startup, training worker and replica sync messages
+logger = logging.getLogger(__name__)
+
+# MongoDB connection settings, shared with training workers that stream data
+MONGO_URL: str = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DATABASE: str = os.environ.get("MONGO_DATABASE", "mydatabase")
+
 # MongoDB client setup with database name of `mydatabase` 
 mongo_client: AsyncIOMotorClient = (
-    AsyncIOMotorClient("mongodb://localhost:27017")
+    AsyncIOMotorClient(MONGO_URL)
+)
+db = mongo_client[MONGO_DATABASE]
+
+# Storage format of raw audio in MongoDB: dtype ("int16", "float16", "float32")
+# and compression ("none", "zlib", "zstd"). See `audio_storage.py`.
+AUDIO_STORAGE_DTYPE: str = os.environ.get("AUDIO_STORAGE_DTYPE", "int16")
+AUDIO_STORAGE_COMPRESSION: str = os.environ.get("AUDIO_STORAGE_COMPRESSION", "zlib")
+
+# Feature store that keeps precomputed features next to each labeled instance
+feature_store = FeatureStore(
+    db.labeledinstances,
+    sample_rate=MEL_SPECTROGRAM_PARAMS["sample_rate"],
+    audio_dtype=AUDIO_STORAGE_DTYPE,
+    audio_compression=AUDIO_STORAGE_COMPRESSION,
 )
-db = mongo_client.mydatabase
 
-# Declare Logistic Regression model
-logistic_model = LogisticRegression()
+# Counts of data points per model type and label, kept up to date on every
+# insert and delete so that `/data_counts/` never scans the labeled data
+dataset_counts = DatasetCounts(db.datasetcounts, db.labeledinstances)
+
+# Per-model-type versions of the labeled data (bumped on insert and clear).
+# `/model_accuracies/` results are cached against these and the model registry
+# versions, so they are recomputed exactly when data or weights change.
+dataset_versions = VersionCounters(FEATURIZER_PARAMS)
+accuracy_cache = VersionedCache()
+
+# Number of clips of a bulk upload featurized and written with one `insert_many`
+BULK_UPLOAD_BATCH_SIZE: int = int(os.environ.get("BULK_UPLOAD_BATCH_SIZE", "256"))
+
+# Training mode for the Logistic Regression model, selectable per deployment:
+#   "batch"  -> `LogisticRegression.fit` on the full dataset after every upload
+#   "online" -> SGD logistic model updated with `partial_fit` on new points only
+LOGISTIC_REGRESSION_MODE: str = os.environ.get("LOGISTIC_REGRESSION_MODE", "batch")
+
+# In "online" mode, run a full refit every N incremental updates (0 disables)
+LOGISTIC_REGRESSION_REFIT_INTERVAL: int = int(
+    os.environ.get("LOGISTIC_REGRESSION_REFIT_INTERVAL", "0")
+)
 
 # Create a label encoder object
 label_encoder = LabelEncoder()
-one_hot_encoder = OneHotEncoder(sparse_output=False)
 
-# Fit the label encoder and one-hot encoder with the known labels
+# Fit the label encoder with the known labels
 known_labels = np.array(["Chris", "Reece"])
 label_encoder.fit(known_labels)
-one_hot_encoder.fit(known_labels.reshape(-1, 1))
-
-# Specify Mel Spectrogram CNN Architecture
-class MelSpectrogramCNN(nn.Module):
-    def __init__(self, n_mels, n_frames):
-        super(MelSpectrogramCNN, self).__init__()
-        self.conv1 = nn.Conv2d(1, 32, kernel_size=(3, 3), stride=(1, 1), padding=(1, 1))
-        self.conv2 = nn.Conv2d(32, 64, kernel_size=(3, 3), stride=(1, 1), padding=(1, 1))
-        self.pool = nn.MaxPool2d(kernel_size=(2, 2), stride=(2, 2), padding=(1, 1))
-        
-        # Calculate the size of the layer before the fully connected layer
-        # flat_size = 64 * 33 * 12 = 25344
-        self.fc_input_size = 25344 
-        
-        self.fc1 = nn.Linear(self.fc_input_size, 500)
-        self.fc2 = nn.Linear(500, 2)  # 2 classes
 
-    def forward(self, x):
-        x = self.pool(F.relu(self.conv1(x)))
-        x = self.pool(F.relu(self.conv2(x)))
-        # Print the size here to debug
-        flat_size = x.size(1) * x.size(2) * x.size(3) # Correctly calculate the flattened size
-        x = x.view(-1, flat_size)  # Flatten the tensor
-        x = F.relu(self.fc1(x))
-        x = self.fc2(x)
-        return x
+# Training mode for the Spectrogram CNN model, selectable per deployment:
+#   "full"     -> 5 epochs over the full dataset after every upload
+#   "finetune" -> at most CNN_FINETUNE_MAX_STEPS steps on the new points mixed
+#                 with a class-balanced replay buffer of CNN_REPLAY_BUFFER_SIZE
+#                 earlier points, early-stopped on a held-out slice of the buffer
+CNN_TRAINING_MODE: str = os.environ.get("CNN_TRAINING_MODE", "full")
+CNN_REPLAY_BUFFER_SIZE: int = int(os.environ.get("CNN_REPLAY_BUFFER_SIZE", "512"))
+CNN_FINETUNE_MAX_STEPS: int = int(os.environ.get("CNN_FINETUNE_MAX_STEPS", "30"))
+
+# In "finetune" mode, run a full retrain every N fine-tunes (0 disables). A full
+# retrain can also be queued at any time with `/full_retrain/`.
+CNN_FULL_RETRAIN_INTERVAL: int = int(os.environ.get("CNN_FULL_RETRAIN_INTERVAL", "0"))
+cnn_fine_tuning = CnnFineTuningState(
+    CNN_REPLAY_BUFFER_SIZE, list(known_labels), CNN_FULL_RETRAIN_INTERVAL
+)
 
-# Declare Mel Spectogram models and necessary variables
-spectogram_cnn = MelSpectrogramCNN(n_mels=128, n_frames=40)
+# Declare Logistic Regression model
+def new_logistic_regression_model() -> Union[LogisticRegression, OnlineLogisticRegression]:
+    """
+    Create an untrained Logistic Regression model for the configured training mode.
+    """
+    if LOGISTIC_REGRESSION_MODE == "online":
+        return OnlineLogisticRegression(
+            classes=label_encoder.transform(known_labels),
+            refit_interval=LOGISTIC_REGRESSION_REFIT_INTERVAL,
+        )
+    return LogisticRegression()
 
-# Function to load machine learning models from the file system.
-def load_machine_learning_models():
+def fitted_feature_count(model: Union[LogisticRegression, OnlineLogisticRegression]) -> Optional[int]:
     """
-    Function to load machine learning models from the file system.
+    Return the number of features a Logistic Regression model was fitted on,
+    or None if it has not been trained yet.
     """
-    logistic_regression_path = "../ml_models/logistic_regression_model.pkl"
-    mel_spectrogram_cnn_path = "../ml_models/mel_spectrogram_cnn.pth"
+    estimator = model.model if isinstance(model, OnlineLogisticRegression) else model
+    return getattr(estimator, "n_features_in_", None)
 
-    # Load Logistic Regression model if exists, else create a new one
-    if os.path.exists(logistic_regression_path):
-        logistic_model = joblib.load(logistic_regression_path)
-    else:
-        logistic_model = LogisticRegression()
-        joblib.dump(logistic_model, logistic_regression_path)
-
-    # Load Mel Spectrogram CNN model if exists, else create a new one
-    spectogram_cnn = MelSpectrogramCNN(n_mels=128, n_frames=40)  # Create an instance of the model
-    if os.path.exists(mel_spectrogram_cnn_path):
-        state_dict = torch.load(mel_spectrogram_cnn_path)
-        spectogram_cnn.load_state_dict(state_dict)  # Load the state dictionary into the model
-    else:
-        torch.save(spectogram_cnn.state_dict(), mel_spectrogram_cnn_path)    
+# Declare Mel Spectrogram CNN model for the configured analysis window
+def new_spectrogram_cnn() -> MelSpectrogramCNN:
+    """
+    Create an untrained Mel Spectrogram CNN for inputs of CNN_WINDOW_FRAMES frames.
+    """
+    return MelSpectrogramCNN(n_mels=MEL_SPECTROGRAM_PARAMS["n_mels"], n_frames=CNN_WINDOW_FRAMES)
 
-    return {
-        "Logistic Regression": logistic_model, 
-        "Spectrogram CNN": spectogram_cnn, 
-    }
+def load_spectrogram_cnn(path: str) -> MelSpectrogramCNN:
+    """
+    Load Mel Spectrogram CNN weights saved with `torch.save(model.state_dict(), path)`.
 
-# `model_dictionary` is a global dictionary to store machine learning models
-model_dictionary: Dict[str, Union[LogisticRegression, nn.Module]] = (
-    load_machine_learning_models()
+    Raises
+    ------
+    RuntimeError
+        If the weights were trained for a different analysis window.
+    """
+    # Memory-map the checkpoint and use its tensors as the parameters, so only
+    # the pages actually read are loaded, and processes serving the same
+    # version share them through the page cache
+    model = new_spectrogram_cnn()
+    model.load_state_dict(torch.load(path, mmap=True), assign=True)
+    return model.eval()
+
+# Role of this process when several server processes serve the same models:
+#   "standalone" -> trains on its own uploads and serves (a single process)
+#   "trainer"    -> trains on the uploads made to every process and publishes
+#                   each new version to `../ml_models/`; exactly one process
+#   "replica"    -> serves only, following the versions the trainer publishes;
+#                   its uploads are queued in MongoDB for the trainer
+# e.g. one `SERVING_ROLE=trainer uvicorn main:app --port 8001` next to
+# `SERVING_ROLE=replica uvicorn main:app --port 8000 --workers 8`.
+SERVING_ROLES = ("standalone", "trainer", "replica")
+SERVING_ROLE: str = os.environ.get("SERVING_ROLE", "standalone")
+if SERVING_ROLE not in SERVING_ROLES:
+    raise ValueError(f"Unsupported SERVING_ROLE {SERVING_ROLE!r}, expected one of {SERVING_ROLES}")
+
+# How often replicas check for a newly published (or rolled back) version, and
+# the trainer for jobs submitted by replicas
+MODEL_SYNC_INTERVAL_S: float = float(os.environ.get("MODEL_SYNC_INTERVAL_S", "0.5"))
+
+# Versioned registry of the served models. New versions are swapped in
+# atomically after training and saved to `../ml_models/` in the background.
+MODEL_HISTORY_SIZE: int = int(os.environ.get("MODEL_HISTORY_SIZE", "5"))
+model_registry = ModelRegistry(
+    {
+        "Logistic Regression": ModelFormat(
+            "logistic_regression_model.pkl", joblib.dump, joblib.load
+        ),
+        "Spectrogram CNN": ModelFormat(
+            "mel_spectrogram_cnn.pth",
+            lambda model, path: torch.save(model.state_dict(), path),
+            load_spectrogram_cnn,
+        ),
+    },
+    model_dir="../ml_models",
+    max_history=MODEL_HISTORY_SIZE,
+    writable=SERVING_ROLE != "replica",
 )
 
+# Function to load a machine learning model from the file system.
+def load_machine_learning_model(model_type: str) -> None:
+    """
+    Function to load the model of `model_type` from the file system into the
+    model registry, creating (and saving) a new one if none exists. Runs in a
+    background thread after startup (see `load_and_warm_up_models`).
+    """
+    if model_type == "Logistic Regression":
+        logistic_model = model_registry.load(model_type, new_logistic_regression_model).model
+
+        # Start over if the saved model was trained in a different mode than
+        # configured, or on features of another size than the spectral features
+        feature_count = fitted_feature_count(logistic_model)
+        if (
+            isinstance(logistic_model, OnlineLogisticRegression) != (LOGISTIC_REGRESSION_MODE == "online")
+            or feature_count not in (None, SPECTRAL_PARAMS["n_bands"])
+        ):
+            model_registry.publish(model_type, new_logistic_regression_model())
+        return
+
+    # Start over if the saved CNN was built for a different analysis window
+    try:
+        model_registry.load(model_type, lambda: new_spectrogram_cnn().eval())
+    except RuntimeError:
+        model_registry.publish(model_type, new_spectrogram_cnn().eval())
+
+# Models are loaded, compiled and warmed up in the background after startup, so
+# the server accepts connections at once; `/readyz` succeeds once all are ready.
+# A cold start slower than COLD_START_BUDGET_S seconds, from the first import
+# until every model is ready, is reported as over budget.
+COLD_START_BUDGET_S: float = float(os.environ.get("COLD_START_BUDGET_S", "30"))
+model_readiness = ModelReadiness(FEATURIZER_PARAMS, IMPORT_STARTED_AT, COLD_START_BUDGET_S)
+model_loading_task: Optional[asyncio.Task] = None
+
+# How each new Spectrogram CNN version is served: "eager" (PyTorch module),
+# "float" (frozen, optimized TorchScript) or "int8" (dynamic int8 quantization
+# of the Linear layers). "int8" is only served if its predictions agree with the
+# float model on at least CNN_INT8_MIN_AGREEMENT percent of the stored data;
+# otherwise "float" is served. Any retained version can be switched later.
+CNN_INFERENCE_VARIANT: str = os.environ.get("CNN_INFERENCE_VARIANT", "float")
+CNN_INT8_MIN_AGREEMENT: float = float(os.environ.get("CNN_INT8_MIN_AGREEMENT", "99.0"))
+
+# Number of stored spectrograms used for the int8 parity check
+CNN_PARITY_SAMPLES: int = int(os.environ.get("CNN_PARITY_SAMPLES", "256"))
+
+# Number of worker processes used for training, and the PyTorch thread budget
+# of each, so that training never runs on (or starves) the event loop
+TRAINING_WORKERS: int = int(os.environ.get("TRAINING_WORKERS", "1"))
+TRAINING_TORCH_THREADS: int = int(os.environ.get("TRAINING_TORCH_THREADS", "1"))
+
+# Process pool for CPU-bound training. Workers are spawned rather than forked so
+# that they do not inherit PyTorch's thread pools from the serving process.
+training_executor = ProcessPoolExecutor(
+    max_workers=TRAINING_WORKERS,
+    mp_context=multiprocessing.get_context("spawn"),
+    initializer=initialize_training_worker,
+    initargs=(TRAINING_TORCH_THREADS,),
+)
+
+# Number of windows of a `/transcribe/` recording classified in one forward pass
+TRANSCRIPTION_BATCH_SIZE: int = int(os.environ.get("TRANSCRIPTION_BATCH_SIZE", "32"))
+
+# Process pool for `/evaluate_model/`, which trains one model per fold at once.
+# By default there is a worker per core, each with a single PyTorch thread, so
+# the wall-clock time of a k-fold evaluation shrinks with the number of cores.
+EVALUATION_WORKERS: int = int(os.environ.get("EVALUATION_WORKERS", str(os.cpu_count() or 1)))
+evaluation_executor = ProcessPoolExecutor(
+    max_workers=EVALUATION_WORKERS,
+    mp_context=multiprocessing.get_context("spawn"),
+    initializer=initialize_training_worker,
+    initargs=(1,),
+)
+
+# Logistic Regression features of the last evaluated dataset, memory-mapped by
+# the evaluation workers, and one lock per model type so that evaluations of
+# the same model never replace the files under each other
+evaluation_feature_cache = FeatureCache()
+evaluation_locks = {model_type: asyncio.Lock() for model_type in FEATURIZER_PARAMS}
+
+# Micro-batching of concurrent `/predict_one/` requests: a batch runs once it
+# holds PREDICTION_MAX_BATCH_SIZE requests or PREDICTION_MAX_WAIT_MS has passed.
+# With the default of 0, requests that are ready at the same time (e.g. those that
+# arrived while the previous batch ran) still share a batch, but a lone request
+# does not wait for company
+PREDICTION_MAX_BATCH_SIZE: int = int(os.environ.get("PREDICTION_MAX_BATCH_SIZE", "32"))
+PREDICTION_MAX_WAIT_MS: float = float(os.environ.get("PREDICTION_MAX_WAIT_MS", "0"))
+
+# Inference runs off the event loop on INFERENCE_THREADS threads. At most
+# INFERENCE_MAX_QUEUE clips may wait or run at once; beyond that, predictions
+# are refused with a 429 and `Retry-After`, so overload shows up as fast
+# rejections rather than a growing backlog and tail latency.
+INFERENCE_THREADS: int = int(os.environ.get("INFERENCE_THREADS", "1"))
+INFERENCE_MAX_QUEUE: int = int(os.environ.get("INFERENCE_MAX_QUEUE", "128"))
+inference_executor = InferenceExecutor(max_workers=INFERENCE_THREADS, max_queued=INFERENCE_MAX_QUEUE)
+
+# PyTorch thread budget of this process. Every inference thread running an op
+# uses up to this many cores, so it defaults to the cores per inference thread;
+# with several server processes on one machine, divide by their number too.
+INFERENCE_TORCH_THREADS: int = int(
+    os.environ.get("INFERENCE_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // INFERENCE_THREADS)))
+)
+torch.set_num_threads(INFERENCE_TORCH_THREADS)
+
 """
 =========================================================
 PYDANTIC MODELS
 =========================================================
 """
 
+# Clips can be sent either as `raw_audio` (a JSON list of floats, kept for older
+# clients) or as `raw_audio_b64` (base64 little-endian PCM in `audio_encoding`)
+
 class PredictionRequest(BaseModel):
-    raw_audio: List[float] 
+    raw_audio: Optional[List[float]] = None
+    raw_audio_b64: Optional[str] = None
+    audio_encoding: str = "float32"  # "float32", "int16"
     ml_model_type: str  # Model Types: "Logistic Regression", "Spectrogram CNN"
 
 class PredictionResponse(BaseModel):
     audio_prediction: str  # Predictions: "Reece", "Chris"
 
+class BatchPredictionRequest(BaseModel):
+    raw_audio: Optional[List[List[float]]] = None  # One clip per prediction
+    raw_audio_b64: Optional[List[str]] = None  # One clip per prediction
+    audio_encoding: str = "float32"  # "float32", "int16"
+    ml_model_type: str  # Model Types: "Logistic Regression", "Spectrogram CNN"
+
+class BatchPredictionResponse(BaseModel):
+    audio_predictions: List[str]  # One prediction per clip, in request order
+
+class TranscribedNote(BaseModel):
+    label: str
+    start_s: float
+    end_s: float
+    confidence: float  # Mean softmax probability of the label over its windows
+    windows: int
+
+class TranscriptionResponse(BaseModel):
+    notes: List[TranscribedNote]
+    n_windows: int
+    hop_s: float
+    window_s: float
+    duration_s: float
+    seconds: float  # Processing time
+    realtime_factor: Optional[float] = None  # Seconds of audio per second of processing
+
 class DataPoint(BaseModel):
-    raw_audio: List[float]
+    raw_audio: Optional[List[float]] = None
+    raw_audio_b64: Optional[str] = None
+    audio_encoding: str = "float32"  # "float32", "int16"
     audio_label: str  # "Reece", "Chris"
     ml_model_type: str  # "Logistic Regression", "Spectrogram CNN"
 
 class ResubAccuracyResponse(BaseModel):
     resub_accuracy: str
 
+class TrainingJobSubmittedResponse(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "succeeded", "failed"
+    coalesced_uploads: int
+
+class BulkUploadResponse(BaseModel):
+    stored: int
+    jobs: Dict[str, TrainingJobSubmittedResponse]  # Keyed by model type
+
+class TrainingJobResponse(BaseModel):
+    job_id: str
+    model_type: str
+    status: str  # "queued", "running", "succeeded", "failed"
+    coalesced_uploads: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    resub_accuracy: Optional[str] = None
+    update_type: Optional[str] = None  # "incremental", "full"
+    fine_tuning: Optional[Dict[str, Any]] = None  # Steps and held-out loss of a CNN fine-tune
+    error: Optional[str] = None
+
 class ModelAccuraciesResponse(BaseModel):
     spectrogram_cnn_accuracy: str 
     logistic_regression_accuracy: str
 
+class ModelVersionInfo(BaseModel):
+    version: int
+    created_at: float
+    metrics: Dict[str, Any]  # e.g. {"resub_accuracy": 97.5}
+    current: bool
+    inference: Optional[Dict[str, Any]] = None  # Variant, latency and parity report
+
+class InferenceVariantRequest(BaseModel):
+    variant: str  # "eager", "float", "int8"
+    version: Optional[int] = None  # Defaults to the current version
+
+class ModelVersionsResponse(BaseModel):
+    model_type: str
+    versions: List[ModelVersionInfo]  # Newest first
+
+class EvaluationRequest(BaseModel):
+    ml_model_type: str  # "Logistic Regression", "Spectrogram CNN"
+    method: str = "kfold"  # "kfold", "holdout"
+    n_folds: int = 5  # For "kfold"
+    holdout_fraction: float = 0.2  # For "holdout"
+    seed: int = 0
+
+class EvaluationResponse(BaseModel):
+    model_type: str
+    training_config: Dict[str, Any]  # How the model of each split was trained
+    method: str
+    n_folds: int  # 1 for "holdout"
+    holdout_fraction: Optional[float] = None
+    seed: int
+    accuracy: float
+    split_accuracies: List[float]
+    accuracy_std: float
+    n_samples: int  # Data points scored, over all splits
+    seconds: float
+    created_at: float
+    cached: bool
+
+class ModelEvaluationsResponse(BaseModel):
+    model_type: str
+    evaluations: List[EvaluationResponse]  # Newest first
+
+class DataCount(BaseModel):
+    model_type: str
+    audio_label: str
+    count: int
+
+class DataCountsResponse(BaseModel):
+    counts: List[DataCount]
+    totals: Dict[str, int]  # Keyed by model type
+    total: int
+
+class FullRetrainRequest(BaseModel):
+    ml_model_type: str  # "Logistic Regression", "Spectrogram CNN"
+
+class RollbackRequest(BaseModel):
+    ml_model_type: str  # "Logistic Regression", "Spectrogram CNN"
+    version: Optional[int] = None  # Defaults to the version before the current one
+
 """
 =========================================================
 ROUTES
 =========================================================
 """
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Counts and times every HTTP request. A request sent with the header
+    `X-Request-Timing: 1` gets its per-stage timings back in a `Server-Timing`
+    response header, e.g. `predict.parse;dur=41.2, predict.model;dur=6.3`.
+    """
+    timings = start_request_timing(collect=request.headers.get("x-request-timing") == "1")
+    start = time.perf_counter()
+    response = await call_next(request)
+    duration = time.perf_counter() - start
+
+    # Label by route template, e.g. `/training_jobs/{job_id}`, to bound cardinality
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    HTTP_REQUESTS.inc(method=request.method, route=route_path, status=str(response.status_code))
+    HTTP_REQUEST_SECONDS.observe(duration, method=request.method, route=route_path)
+
+    if timings is not None:
+        timings.append(("total", duration))
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
 @app.post("/predict_one/", response_model=PredictionResponse)
 async def predict_one(request: PredictionRequest) -> PredictionResponse:
     """
@@ -156,6 +576,8 @@ async def predict_one(request: PredictionRequest) -> PredictionResponse:
     model associated with the dsid to make a prediction. If the model for the
     given ML is not already loaded, it attempts to load it and make a prediction. 
     If the model cannot be loaded or does not exist, an HTTPException is raised.
+    Concurrent requests for the same model are micro-batched into a single
+    forward pass, which is transparent to the caller.
 
     Parameters
     ----------
@@ -185,64 +607,264 @@ async def predict_one(request: PredictionRequest) -> PredictionResponse:
         "prediction": "Reece"
     }
     """
-    # Load in necessary variables and identify the model that will be used for the
-    # prediction task
-    feature_values = np.array(request.raw_audio)
+    # Time spent reading and validating the JSON body before this route ran
+    record_since_request_start("predict.parse")
+
+    with span("predict.decode"):
+        feature_values = decode_request_audio(
+            lambda: decode_audio_fields(
+                request.raw_audio, request.raw_audio_b64, request.audio_encoding
+            )
+        )
+    return await predict_waveform(feature_values, request.ml_model_type)
+
+
+@app.post("/predict_one_binary/", response_model=PredictionResponse)
+async def predict_one_binary(
+    request: Request,
+    ml_model_type: str,
+    audio_encoding: str = "float32",
+) -> Dict[str, Any]:
+    """
+    Same as `/predict_one/`, but the request body is the clip itself as raw
+    little-endian PCM (`application/octet-stream`), decoded without JSON parsing.
+
+    Example
+    -------
+    POST /predict_one_binary/?ml_model_type=Spectrogram%20CNN&audio_encoding=int16
+    <raw int16 PCM bytes>
+    Response:
+    {
+        "audio_prediction": "Reece"
+    }
+    """
+    record_since_request_start("predict.parse")
+
+    with span("predict.decode"):
+        payload = await request.body()
+        feature_values = decode_request_audio(lambda: decode_pcm(payload, audio_encoding))
+    return await predict_waveform(feature_values, ml_model_type)
+
+
+@app.post("/transcribe/", response_model=TranscriptionResponse)
+async def transcribe_recording(
+    request: Request,
+    audio_encoding: str = "float32",
+    hop_ms: float = 50.0,
+    min_confidence: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Labels a long recording with the Spectrogram CNN, window by window. The
+    request body is the recording as raw little-endian PCM
+    (`application/octet-stream`). Windows start every `hop_ms` milliseconds
+    (rounded to whole Mel frames); the Mel Spectrogram of the recording is
+    computed once and the windows are classified in batches, see
+    `transcription.py`. Consecutive windows with the same label are merged, and
+    windows below `min_confidence` are left out.
+
+    Example
+    -------
+    POST /transcribe/?audio_encoding=int16&hop_ms=50
+    <raw int16 PCM bytes>
+    Response:
+    {
+        "notes": [
+            {"label": "Reece", "start_s": 0.0, "end_s": 4.2, "confidence": 0.97, "windows": 90},
+            ...
+        ],
+        "n_windows": 1290,
+        ...
+    }
+    """
+    require_ready_model("Spectrogram CNN")
+    if hop_ms <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="`hop_ms` must be positive"
+        )
+
+    with span("transcribe.decode"):
+        payload = await request.body()
+        signal = decode_request_audio(lambda: decode_pcm(payload, audio_encoding))
+
+    # Every window counts against the inference backlog like a predicted clip
+    hop_frames = transcription_hop_frames(hop_ms / 1000, MEL_SPECTROGRAM_PARAMS)
+    n_windows = transcription_window_count(len(signal), CNN_WINDOW_SAMPLES, hop_frames, MEL_SPECTROGRAM_PARAMS)
+    try:
+        inference_executor.reserve(n_windows)
+    except Overloaded as error:
+        raise overloaded_error("Spectrogram CNN", error)
+
+    started_at = time.perf_counter()
+    try:
+        with span("transcribe.model"):
+            result = await inference_executor.run(
+                transcribe,
+                signal,
+                served_cnn_model(),
+                list(label_encoder.classes_),
+                MEL_SPECTROGRAM_PARAMS,
+                CNN_WINDOW_SAMPLES,
+                hop_ms / 1000,
+                TRANSCRIPTION_BATCH_SIZE,
+                min_confidence,
+            )
+    finally:
+        inference_executor.release(n_windows)
+    PREDICTIONS.inc(n_windows, model_type="Spectrogram CNN")
+
+    seconds = time.perf_counter() - started_at
+    return {
+        **result,
+        "seconds": round(seconds, 3),
+        "realtime_factor": round(result["duration_s"] / seconds, 1) if seconds > 0 else None,
+    }
+
+
+@app.post("/predict_batch/", response_model=BatchPredictionResponse)
+async def predict_batch(request: BatchPredictionRequest) -> Dict[str, Any]:
+    """
+    Accepts many clips and a ML model type, and predicts all clips in as few
+    batched forward passes as possible. Clips of equal length share a batch.
+
+    Example
+    -------
+    POST /predict_batch/
+    {
+        "raw_audio": [[0.0102, 0.2031, ...], [0.0000123, 0.923231, ...]],
+        "ml_model_type": "Spectrogram CNN"
+    }
+    Response:
+    {
+        "audio_predictions": ["Reece", "Chris"]
+    }
+    """
     model_type: str = request.ml_model_type
-    if model_dictionary.get(model_type) is None:
+    require_ready_model(model_type)
+    if model_registry.get(model_type) is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not load model for {model_type}"
         )
-    
-    if model_type == "Logistic Regression":
-        # Specify logistic regression model
-        model = model_dictionary[model_type]
 
-        # Predict using the feature values and reverse encode the prediction
-        predicted_label_encoded = model.predict(feature_values.reshape(1,-1))
-        audio_prediction = label_encoder.inverse_transform(predicted_label_encoded)
-    
-        # Return the predicted audio
-        return {
-            "audio_prediction": audio_prediction[0] 
-        }
-
-    elif model_type == "Spectrogram CNN":
-        # Convert raw audio data to Mel Spectrogram
-        waveform = torch.tensor(request.raw_audio).float().view(1,-1)
-        mel_spectrogram_transform = T.MelSpectrogram(
-            sample_rate=44100,
-            n_fft=2048,  # This can be adjusted based on the desired time resolution
-            win_length=None,  # Window length, can be set to n_fft by default
-            hop_length=512,  # This controls the overlap between frames; adjust as needed
-            n_mels=128,  # Number of Mel filters
+    if (request.raw_audio is None) == (request.raw_audio_b64 is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exactly one of `raw_audio` or `raw_audio_b64` must be provided"
         )
-        mel_spectrogram = mel_spectrogram_transform(waveform)
+    if request.raw_audio_b64 is not None:
+        clips = [
+            decode_request_audio(lambda: decode_base64_pcm(clip, request.audio_encoding))
+            for clip in request.raw_audio_b64
+        ]
+    else:
+        clips = [decode_request_audio(lambda: decode_float_list(clip)) for clip in request.raw_audio]
+    try:
+        inference_executor.reserve(len(clips))
+    except Overloaded as error:
+        raise overloaded_error(model_type, error)
+    try:
+        with span("predict_batch.model"):
+            audio_predictions = await inference_executor.run(
+                predict_grouped, prediction_functions[model_type], clips, PREDICTION_MAX_BATCH_SIZE
+            )
+    finally:
+        inference_executor.release(len(clips))
+    for prediction in audio_predictions:
+        if isinstance(prediction, Exception):
+            raise prediction
+    PREDICTIONS.inc(len(clips), model_type=model_type)
+    return {"audio_predictions": audio_predictions}
+    
 
-        # Add a channel dimension and pass to the CNN
-        mel_spectrogram = mel_spectrogram.view(1, 1, mel_spectrogram.size(1), mel_spectrogram.size(2))
-        model = model_dictionary[model_type]
+@app.websocket("/stream_predict/")
+async def stream_predict(
+    websocket: WebSocket,
+    audio_encoding: str = "float32",
+    predictions_per_second: float = 10.0,
+):
+    """
+    Streams continuous PCM audio in and Spectrogram CNN predictions out.
 
-        # Predict using the Mel Spectrogram and reverse encode the prediction
-        prediction = model(mel_spectrogram)
-        predicted_label_index = prediction.argmax(dim=1)
-        audio_prediction = known_labels[predicted_label_index.item()]
+    The client sends binary messages of raw little-endian PCM in `audio_encoding`,
+    of any size. Only the STFT/Mel frames completed by each message are computed,
+    and the CNN runs on the most recent `CNN_WINDOW_FRAMES` frames at most
+    `predictions_per_second` times per second of audio. Each prediction is pushed
+    back as a JSON message:
 
-        # Return the predicted audio
-        return {
-            "audio_prediction": audio_prediction 
-        }
-    
+    {
+        "audio_prediction": "Reece",
+        "stream_time": 1.509  # Seconds of audio received when the window ended
+    }
 
-@app.post("/upload_labeled_datapoint_and_update_model/")
+    Payloads that cannot be decoded are answered with {"error": "..."}. A
+    `predictions_per_second` that is not positive is refused with code 1008
+    (policy violation) before the connection is accepted. While the CNN is
+    still loading, the connection is closed with code 1013 (try again later).
+    """
+    if not predictions_per_second > 0:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    if not model_readiness.is_ready("Spectrogram CNN"):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    stream = StreamingMelSpectrogram(MEL_SPECTROGRAM_PARAMS, CNN_WINDOW_FRAMES)
+    sample_rate: int = MEL_SPECTROGRAM_PARAMS["sample_rate"]
+
+    # Number of new Mel frames between two predictions
+    frames_per_second = sample_rate / stream.hop_length
+    frames_per_prediction = max(1, int(round(frames_per_second / predictions_per_second)))
+    frames_since_prediction = frames_per_prediction
+
+    try:
+        while True:
+            payload = await websocket.receive_bytes()
+            try:
+                samples = decode_pcm(payload, audio_encoding)
+            except ValueError as error:
+                await websocket.send_json({"error": str(error)})
+                continue
+
+            frames_since_prediction += stream.push(samples)
+            if not stream.is_full or frames_since_prediction < frames_per_prediction:
+                continue
+            frames_since_prediction = 0
+
+            try:
+                audio_prediction = await stream_batcher.predict(stream.current_window())
+            except Overloaded:
+                # Skip this window; the next one is only a hop away
+                PREDICTIONS_REJECTED.inc(model_type="Spectrogram CNN")
+                await websocket.send_json({"error": "Server is overloaded, prediction skipped"})
+                continue
+            PREDICTIONS.inc(model_type="Spectrogram CNN")
+            await websocket.send_json({
+                "audio_prediction": audio_prediction,
+                "stream_time": round(
+                    (stream.total_frames - 1) * stream.hop_length / sample_rate
+                    + stream.n_fft / sample_rate, 3
+                ),
+            })
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post(
+    "/upload_labeled_datapoint_and_update_model/",
+    response_model=TrainingJobSubmittedResponse,
+)
 async def upload_labeled_datapoint_and_update_model(data: DataPoint) -> Dict[str, Any]:
     """
     Receives a labeled data point and stores it in the database.
     The data point includes a feature vector, a label, and the model we'd like our
-    data to be used in training. Then, the associated machine learning model for 
-    the specified dataset ID is retrained. If successful, saves the model and returns 
-    the resubstitution accuracy.
+    data to be used in training. Then, a background training job is scheduled for 
+    the associated machine learning model and its id is returned immediately. Uploads
+    that arrive while a job is waiting to run are coalesced into that same job.
+
+    When `LOGISTIC_REGRESSION_MODE` is "online", the Logistic Regression job
+    updates the model with `partial_fit` on the new data points only, except for
+    periodic full refits.
 
     Parameters
     ----------
@@ -252,71 +874,293 @@ async def upload_labeled_datapoint_and_update_model(data: DataPoint) -> Dict[str
     Returns
     -------
     dict
-        A dictionary containing the ID of the inserted data point and a summary of the features.
+        A dictionary containing the id and status of the training job. Poll
+        `/training_jobs/{job_id}` for the resubstitution accuracy once it finishes.
     """
-    # Insert data into MongoDB
-    insert_result = await db.labeledinstances.insert_one({
-        "raw_audio": data.raw_audio,
-        "audio_label": data.audio_label,
-        "model_type": data.ml_model_type,
-    })
+    record_since_request_start("upload.parse")
 
-    # Retrieve all data points for this model_type from MongoDB
-    cursor = db.labeledinstances.find({"model_type": data.ml_model_type})
-    data_points = await cursor.to_list(length=None)
+    with span("upload.decode"):
+        waveform = decode_request_audio(
+            lambda: decode_audio_fields(data.raw_audio, data.raw_audio_b64, data.audio_encoding)
+        )
+    return await store_labeled_waveform(waveform, data.audio_label, data.ml_model_type)
 
-    if data.ml_model_type == "Logistic Regression": 
-        # Convert data to features and labels suitable for Logistic Regression
-        features, labels = convert_to_numpy_dataset(data_points)
 
-        # Train the model
-        model, accuracy = retrain_logistic_regression_model(features, labels)
+@app.post(
+    "/upload_labeled_datapoint_binary/",
+    response_model=TrainingJobSubmittedResponse,
+)
+async def upload_labeled_datapoint_binary(
+    request: Request,
+    audio_label: str,
+    ml_model_type: str,
+    audio_encoding: str = "float32",
+) -> Dict[str, Any]:
+    """
+    Same as `/upload_labeled_datapoint_and_update_model/`, but the request body is
+    the clip itself as raw little-endian PCM (`application/octet-stream`), and the
+    label and model type are passed as query parameters.
+    """
+    record_since_request_start("upload.parse")
 
-        # Update the model in the dictionary
-        model_dictionary[data.ml_model_type] = model
+    with span("upload.decode"):
+        payload = await request.body()
+        waveform = decode_request_audio(lambda: decode_pcm(payload, audio_encoding))
+    return await store_labeled_waveform(waveform, audio_label, ml_model_type)
 
-        # Save updated model to file path
-        logistic_regression_path = "../ml_models/logistic_regression_model.pkl" 
-        joblib.dump(model, logistic_regression_path)
 
-        print(accuracy)
+@app.post("/upload_labeled_datapoints_bulk/", response_model=BulkUploadResponse)
+async def upload_labeled_datapoints_bulk(request: Request) -> Dict[str, Any]:
+    """
+    Stores many labeled data points from one request and schedules a single
+    background retrain per affected model type once all of them are stored.
 
-        # Return the accuracy of the retrained model
-        return {"resub_accuracy": str(np.round(accuracy, 1))}
+    The body is read as a stream, either as JSON lines of data points
+    (`application/x-ndjson`) or as a binary archive of PCM clips with labels
+    (`application/octet-stream`); see `bulk_upload.py` for the formats. Clips are
+    featurized and written `BULK_UPLOAD_BATCH_SIZE` at a time with `insert_many`.
 
-    elif data.ml_model_type == "Spectrogram CNN":
-        # Convert data to PyTorch dataset
-        features, labels = convert_to_pytorch_dataset(data_points)
+    The upload is all or nothing: if any record is invalid, the data points
+    already stored from it are deleted and a 400 names the bad record.
 
-        # Train the model
-        model, accuracy = await retrain_pytorch_model(features, labels)
+    Returns
+    -------
+    dict
+        The number of stored data points and, per model type, the training job
+        that will train on them.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        clips = read_ndjson_clips(request.stream())
+    elif content_type == ARCHIVE_CONTENT_TYPE:
+        clips = read_archive_clips(request.stream())
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected {NDJSON_CONTENT_TYPES[0]} or {ARCHIVE_CONTENT_TYPE}, got {content_type!r}"
+        )
 
-        # Update the model in the dictionary
-        model_dictionary[data.ml_model_type] = model
+    inserted_ids: Dict[str, List[Any]] = {}
+    pending: List[LabeledClip] = []
+    received = 0
+    try:
+        async for clip in clips:
+            received += 1
+            if clip.model_type not in FEATURIZER_PARAMS:
+                raise ValueError(f"Data point {received}: no model found for {clip.model_type}")
+            if clip.audio_label not in label_encoder.classes_:
+                raise ValueError(f"Data point {received}: unknown label {clip.audio_label!r}")
+            pending.append(clip)
+            if len(pending) >= BULK_UPLOAD_BATCH_SIZE:
+                await insert_labeled_clips(pending, inserted_ids)
+                pending = []
+        await insert_labeled_clips(pending, inserted_ids)
+    except ValueError as error:
+        # Leave no data points behind that no training job knows about
+        stored_ids = [instance_id for ids in inserted_ids.values() for instance_id in ids]
+        if stored_ids:
+            stored = db.labeledinstances.find({"_id": {"$in": stored_ids}}, {"model_type": 1, "audio_label": 1})
+            stored_labels: Dict[str, List[str]] = {}
+            async for document in stored:
+                stored_labels.setdefault(document["model_type"], []).append(document["audio_label"])
+            await db.labeledinstances.delete_many({"_id": {"$in": stored_ids}})
+            for model_type, audio_labels in stored_labels.items():
+                await dataset_counts.remove(model_type, audio_labels)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
 
-        # CODE BELOW DISABLED.
-        # Save updated model to file path
-        # spectrogram_regression_path = "../ml_models/mel_spectrogram_cnn.pth" 
-        # joblib.dump(model, spectrogram_regression_path)
+    if not inserted_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The upload contained no data points"
+        )
 
-        # Return the accuracy of the trained model
-        return {"resub_accuracy": str(np.round(accuracy, 1))}
+    # Schedule (or join) one background retrain per model type
+    jobs = {}
+    for model_type, instance_ids in inserted_ids.items():
+        dataset_versions.bump(model_type)
+        job = await training_scheduler.submit(model_type, instance_ids)
+        jobs[model_type] = {
+            "job_id": job.id,
+            "status": job.status,
+            "coalesced_uploads": job.coalesced_uploads,
+        }
+    return {
+        "stored": sum(len(instance_ids) for instance_ids in inserted_ids.values()),
+        "jobs": jobs,
+    }
 
-    else:
+
+@app.post("/full_retrain/", response_model=TrainingJobSubmittedResponse)
+async def schedule_full_retrain(request: FullRetrainRequest) -> Dict[str, Any]:
+    """
+    Schedules a retrain of a model on all stored data, for models that are
+    otherwise updated incrementally ("online" Logistic Regression, "finetune"
+    Spectrogram CNN). Joins the queued training job of the model if there is one.
+
+    Example:
+    ```
+    {
+        "ml_model_type": "Spectrogram CNN"
+    }
+    ```
+    """
+    if request.ml_model_type not in FEATURIZER_PARAMS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail=f"No model found for {data.ml_model_type}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No model found for {request.ml_model_type}"
         )
 
+    job = await training_scheduler.submit(request.ml_model_type, full_retrain=True)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "coalesced_uploads": job.coalesced_uploads,
+    }
+
+
+@app.get("/training_jobs/{job_id}", response_model=TrainingJobResponse)
+async def get_training_job(job_id: str) -> Dict[str, Any]:
+    """
+    Returns the status of a training job and, once it has succeeded, the
+    resubstitution accuracy of the retrained model.
+    """
+    job = await training_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No training job found with id {job_id}"
+        )
+
+    result = job.result or {}
+    return {
+        "job_id": job.id,
+        "model_type": job.model_type,
+        "status": job.status,
+        "coalesced_uploads": job.coalesced_uploads,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "resub_accuracy": result.get("resub_accuracy"),
+        "update_type": result.get("update_type"),
+        "fine_tuning": result.get("fine_tuning"),
+        "error": job.error,
+    }
+
+
+@app.get("/model_versions/{model_type}", response_model=ModelVersionsResponse)
+async def get_model_versions(model_type: str) -> Dict[str, Any]:
+    """
+    Lists the retained versions of a model, newest first, marking the one
+    currently being served.
+
+    Example:
+    ```
+    GET /model_versions/Spectrogram%20CNN
+    ```
+    """
+    if model_type not in model_registry.formats:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model type {model_type} not found"
+        )
+    require_ready_model(model_type)
+
+    return {"model_type": model_type, "versions": describe_model_versions(model_type)}
+
+
+@app.post("/rollback_model/", response_model=ModelVersionsResponse)
+async def rollback_model(request: RollbackRequest) -> Dict[str, Any]:
+    """
+    Serves a previous version of a model again. Without a `version`, the
+    version before the current one is restored. A retrain that is already
+    running still publishes its result as a new version when it finishes.
+
+    Example:
+    ```
+    {
+        "ml_model_type": "Spectrogram CNN",
+        "version": 3
+    }
+    ```
+    """
+    if request.ml_model_type not in model_registry.formats:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model type {request.ml_model_type} not found"
+        )
+    require_model_owner()
+    require_ready_model(request.ml_model_type)
+
+    try:
+        await model_registry.rollback(request.ml_model_type, request.version)
+    except KeyError as error:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error.args[0])
+    except RuntimeError:
+        # The checkpoint's weights do not fit the configured CNN analysis window
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Version {request.version} of {request.ml_model_type} does not fit the current model configuration"
+        )
+
+    return {
+        "model_type": request.ml_model_type,
+        "versions": describe_model_versions(request.ml_model_type),
+    }
+
+
+@app.post("/cnn_inference_variant/")
+async def set_cnn_inference_variant(request: InferenceVariantRequest) -> Dict[str, Any]:
+    """
+    Recompiles a Spectrogram CNN version as another inference variant and
+    returns its report: the variant actually served, its latency and speedup
+    over the eager model, its size and, for "int8", the parity check.
+
+    Example:
+    ```
+    {
+        "variant": "int8",
+        "version": 3
+    }
+    ```
+    """
+    if request.variant not in INFERENCE_VARIANTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported inference variant {request.variant}, expected one of {INFERENCE_VARIANTS}"
+        )
+    require_model_owner()
+    require_ready_model("Spectrogram CNN")
+
+    entry = model_registry.entry("Spectrogram CNN", request.version)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Version {request.version} of Spectrogram CNN is not loaded"
+        )
+
+    entry.artifacts["inference"] = await build_cnn_inference_model(entry.model, request.variant)
+    return {"version": entry.version, **entry.artifacts["inference"].report}
+
 
 @app.get("/model_accuracies/", response_model=ModelAccuraciesResponse)
 async def get_model_accuracies():
     """
     Returns the accuracies for both the Spectrogram CNN and Logistic Regression models.
+    Results are cached until the model's data or weights change.
     """
+    require_ready_model("Spectrogram CNN")
+    require_ready_model("Logistic Regression")
+
     # Retrieve actual accuracies
-    spectrogram_cnn_accuracy: str = await calculate_spectrogram_cnn_accuracy()
-    logistic_regression_accuracy: str = await calculate_logistic_regression_accuracy()
+    spectrogram_cnn_accuracy: str = await cached_accuracy(
+        "Spectrogram CNN", calculate_spectrogram_cnn_accuracy
+    )
+    logistic_regression_accuracy: str = await cached_accuracy(
+        "Logistic Regression", calculate_logistic_regression_accuracy
+    )
 
     return {
         "spectrogram_cnn_accuracy": spectrogram_cnn_accuracy,
@@ -324,16 +1168,131 @@ async def get_model_accuracies():
     }
 
 
-@app.get("/print_database/")
-async def print_database():
+@app.post("/evaluate_model/", response_model=EvaluationResponse)
+async def evaluate_model(request: EvaluationRequest) -> Dict[str, Any]:
+    """
+    Estimates how well a model type does on unseen clips with stratified k-fold
+    ("kfold") or held-out ("holdout") evaluation: a fresh model is trained per
+    split on the rest of the data and scored on the split. Splits are trained in
+    parallel in the evaluation process pool.
+
+    Results are stored per dataset and training configuration, so repeating a
+    request returns the stored result (`"cached": true`) until either changes.
+
+    Example:
+    ```
+    {
+        "ml_model_type": "Spectrogram CNN",
+        "method": "kfold",
+        "n_folds": 5
+    }
+    ```
+    """
+    if request.ml_model_type not in FEATURIZER_PARAMS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No model found for {request.ml_model_type}"
+        )
+    if request.method not in EVALUATION_METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown evaluation method {request.method!r}, expected one of {EVALUATION_METHODS}"
+        )
+    require_ready_model(request.ml_model_type)
+
+    async with evaluation_locks[request.ml_model_type]:
+        try:
+            return await run_evaluation(request)
+        except ValueError as error:
+            # Too few data points per label for the requested splits
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(error)
+            )
+
+
+@app.get("/model_evaluations/{model_type}", response_model=ModelEvaluationsResponse)
+async def get_model_evaluations(model_type: str, limit: int = 20) -> Dict[str, Any]:
+    """
+    Lists the stored evaluations of a model type, newest first.
+    """
+    if model_type not in FEATURIZER_PARAMS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No model found for {model_type}"
+        )
+    cursor = db.modelevaluations.find({"model_type": model_type}).sort("created_at", -1).limit(limit)
+    return {
+        "model_type": model_type,
+        "evaluations": [describe_evaluation(document, cached=True) async for document in cursor],
+    }
+
+
+@app.get("/export_dataset/")
+async def export_dataset(
+    format: str = "ndjson",
+    ml_model_type: Optional[str] = None,
+    audio_label: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    chunk_size: int = 256,
+) -> StreamingResponse:
     """
-    Retrieves and prints all documents in the MongoDB collection to the console.
+    Streams the labeled data points, optionally only those of one model type
+    and/or label, as NDJSON (`format=ndjson`) or as a chunked `.npz` archive of
+    packed audio arrays (`format=npz`); see `dataset_export.py` for the formats.
+    Documents are read and written a batch at a time, in constant server memory.
+
+    Pages are taken in insertion order: with `limit`, at most that many data
+    points are exported, and if more remain the `X-Next-After` header holds the
+    value to pass as `after` for the next page.
     """
-    cursor = db.labeledinstances.find({})
-    data_points = await cursor.to_list(length=None)
-    for dp in data_points:
-        print(dp)
-    return {"detail": "Printed all data to console."}
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown export format {format!r}, expected one of {sorted(EXPORT_FORMATS)}"
+        )
+    if (limit is not None and limit <= 0) or chunk_size <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="`limit` and `chunk_size` must be positive"
+        )
+
+    query: Dict[str, Any] = {}
+    if ml_model_type is not None:
+        query["model_type"] = ml_model_type
+    if audio_label is not None:
+        query["audio_label"] = audio_label
+    if after is not None:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except InvalidId:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid `after` id {after!r}"
+            )
+
+    headers = {"Content-Disposition": f'attachment; filename="dataset.{EXPORT_FORMATS[format][1]}"'}
+    if limit is not None:
+        # Find the last data point of the page, and whether any follow it
+        boundary_cursor = db.labeledinstances.find(query, {"_id": 1}).sort("_id", 1).skip(limit - 1).limit(2)
+        boundary = await boundary_cursor.to_list(length=2)
+        if len(boundary) == 2:
+            headers["X-Next-After"] = str(boundary[0]["_id"])
+
+    cursor = db.labeledinstances.find(
+        query,
+        {"raw_audio": 1, "audio_label": 1, "model_type": 1},
+        batch_size=chunk_size,
+    ).sort("_id", 1)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+
+    if format == "npz":
+        body = export_npz(cursor, chunk_size)
+    else:
+        body = export_ndjson(cursor, MEL_SPECTROGRAM_PARAMS["sample_rate"])
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[format][0], headers=headers)
 
 
 @app.delete("/clear_database/")
@@ -343,6 +1302,9 @@ async def clear_database():
     """
     # Assuming the collection is named 'labeledinstances'
     delete_result = await db.labeledinstances.delete_many({})
+    await dataset_counts.clear()
+    dataset_versions.bump_all()
+    cnn_fine_tuning.reset()
 
     if delete_result.acknowledged:
         return {"detail": f"Deleted {delete_result.deleted_count} items."}
@@ -353,30 +1315,70 @@ async def clear_database():
         )
 
 
-@app.get("/print_data_count/")
-async def print_data_count():
+@app.get("/data_counts/", response_model=DataCountsResponse)
+@app.get("/print_data_count/", response_model=DataCountsResponse)
+async def get_data_counts(recount: bool = False) -> Dict[str, Any]:
     """
-    Retrieves and prints the count of documents grouped by 'model_type' and 'audio_label'.
+    Returns the number of data points per model type and label, read from
+    counters kept up to date on every insert and delete. With `recount=true`,
+    the counters are first rebuilt from the labeled data.
+
+    `/print_data_count/` is kept as an alias for existing clients.
     """
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "model_type": "$model_type",
-                    "audio_label": "$audio_label"
-                },
-                "count": {"$sum": 1}
-            }
-        },
-        {
-            "$sort": {"_id": 1}  # Sorting by the group identifier
-        }
-    ]
-    cursor = db.labeledinstances.aggregate(pipeline)
-    data_counts = await cursor.to_list(length=None)
-    for count in data_counts:
-        print(f"Model Type: {count['_id']['model_type']}, Audio Label: {count['_id']['audio_label']}, Count: {count['count']}")
-    return {"detail": "Printed data counts to console."}
+    if recount:
+        await dataset_counts.rebuild()
+    counts = await dataset_counts.counts()
+
+    totals: Dict[str, int] = {}
+    for count in counts:
+        totals[count["model_type"]] = totals.get(count["model_type"], 0) + count["count"]
+    return {
+        "counts": counts,
+        "totals": totals,
+        "total": sum(totals.values()),
+    }
+
+
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """
+    Exports request counts and latencies, per-stage timings, prediction batch
+    sizes, queue depths and training durations in the Prometheus text format.
+    """
+    INFERENCE_BACKLOG.set(inference_executor.queued)
+    for batcher in [*prediction_batchers.values(), stream_batcher]:
+        PREDICTION_QUEUE_DEPTH.set(len(batcher.pending), batcher=batcher.name)
+    for model_type in FEATURIZER_PARAMS:
+        TRAINING_QUEUE_DEPTH.set(await training_scheduler.queue_depth(model_type), model_type=model_type)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/healthz")
+async def get_health() -> Dict[str, str]:
+    """
+    Liveness probe: succeeds as soon as the server is accepting connections,
+    whether or not the models have finished loading.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def get_readiness() -> JSONResponse:
+    """
+    Readiness probe: 200 once every model is loaded and warmed up, 503 before
+    that (or if a model failed to load). Either way the body reports the status
+    and load timings of each model and the cold-start time against its budget:
+
+    {
+        "ready": true,
+        "models": {"Spectrogram CNN": {"status": "ready", "load_s": 0.41, "compile_s": 1.87, "warmup_s": 0.02, "error": null}, ...},
+        "cold_start": {"import_s": 4.9, "startup_s": 5.0, "ready_s": 7.3, "budget_s": 30.0, "within_budget": true}
+    }
+    """
+    return JSONResponse(
+        model_readiness.describe(),
+        status_code=status.HTTP_200_OK if model_readiness.is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
 
 """
@@ -385,134 +1387,639 @@ HELPER FUNCTIONS
 =========================================================
 """
 
+def decode_request_audio(decode: Callable[[], np.ndarray]) -> np.ndarray:
+    """
+    Run an audio decoder for a request, turning decoding errors into a 400 response.
+    """
+    try:
+        return decode()
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+
+
+def require_ready_model(model_type: str) -> None:
+    """
+    Reject the request with a 503 and a `Retry-After` header while the model of
+    `model_type` is still loading (or if it failed to load).
+    """
+    state = model_readiness.models.get(model_type)
+    if state is not None and state.status != "ready":
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Model for {model_type} is not ready ({state.status})",
+            headers={"Retry-After": "1"},
+        )
+
+
+def overloaded_error(model_type: str, error: Overloaded) -> HTTPException:
+    """
+    Build the 429 returned when the inference backlog is full.
+    """
+    PREDICTIONS_REJECTED.inc(model_type=model_type)
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Server is overloaded: {error}",
+        headers={"Retry-After": "1"},
+    )
+
+
+def require_model_owner() -> None:
+    """
+    Reject requests that change the served models with a 409 on replicas; they
+    must be sent to the trainer, which publishes the change to every replica.
+    """
+    if SERVING_ROLE == "replica":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This server is a replica; send model changes to the trainer"
+        )
+
+
+async def predict_waveform(waveform: np.ndarray, model_type: str) -> Dict[str, Any]:
+    """
+    Predict the label of a single decoded clip with the model of `model_type`.
+    """
+    require_ready_model(model_type)
+    if model_registry.get(model_type) is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not load model for {model_type}"
+        )
+
+    # Concurrent requests for the same model are batched into one forward pass
+    try:
+        with span("predict.model"):
+            audio_prediction = await prediction_batchers[model_type].predict(waveform)
+    except Overloaded as error:
+        raise overloaded_error(model_type, error)
+    PREDICTIONS.inc(model_type=model_type)
+
+    # Return the predicted audio
+    return {
+        "audio_prediction": audio_prediction
+    }
+
+
+async def store_labeled_waveform(
+    waveform: np.ndarray,
+    audio_label: str,
+    model_type: str,
+) -> Dict[str, Any]:
+    """
+    Store a decoded, labeled clip and schedule a background retrain for its model.
+    """
+    if model_type not in FEATURIZER_PARAMS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"No model found for {model_type}"
+        )
+    if audio_label not in label_encoder.classes_:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown label {audio_label!r}, expected one of {', '.join(label_encoder.classes_)}"
+        )
+
+    # Insert data into MongoDB, computing its features once at upload time
+    with span("upload.featurize"):
+        document = feature_store.build_document(waveform, audio_label, model_type)
+    with span("upload.insert"):
+        insert_result = await db.labeledinstances.insert_one(document)
+    await dataset_counts.add(model_type, [audio_label])
+    dataset_versions.bump(model_type)
+
+    # Schedule (or join) a background retrain for this model type
+    job = await training_scheduler.submit(model_type, [insert_result.inserted_id])
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "coalesced_uploads": job.coalesced_uploads,
+    }
+
+
+async def insert_labeled_clips(clips: List[LabeledClip], inserted_ids: Dict[str, List[Any]]) -> None:
+    """
+    Featurize a batch of bulk-uploaded clips, one vectorized call per model type
+    off the event loop, write them with `insert_many`, and add the new document
+    ids to `inserted_ids` by model type.
+    """
+    loop = asyncio.get_running_loop()
+    by_model_type: Dict[str, List[LabeledClip]] = {}
+    for clip in clips:
+        by_model_type.setdefault(clip.model_type, []).append(clip)
+
+    for model_type, model_clips in by_model_type.items():
+        with span("bulk_upload.featurize"):
+            documents = await loop.run_in_executor(
+                None,
+                feature_store.build_documents,
+                [clip.waveform for clip in model_clips],
+                [clip.audio_label for clip in model_clips],
+                model_type,
+            )
+        with span("bulk_upload.insert"):
+            insert_result = await db.labeledinstances.insert_many(documents)
+        await dataset_counts.add(model_type, [clip.audio_label for clip in model_clips])
+        inserted_ids.setdefault(model_type, []).extend(insert_result.inserted_ids)
+
+
 def convert_to_numpy_dataset(data_points: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert the list of data points to NumPy arrays for features and labels.
+    The stored features are read from the feature store rather than recomputed.
     """
-    # Extract FFT features for Logistic Regression
-    features_list = [np.fft.fft(np.array(dp["raw_audio"])).real for dp in data_points]
-    labels_list = [dp["audio_label"] for dp in data_points]
+    with span("dataset.convert"):
+        # Extract stored spectral features for Logistic Regression
+        features_list = [decode_features(dp["features"]) for dp in data_points]
+        labels_list = [dp["audio_label"] for dp in data_points]
 
-    # Encode labels using label encoder
-    labels_encoded = label_encoder.transform(labels_list)
+        # Encode labels using label encoder
+        labels_encoded = label_encoder.transform(labels_list)
 
-    features = np.array(features_list)
-    labels = labels_encoded
+        features = np.stack(features_list)
+        labels = labels_encoded
 
     return features, labels
 
 
-def retrain_logistic_regression_model(
-    features: np.ndarray,
-    labels: np.ndarray,
-) -> Tuple[LogisticRegression, float]:
+async def run_training_job(job: TrainingJob) -> Dict[str, Any]:
     """
-    Retrain the Logistic Regression model using the provided features and labels.
+    Retrain the model of `job.model_type` in the training process pool and swap
+    the result into the model registry. The event loop only gathers features
+    and installs the new model; all fitting happens in a worker process. The
+    CNN worker streams its features from MongoDB in bounded memory. Uploads
+    made while the model is still loading are trained on once it is ready.
     """
-    model: LogisticRegression = model_dictionary["Logistic Regression"]
-    model.fit(features, labels)
+    await model_readiness.wait(job.model_type)
+    loop = asyncio.get_running_loop()
+    fine_tuning: Optional[Dict[str, Any]] = None
+
+    if job.model_type == "Logistic Regression":
+        model = model_registry.get(job.model_type)
+
+        if (
+            isinstance(model, OnlineLogisticRegression)
+            and not model.needs_full_refit()
+            and not job.full_retrain
+        ):
+            # Update the model on the newly uploaded data points only
+            with span("train.load"):
+                data_points = await feature_store.load_feature_documents_by_id(job.instance_ids)
+            train_function = update_logistic_regression_model
+            update_type = "incremental"
+        else:
+            # Retrieve the stored features of all data points for this model_type
+            with span("train.load"):
+                data_points = await feature_store.load_feature_documents(job.model_type)
+            train_function = retrain_logistic_regression_model
+            update_type = "full"
 
-    # Evaluate training accuracy
-    accuracy = 100 * model.score(features, labels)
+        # Convert data to features and labels suitable for Logistic Regression
+        features, labels = convert_to_numpy_dataset(data_points)
 
-    return model, accuracy
+        # Train the model
+        with span("train.fit"):
+            model, accuracy = await loop.run_in_executor(
+                training_executor, train_function, model, features, labels
+            )
+
+        # Swap in the new version; it is saved in the background
+        model_registry.publish(job.model_type, model, {"resub_accuracy": accuracy})
+
+    elif job.model_type == "Spectrogram CNN":
+        if (
+            CNN_TRAINING_MODE == "finetune"
+            and not cnn_fine_tuning.needs_full_retrain()
+            and not job.full_retrain
+        ):
+            model, accuracy, fine_tuning = await fine_tune_cnn_model(job)
+            update_type = "incremental"
+        else:
+            model, accuracy = await retrain_cnn_model(job)
+            update_type = "full"
+
+        # Compile the new version for serving before it is swapped in
+        with span("train.compile"):
+            inference_model = await build_cnn_inference_model(model, CNN_INFERENCE_VARIANT)
+
+        # Swap in the new version; it is saved in the background
+        entry = model_registry.publish(job.model_type, model, {"resub_accuracy": accuracy})
+        entry.artifacts["inference"] = inference_model
+
+    # Return the accuracy of the retrained model
+    return {
+        "resub_accuracy": str(np.round(accuracy, 1)),
+        "update_type": update_type,
+        "fine_tuning": fine_tuning,
+    }
 
 
-def convert_to_pytorch_dataset(
-    data_points: List[Dict],
-) -> Tuple[torch.Tensor, torch.Tensor]:
+def current_cnn_state_dict() -> Dict[str, torch.Tensor]:
     """
-    Convert the list of data points to PyTorch Tensors for features and labels.
+    Return a copy of the current CNN weights to train from. The weights are
+    cloned because pickling a tensor for a worker process moves its storage
+    into shared memory, which must not happen to the live, serving model.
     """
-    # Extract Mel Spectrogram features for CNN
-    features_list = []
-    mel_spectrogram_transform = T.MelSpectrogram(
-        sample_rate=44100,
-        n_fft=2048,  # This can be adjusted based on the desired time resolution
-        win_length=None,  # Window length, can be set to n_fft by default
-        hop_length=512,  # This controls the overlap between frames; adjust as needed
-        n_mels=128,  # Number of Mel filters
-    ) 
-    
-    for dp in data_points:
-        waveform = torch.tensor(dp["raw_audio"]).float().view(1, -1)
-        mel_spectrogram = mel_spectrogram_transform(waveform)
-        mel_spectrogram = mel_spectrogram.view(1, mel_spectrogram.size(1), mel_spectrogram.size(2))
-        features_list.append(mel_spectrogram)
-    
-    labels_list = [dp["audio_label"] for dp in data_points]
+    return {
+        name: tensor.clone()
+        for name, tensor in model_registry.get("Spectrogram CNN").state_dict().items()
+    }
 
-    # One-hot encode labels
-    labels_encoded = one_hot_encoder.transform(np.array(labels_list).reshape(-1, 1))
-    labels_encoded_tensor = torch.tensor(labels_encoded)  # Convert NumPy array to PyTorch tensor
 
-    # Convert one-hot encoded labels to class indices for the CrossEntropyLoss
-    labels_indices = torch.argmax(labels_encoded_tensor, dim=1)
+def cnn_from_state_dict(state_dict: Dict[str, torch.Tensor]) -> MelSpectrogramCNN:
+    model = new_spectrogram_cnn()
+    model.load_state_dict(state_dict)
+    return model.eval()
 
-    features = torch.stack(features_list)
-    labels = labels_indices
 
-    return features, labels
+async def retrain_cnn_model(job: TrainingJob) -> Tuple[MelSpectrogramCNN, float]:
+    """
+    Retrain the CNN on every stored data point, streamed from MongoDB by the
+    worker, and return it with its resubstitution accuracy. In "finetune" mode
+    this also refills the replay buffer and restarts the running accuracy.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Make sure every stored feature is current before the worker streams them
+    with span("train.load"):
+        await feature_store.rebuild_stale_features(job.model_type)
+    dataset = MongoFeatureDataset(
+        MONGO_URL, MONGO_DATABASE, job.model_type, label_encoder.classes_
+    )
+
+    with span("train.fit"):
+        state_dict, accuracy = await loop.run_in_executor(
+            training_executor,
+            retrain_pytorch_model,
+            current_cnn_state_dict(),
+            dataset,
+        )
 
+    if CNN_TRAINING_MODE == "finetune":
+        instances = db.labeledinstances.find({"model_type": job.model_type}, {"audio_label": 1})
+        cnn_fine_tuning.record_full_retrain(
+            accuracy, [(document["_id"], document["audio_label"]) async for document in instances]
+        )
+    return cnn_from_state_dict(state_dict), accuracy
 
-async def retrain_pytorch_model(
-    features: torch.Tensor, 
-    labels: torch.Tensor,
-) -> Tuple[nn.Module, float]:
+
+async def fine_tune_cnn_model(job: TrainingJob) -> Tuple[MelSpectrogramCNN, float, Dict[str, Any]]:
     """
-    Retrain the specified model using the provided features and labels.
+    Fine-tune the CNN on the job's new data points mixed with the replay buffer,
+    and return it with the running accuracy and the fine-tune's statistics.
+    Only the new points and the replay sample are loaded, so the cost does not
+    grow with the dataset.
     """
-    model: nn.Module = model_dictionary["Spectrogram CNN"]
+    loop = asyncio.get_running_loop()
 
-    # Define a simple dataset and dataloader
-    dataset = TensorDataset(features, labels)
-    dataloader = DataLoader(dataset, batch_size=32, shuffle=True)
+    with span("train.load"):
+        new_points = await feature_store.load_feature_documents_by_id(job.instance_ids)
+        new_ids = set(job.instance_ids)
+        replay_points = await feature_store.load_feature_documents_by_id(
+            [instance_id for instance_id in cnn_fine_tuning.replay.instance_ids() if instance_id not in new_ids]
+        )
+    new_features, new_labels = convert_to_numpy_dataset(new_points)
+    if replay_points:
+        replay_features, replay_labels = convert_to_numpy_dataset(replay_points)
+    else:
+        replay_features = np.empty((0, *new_features.shape[1:]), dtype=new_features.dtype)
+        replay_labels = np.empty(0, dtype=new_labels.dtype)
+
+    with span("train.fit"):
+        state_dict, correct, stats = await loop.run_in_executor(
+            training_executor,
+            fine_tune_pytorch_model,
+            current_cnn_state_dict(),
+            new_features,
+            new_labels,
+            replay_features,
+            replay_labels,
+            CNN_FINETUNE_MAX_STEPS,
+        )
 
-    # Define loss function and optimizer
-    criterion = nn.CrossEntropyLoss()
-    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+    accuracy = cnn_fine_tuning.record_fine_tune(
+        correct, [(point["_id"], point["audio_label"]) for point in new_points]
+    )
+    stats = {"new_points": len(new_points), "replayed_points": len(replay_points), **stats}
+    return cnn_from_state_dict(state_dict), accuracy, stats
 
-    # Training loop
-    for epoch in range(5):  # Train for 5 epochs
-        for batch_features, batch_labels in dataloader:
-            # Forward pass
-            outputs = model(batch_features)
-            loss = criterion(outputs, batch_labels)
 
-            # Backward and optimize
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+# Scheduler that coalesces uploads into background training jobs. With several
+# server processes, jobs are kept in MongoDB and only the trainer runs them.
+training_scheduler: Union[TrainingJobScheduler, SharedTrainingJobScheduler] = (
+    TrainingJobScheduler(run_training_job)
+    if SERVING_ROLE == "standalone"
+    else SharedTrainingJobScheduler(db.trainingjobs, run_training_job, MODEL_SYNC_INTERVAL_S)
+)
 
-    # Evaluate accuracy
-    with torch.no_grad():
-        correct: int = 0
-        total: int = 0
-        for features, labels in dataloader:
-            # Make predictions with batch of features
-            outputs = model(features)
-            _, predicted = torch.max(outputs.data, 1)
 
-            # Increment total correct and total logged in batch accordingly
-            total += labels.size(0)
-            correct += (predicted == labels).sum().item()
+def predict_logistic_regression_batch(waveforms: np.ndarray) -> List[str]:
+    """
+    Predict labels for a batch of equal-length clips of shape (batch_size, n_samples)
+    with the Logistic Regression model, on the same spectral features it was trained on.
+    """
+    with span("batch.featurize"):
+        features = compute_spectral_features_batch(waveforms)
 
-    # Calculate accuracy and return both model and accuracy
-    accuracy = (correct / total) * 100
-    return model, accuracy
+    model = model_registry.get("Logistic Regression")
+    with span("batch.forward"):
+        predicted_labels_encoded = model.predict(features)
+    return list(label_encoder.inverse_transform(predicted_labels_encoded))
+
+
+def predict_spectrogram_cnn_batch(waveforms: np.ndarray) -> List[str]:
+    """
+    Predict labels for a batch of equal-length clips of shape (batch_size, n_samples)
+    with the Spectrogram CNN, using one Mel Spectrogram and one forward pass.
+    """
+    # Convert raw audio data to Mel Spectrograms of the CNN window, one per clip
+    with span("batch.featurize"):
+        mel_spectrograms = compute_mel_spectrogram_batch(waveforms)
+
+    # Pass the (batch_size, 1, n_mels, n_frames) batch to the CNN
+    return predict_mel_spectrogram_batch(mel_spectrograms)
+
+
+def predict_mel_spectrogram_batch(mel_spectrograms: np.ndarray) -> List[str]:
+    """
+    Predict labels for a batch of Mel Spectrograms of shape
+    (batch_size, 1, n_mels, n_frames) with the Spectrogram CNN.
+    """
+    mel_spectrograms = torch.from_numpy(mel_spectrograms)
+    model = served_cnn_model()
+
+    # Predict using the Mel Spectrograms and reverse encode the predictions
+    with span("batch.forward"):
+        predictions = model(mel_spectrograms)
+    predicted_label_indices = predictions.argmax(dim=1).numpy()
+    return list(known_labels[predicted_label_indices])
+
+
+def served_cnn_model() -> InferenceModel:
+    """
+    Return the inference model of the current Spectrogram CNN version, or the
+    eager model if it has not been compiled yet.
+    """
+    entry = model_registry.entry("Spectrogram CNN")
+    inference_model = entry.artifacts.get("inference")
+    if inference_model is None:
+        return InferenceModel(entry.model, "eager")
+    return inference_model
+
+
+async def build_cnn_inference_model(model: MelSpectrogramCNN, variant: str) -> InferenceModel:
+    """
+    Compile `model` as `variant` in a background thread. Stored spectrograms
+    are used as the int8 parity set and to measure single-request latency.
+    """
+    parity_inputs = None
+    if variant == "int8":
+        # Spectrograms of an earlier window length would not fit the model's input
+        await feature_store.rebuild_stale_features("Spectrogram CNN")
+        feature_batches = stream_feature_batches(
+            db.labeledinstances, "Spectrogram CNN", label_encoder.classes_,
+            batch_size=CNN_PARITY_SAMPLES,
+        )
+        async for features, _ in feature_batches:
+            parity_inputs = torch.from_numpy(features)
+            break
+        await feature_batches.aclose()
+
+    if parity_inputs is not None:
+        example_input = parity_inputs[:1]
+    else:
+        example_input = torch.zeros(1, 1, MEL_SPECTROGRAM_PARAMS["n_mels"], CNN_WINDOW_FRAMES)
+
+    loop = asyncio.get_running_loop()
+    inference_model = await loop.run_in_executor(
+        None,
+        prepare_inference_model,
+        model,
+        variant,
+        example_input,
+        parity_inputs,
+        CNN_INT8_MIN_AGREEMENT,
+    )
+    return inference_model
+
+
+def describe_model_versions(model_type: str) -> List[Dict[str, Any]]:
+    """
+    Describe the retained versions of `model_type`, with the inference report
+    of those that are compiled for serving.
+    """
+    versions = model_registry.versions(model_type)
+    for version in versions:
+        entry = model_registry.entry(model_type, version["version"])
+        inference_model = entry.artifacts.get("inference") if entry is not None else None
+        version["inference"] = inference_model.report if inference_model is not None else None
+    return versions
+
+
+# Batch prediction function of each model type
+prediction_functions = {
+    "Logistic Regression": predict_logistic_regression_batch,
+    "Spectrogram CNN": predict_spectrogram_cnn_batch,
+}
+
+# One micro-batcher per model type, shared by all `/predict_one/` requests
+prediction_batchers: Dict[str, MicroBatcher] = {
+    model_type: MicroBatcher(
+        predict_function,
+        max_batch_size=PREDICTION_MAX_BATCH_SIZE,
+        max_wait_ms=PREDICTION_MAX_WAIT_MS,
+        name=model_type,
+        executor=inference_executor,
+    )
+    for model_type, predict_function in prediction_functions.items()
+}
+
+# Micro-batcher for `/stream_predict/` windows, shared by all open streams
+stream_batcher = MicroBatcher(
+    predict_mel_spectrogram_batch,
+    max_batch_size=PREDICTION_MAX_BATCH_SIZE,
+    max_wait_ms=PREDICTION_MAX_WAIT_MS,
+    name="stream",
+    executor=inference_executor,
+)
+
+
+async def dataset_fingerprint(model_type: str, instance_ids: Optional[List[Any]] = None) -> str:
+    """
+    Identify the current dataset of `model_type` by a hash of its instance ids
+    (read from MongoDB unless given) and its featurizer version.
+    """
+    if instance_ids is None:
+        cursor = db.labeledinstances.find({"model_type": model_type}, {"_id": 1})
+        instance_ids = [document["_id"] async for document in cursor]
+    digest = hashlib.sha1(featurizer_version(model_type).encode())
+    for instance_id in sorted(str(instance_id) for instance_id in instance_ids):
+        digest.update(instance_id.encode())
+    return digest.hexdigest()[:16]
+
+
+def evaluation_training_config(model_type: str) -> Dict[str, Any]:
+    """
+    Describe how the fresh model of each evaluation split is trained, so that
+    stored results are only reused for the same training setup.
+    """
+    if model_type == "Logistic Regression":
+        model = new_logistic_regression_model()
+        estimator = model._new_estimator() if isinstance(model, OnlineLogisticRegression) else model
+        return {
+            "mode": LOGISTIC_REGRESSION_MODE,
+            "estimator": type(estimator).__name__,
+            **estimator.get_params(),
+        }
+    return dict(CNN_TRAINING_CONFIG)
+
+
+def describe_evaluation(document: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+    return {
+        **{name: value for name, value in document.items() if name not in ("_id", "dataset")},
+        "cached": cached,
+    }
+
+
+async def run_evaluation(request: EvaluationRequest) -> Dict[str, Any]:
+    """
+    Return the stored evaluation matching `request` for the current dataset
+    and training configuration, or run it: build stratified splits from the
+    labels, and train and score one model per split in the evaluation process
+    pool. CNN workers stream the spectrograms of their split from MongoDB;
+    Logistic Regression workers read the features from the evaluation feature
+    cache, which is refilled only when the dataset changes.
+
+    Raises
+    ------
+    ValueError
+        If there are too few data points per label for the requested splits.
+    """
+    model_type = request.ml_model_type
+    n_folds = request.n_folds if request.method == "kfold" else 1
+    holdout_fraction = request.holdout_fraction if request.method == "holdout" else None
+    query = {
+        "model_type": model_type,
+        "training_config": evaluation_training_config(model_type),
+        "method": request.method,
+        "n_folds": n_folds,
+        "holdout_fraction": holdout_fraction,
+        "seed": request.seed,
+    }
+
+    fingerprint = await dataset_fingerprint(model_type)
+    stored = await db.modelevaluations.find_one({**query, "dataset": fingerprint})
+    if stored is not None:
+        return describe_evaluation(stored, cached=True)
+
+    started_at = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    if model_type == "Spectrogram CNN":
+        with span("evaluate.load"):
+            # Workers stream current spectrograms; only ids and labels are read here
+            await feature_store.rebuild_stale_features(model_type)
+            cursor = db.labeledinstances.find({"model_type": model_type}, {"audio_label": 1})
+            documents = await cursor.to_list(length=None)
+            if len(documents) == 0:
+                raise ValueError(f"There is no data for {model_type} to evaluate on")
+            instance_ids = np.array([document["_id"] for document in documents], dtype=object)
+            labels = label_encoder.transform([document["audio_label"] for document in documents])
+            fingerprint = await dataset_fingerprint(model_type, list(instance_ids))
+        splits = make_splits(labels, request.method, n_folds, request.holdout_fraction, request.seed)
+
+        def split_dataset(index: np.ndarray) -> MongoFeatureDataset:
+            return MongoFeatureDataset(
+                MONGO_URL, MONGO_DATABASE, model_type, label_encoder.classes_,
+                instance_ids=instance_ids[index].tolist(),
+            )
+
+        with span("evaluate.splits"):
+            results = await asyncio.gather(*[
+                loop.run_in_executor(
+                    evaluation_executor,
+                    evaluate_cnn_split,
+                    split_dataset(train_index),
+                    split_dataset(test_index),
+                    request.seed,
+                )
+                for train_index, test_index in splits
+            ])
+    else:
+        paths = evaluation_feature_cache.get(model_type, fingerprint)
+        if paths is None:
+            with span("evaluate.load"):
+                data_points = await feature_store.load_feature_documents(model_type)
+                if len(data_points) == 0:
+                    raise ValueError(f"There is no data for {model_type} to evaluate on")
+                features, labels = convert_to_numpy_dataset(data_points)
+                # Key the files by the data actually loaded, in case it changed meanwhile
+                fingerprint = await dataset_fingerprint(model_type, [dp["_id"] for dp in data_points])
+                paths = evaluation_feature_cache.put(model_type, fingerprint, features, labels)
+        splits = make_splits(
+            np.load(paths[1]), request.method, n_folds, request.holdout_fraction, request.seed
+        )
+
+        with span("evaluate.splits"):
+            results = await asyncio.gather(*[
+                loop.run_in_executor(
+                    evaluation_executor,
+                    evaluate_logistic_regression_split,
+                    paths,
+                    split,
+                    new_logistic_regression_model(),
+                )
+                for split in splits
+            ])
+
+    document = {
+        **query,
+        "dataset": fingerprint,
+        **summarize_splits(results),
+        "seconds": round(time.perf_counter() - started_at, 3),
+        "created_at": time.time(),
+    }
+    await db.modelevaluations.insert_one(document)
+    return describe_evaluation(document, cached=False)
+
+
+async def cached_accuracy(
+    model_type: str,
+    calculate: Callable[[], Awaitable[str]],
+) -> str:
+    """
+    Return the accuracy of `model_type`, computing it with `calculate` only if
+    no result is cached for the current dataset and model versions and the
+    current inference variant.
+    """
+    entry = model_registry.entry(model_type)
+    inference_model = entry.artifacts.get("inference") if entry is not None else None
+    version = (
+        dataset_versions.get(model_type),
+        model_registry.version(model_type),
+        inference_model.variant if inference_model is not None else "eager",
+    )
+    accuracy = accuracy_cache.get(model_type, version)
+    if accuracy is None:
+        accuracy = await calculate()
+        accuracy_cache.put(model_type, version, accuracy)
+    return accuracy
 
 
 async def calculate_logistic_regression_accuracy() -> str:
     """
     Helper function to calculate accuracy for Logistic Regression.
     """
-    cursor = db.labeledinstances.find({"model_type": "Logistic Regression"})
-    data_points = await cursor.to_list(length=None)
+    with span("accuracy.load"):
+        data_points = await feature_store.load_feature_documents("Logistic Regression")
     if len(data_points) == 0:
         return "--.-"
     features, labels = convert_to_numpy_dataset(data_points)
-    model = model_dictionary["Logistic Regression"]
-    accuracy = model.score(features, labels) * 100  # Accuracy as a percentage
+    model = model_registry.get("Logistic Regression")
+    with span("accuracy.evaluate"):
+        accuracy = model.score(features, labels) * 100  # Accuracy as a percentage
     return str(np.round(accuracy, 1))
 
 
@@ -520,39 +2027,223 @@ async def calculate_spectrogram_cnn_accuracy() -> str:
     """
     Helper function to calculate accuracy for Mel Spectrogram CNN
     """
-    cursor = db.labeledinstances.find({"model_type": "Spectrogram CNN"})
-    data_points = await cursor.to_list(length=None)
-    if len(data_points) == 0:
+    with span("accuracy.load"):
+        await feature_store.rebuild_stale_features("Spectrogram CNN")
+    model = served_cnn_model()
+
+    # Stream stored features in batches instead of loading them all at once
+    feature_batches = stream_feature_batches(
+        db.labeledinstances, "Spectrogram CNN", label_encoder.classes_
+    )
+    with span("accuracy.evaluate"):
+        accuracy = await evaluate_cnn_model(model, feature_batches)
+    if accuracy is None:
         return "--.-"
-    features, labels = convert_to_pytorch_dataset(data_points)
-    model = model_dictionary["Spectrogram CNN"]
-    
-    # Assuming you have a function that can evaluate the model and return accuracy
-    accuracy = await evaluate_cnn_model(model, features, labels)
     return str(np.round(accuracy))
 
 
-async def evaluate_cnn_model(model, features, labels) -> float:
+async def evaluate_cnn_model(
+    model: Callable[[torch.Tensor], torch.Tensor],
+    feature_batches: AsyncIterator[Tuple[np.ndarray, np.ndarray]],
+) -> Optional[float]:
     """
-    Function to evaluate CNN model and return accuracy.
+    Function to evaluate CNN model and return accuracy, or None if there is no data.
     """
-    # Define dataloader for evaluation
-    dataloader = DataLoader(TensorDataset(features, labels), batch_size=32, shuffle=False)
-    
     # Evaluate the model
     correct = 0
     total = 0
-    with torch.no_grad():
-        for features, labels in dataloader:
-            outputs = model(features)
+    async for features, labels in feature_batches:
+        with torch.inference_mode():
+            outputs = model(torch.from_numpy(features))
             _, predicted = torch.max(outputs.data, 1)
-            total += labels.size(0)
-            correct += (predicted == labels).sum().item()
-    
+        total += len(labels)
+        correct += (predicted.numpy() == labels).sum().item()
+
+    if total == 0:
+        return None
     accuracy = (correct / total) * 100
     return accuracy
 
 
+def warm_up_model(model_type: str) -> None:
+    """
+    Run one prediction through the serving path of `model_type`, so the first
+    request does not pay for lazy initialization such as building the Mel
+    filterbank or the first TorchScript runs.
+    """
+    if model_type == "Spectrogram CNN":
+        predict_spectrogram_cnn_batch(np.zeros((1, CNN_WINDOW_SAMPLES), dtype=np.float32))
+        return
+
+    # An untrained Logistic Regression model cannot predict; a trained one
+    # accepts clips of any length
+    if fitted_feature_count(model_registry.get(model_type)) is not None:
+        predict_logistic_regression_batch(np.zeros((1, CNN_WINDOW_SAMPLES), dtype=np.float32))
+
+
+async def load_and_warm_up_model(model_type: str) -> None:
+    """
+    Load, compile (for the CNN) and warm up the model of `model_type` off the
+    event loop, recording how long each step took.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        start = time.perf_counter()
+        await loop.run_in_executor(None, load_machine_learning_model, model_type)
+        model_readiness.record(model_type, "load", time.perf_counter() - start)
+
+        model_readiness.set_status(model_type, "warming")
+        if model_type == "Spectrogram CNN":
+            start = time.perf_counter()
+            entry = model_registry.entry(model_type)
+            entry.artifacts["inference"] = await build_cnn_inference_model(entry.model, CNN_INFERENCE_VARIANT)
+            model_readiness.record(model_type, "compile", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await loop.run_in_executor(None, warm_up_model, model_type)
+        model_readiness.record(model_type, "warmup", time.perf_counter() - start)
+    except Exception as error:
+        model_readiness.set_status(model_type, "failed", repr(error))
+        logger.error("Could not load model for %s: %r", model_type, error)
+        return
+    model_readiness.set_status(model_type, "ready")
+
+
+async def load_and_warm_up_models() -> None:
+    """
+    Bring every model up concurrently, and spawn a training worker meanwhile so
+    the first upload does not wait for one to start and import PyTorch.
+    """
+    if SERVING_ROLE == "replica":
+        await asyncio.gather(*(load_and_warm_up_model(model_type) for model_type in model_readiness.models))
+    else:
+        loop = asyncio.get_running_loop()
+        training_worker = loop.run_in_executor(training_executor, os.getpid)
+        await asyncio.gather(*(load_and_warm_up_model(model_type) for model_type in model_readiness.models))
+
+    ready_s = model_readiness.mark_phase("ready")
+    within_budget = ready_s <= COLD_START_BUDGET_S
+    logger.log(
+        logging.INFO if within_budget else logging.WARNING,
+        "Models ready %.2fs after start (%s the %.0fs cold-start budget)",
+        ready_s, "within" if within_budget else "OVER", COLD_START_BUDGET_S,
+    )
+
+    if SERVING_ROLE == "replica":
+        await follow_published_models()
+        return
+    try:
+        await training_worker
+    except Exception as error:
+        logger.error("Could not start a training worker: %r", error)
+
+
+async def prepare_published_model(entry: ModelVersion) -> None:
+    """
+    Compile a Spectrogram CNN version picked up from the trainer before a
+    replica serves it.
+    """
+    if entry.model_type == "Spectrogram CNN":
+        entry.artifacts["inference"] = await build_cnn_inference_model(entry.model, CNN_INFERENCE_VARIANT)
+
+
+async def follow_published_models() -> None:
+    """
+    On a replica, swap in every version the trainer publishes or rolls back
+    to, checking every MODEL_SYNC_INTERVAL_S seconds. Weights are read from
+    the trainer's checkpoints, never retrained or reinitialized here.
+    """
+    errors: Dict[str, str] = {}
+    while True:
+        for model_type in model_registry.formats:
+            try:
+                entry = await model_registry.sync(model_type, prepare_published_model)
+            except Exception as error:
+                # e.g. a version built for another CNN window, until the trainer replaces it
+                if errors.get(model_type) != repr(error):
+                    logger.warning("Could not load the published %s model: %r", model_type, error)
+                errors[model_type] = repr(error)
+                continue
+            errors.pop(model_type, None)
+            if entry is not None:
+                logger.info("Serving %s version %s", model_type, entry.version)
+        await asyncio.sleep(MODEL_SYNC_INTERVAL_S)
+
+
+@app.on_event("startup")
+async def prepare_database() -> None:
+    """
+    Create the indexes of the labeled data, and build the dataset counters if
+    the database predates them. Both are no-ops once done.
+    """
+    await feature_store.ensure_indexes()
+    await dataset_counts.ensure_initialized()
+
+
+@app.on_event("startup")
+async def start_loading_models() -> None:
+    """
+    Start loading the models in the background and return at once, so the
+    server accepts connections (and answers `/healthz`) while they load.
+    """
+    global model_loading_task
+    model_loading_task = asyncio.create_task(load_and_warm_up_models())
+    model_readiness.mark_phase("startup")
+
+    # The trainer runs the training jobs submitted by every process
+    if SERVING_ROLE == "trainer":
+        training_scheduler.start(FEATURIZER_PARAMS)
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks() -> None:
+    """
+    Stop following published models (on a replica) and claiming training jobs
+    (on the trainer) when the server shuts down.
+    """
+    if model_loading_task is not None:
+        model_loading_task.cancel()
+    if SERVING_ROLE == "trainer":
+        await training_scheduler.stop()
+
+
+@app.on_event("shutdown")
+def shutdown_inference_executor() -> None:
+    """
+    Stop the inference threads when the server shuts down.
+    """
+    inference_executor.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_training_executor() -> None:
+    """
+    Stop the training worker processes when the server shuts down.
+    """
+    training_executor.shutdown(wait=True, cancel_futures=True)
+
+
+@app.on_event("shutdown")
+def shutdown_evaluation_executor() -> None:
+    """
+    Stop the evaluation worker processes and remove their cached features when
+    the server shuts down.
+    """
+    evaluation_executor.shutdown(wait=True, cancel_futures=True)
+    evaluation_feature_cache.close()
+
+
+@app.on_event("shutdown")
+def shutdown_model_registry() -> None:
+    """
+    Finish writing pending model checkpoints when the server shuts down.
+    """
+    model_registry.close()
+
+
+# Everything above runs when the module is imported
+model_readiness.mark_phase("import")
+
 """
 =========================================================
 MAIN METHOD
@@ -560,5 +2251,7 @@ MAIN METHOD
 """
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     # Start uvicorn server
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,264 @@
+"""
+Hot-path instrumentation exported in the Prometheus text format.
+
+A few lock-protected metric types (`Counter`, `Gauge`, `Histogram`) render
+themselves as Prometheus exposition text, without extra dependencies. `span`
+times one stage of a request or job: the duration goes to the
+`stage_duration_seconds` histogram, labeled by stage, and, if the request being
+handled asked for it (`start_request_timing`), to that request's list of stage
+timings, which the server returns in a `Server-Timing` header.
+
+Stage names are dotted, `<path>.<stage>`, e.g. `predict.decode` or `train.fit`.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets from 0.5 ms to 60 s
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. of requests served.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down, e.g. a queue depth.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values, e.g. durations, in cumulative buckets.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            counts = self.counts.setdefault(key, [0] * len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self.sums[key] = self.sums.get(key, 0.0) + value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_label = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, bucket_label)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(self.sums[key])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together by the `/metrics` endpoint.
+    """
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests served.", ("method", "route", "status"),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route"),
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "stage_duration_seconds", "Duration of instrumented hot-path stages.", ("stage",),
+))
+PREDICTIONS = REGISTRY.register(Counter(
+    "predictions_total", "Clips classified.", ("model_type",),
+))
+PREDICTIONS_REJECTED = REGISTRY.register(Counter(
+    "predictions_rejected_total", "Clips refused because the inference backlog was full.", ("model_type",),
+))
+PREDICTION_BATCH_SIZE = REGISTRY.register(Histogram(
+    "prediction_batch_size", "Clips per micro-batched forward pass.", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+))
+INFERENCE_BACKLOG = REGISTRY.register(Gauge(
+    "inference_backlog", "Clips waiting or running on the inference executor.",
+))
+PREDICTION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "prediction_queue_depth", "Requests waiting in a micro-batcher.", ("batcher",),
+))
+TRAINING_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "training_queue_depth", "Uploads waiting for a queued training job.", ("model_type",),
+))
+TRAINING_JOBS = REGISTRY.register(Counter(
+    "training_jobs_total", "Finished training jobs.", ("model_type", "status"),
+))
+TRAINING_SECONDS = REGISTRY.register(Histogram(
+    "training_duration_seconds", "Duration of training jobs, from start to finish.", ("model_type",),
+))
+MODEL_READY = REGISTRY.register(Gauge(
+    "model_ready", "Whether a model is loaded, warmed up and serving (1) or not (0).", ("model_type",),
+))
+COLD_START_SECONDS = REGISTRY.register(Gauge(
+    "cold_start_seconds", "Seconds from process start until each startup phase finished.", ("phase",),
+))
+
+# Stage timings of the request being handled, if it asked for them
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+_request_start: ContextVar[Optional[float]] = ContextVar("request_start", default=None)
+
+
+def start_request_timing(collect: bool = False) -> Optional[List[Tuple[str, float]]]:
+    """
+    Mark the start of the current request. With `collect`, also collect its
+    stage timings and return the list they are appended to.
+    """
+    _request_start.set(time.perf_counter())
+    timings: Optional[List[Tuple[str, float]]] = [] if collect else None
+    _request_timings.set(timings)
+    return timings
+
+
+def _record(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time the enclosed block as `stage`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(stage, time.perf_counter() - start)
+
+
+def record_since_request_start(stage: str) -> None:
+    """
+    Record the time from the start of the request until now as `stage`; used
+    for the body reading and parsing that happens before a route runs.
+    """
+    start = _request_start.get()
+    if start is not None:
+        _record(stage, time.perf_counter() - start)
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """
+    Format stage timings as a `Server-Timing` header value, in milliseconds.
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings)
@@ -0,0 +1,79 @@
+#!usr/bin/python
+"""
+Migrate `labeledinstances` documents from the legacy `raw_audio` format (a BSON
+array of doubles) to the compact binary format of `audio_storage.py`.
+
+Documents that are already compact are left untouched, so the migration can be
+interrupted and re-run safely. Stored features are not affected.
+
+Usage:
+    python migrate_audio_storage.py [--dtype int16] [--compression zlib]
+                                    [--batch-size 100] [--dry-run]
+"""
+
+import argparse
+
+import bson
+from pymongo import MongoClient, UpdateOne
+
+from audio_storage import COMPRESSIONS, STORAGE_DTYPES, decode_stored_audio, encode_stored_audio
+from featurizer import MEL_SPECTROGRAM_PARAMS
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="mydatabase")
+    parser.add_argument("--dtype", default="int16", choices=sorted(STORAGE_DTYPES))
+    parser.add_argument("--compression", default="zlib", choices=COMPRESSIONS)
+    parser.add_argument("--sample-rate", type=int, default=MEL_SPECTROGRAM_PARAMS["sample_rate"])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="Report sizes without writing")
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    collection = MongoClient(arguments.mongo_url)[arguments.database].labeledinstances
+
+    # Only legacy documents store `raw_audio` as an array
+    cursor = collection.find(
+        {"raw_audio": {"$type": "array"}},
+        projection={"raw_audio": 1},
+        batch_size=arguments.batch_size,
+    )
+
+    migrated = 0
+    legacy_bytes = 0
+    compact_bytes = 0
+    updates = []
+    for document in cursor:
+        waveform = decode_stored_audio(document["raw_audio"])
+        raw_audio = encode_stored_audio(
+            waveform, arguments.sample_rate, arguments.dtype, arguments.compression
+        )
+
+        legacy_bytes += len(bson.encode({"raw_audio": document["raw_audio"]}))
+        compact_bytes += len(raw_audio["data"])
+        migrated += 1
+
+        updates.append(UpdateOne({"_id": document["_id"]}, {"$set": {"raw_audio": raw_audio}}))
+        if len(updates) >= arguments.batch_size:
+            if not arguments.dry_run:
+                collection.bulk_write(updates, ordered=False)
+            updates = []
+
+    if updates and not arguments.dry_run:
+        collection.bulk_write(updates, ordered=False)
+
+    action = "Would migrate" if arguments.dry_run else "Migrated"
+    print(f"{action} {migrated} documents.")
+    if migrated:
+        print(
+            f"Audio payload: {legacy_bytes / 1e6:.1f} MB -> {compact_bytes / 1e6:.1f} MB "
+            f"({legacy_bytes / max(compact_bytes, 1):.1f}x smaller)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Versioned registry of the models being served.
+
+Every retrain publishes a new, immutable `ModelVersion`. Publishing replaces the
+current version of a model type with a single reference assignment, so a
+prediction sees either the old weights or the new ones, never a mix. Models are
+never mutated after they are published; training always works on a copy.
+
+Checkpoints are written by a single background thread, off the request path:
+
+    ml_models/
+        mel_spectrogram_cnn.pth              <- current version, loaded at startup
+        checkpoints/
+            mel_spectrogram_cnn.v3.pth       <- one file per retained version
+            mel_spectrogram_cnn.json         <- manifest: current version and history
+
+Files are written to a temporary name and moved into place, so a crash during a
+save never leaves a truncated model behind. The most recent `max_history`
+versions are kept in memory and on disk, and any of them can be rolled back to.
+
+When several server processes serve the same models, one of them (the trainer)
+owns a writable registry and the others open the same directory read-only.
+Read-only registries never write; they `sync` to the version the manifest marks
+as current, reading its checkpoint, which is never modified once written.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import span
+
+
+@dataclass(frozen=True)
+class ModelFormat:
+    """
+    How the models of one type are written to and read from disk.
+
+    Parameters
+    ----------
+    file_name : str
+        File name of the current model inside the model directory.
+    save : Callable[[Any, str], None]
+        Writes a model to the given path.
+    load : Callable[[str], Any]
+        Reads a model from the given path.
+    """
+    file_name: str
+    save: Callable[[Any, str], None]
+    load: Callable[[str], Any]
+
+
+@dataclass
+class ModelVersion:
+    """
+    One published, immutable version of a model. `artifacts` holds derived,
+    in-memory objects such as compiled inference modules; they are not saved.
+    """
+    model_type: str
+    version: int
+    model: Any
+    created_at: float = field(default_factory=time.time)
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    artifacts: Dict[str, Any] = field(default_factory=dict)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "created_at": self.created_at,
+            "metrics": self.metrics,
+        }
+
+
+class ModelRegistry:
+    """
+    Holds the current and recent versions of every model type.
+
+    Parameters
+    ----------
+    formats : Dict[str, ModelFormat]
+        Storage format of each model type.
+    model_dir : str
+        Directory holding current models; checkpoints go to its `checkpoints/`.
+    max_history : int
+        Number of most recent versions kept for rollback.
+    writable : bool
+        Whether this registry saves what it publishes. A read-only registry
+        follows the versions published by a writable one with `sync`.
+    """
+
+    def __init__(
+        self,
+        formats: Dict[str, ModelFormat],
+        model_dir: str,
+        max_history: int = 5,
+        writable: bool = True,
+    ):
+        self.formats = formats
+        self.model_dir = model_dir
+        self.checkpoint_dir = os.path.join(model_dir, "checkpoints")
+        self.max_history = max_history
+        self.writable = writable
+
+        self.current: Dict[str, ModelVersion] = {}
+        self.history: Dict[str, List[ModelVersion]] = {model_type: [] for model_type in formats}
+        self.latest_versions: Dict[str, int] = {model_type: 0 for model_type in formats}
+        self.manifests: Dict[str, Dict[str, Any]] = {}
+
+        # One writer thread, so saves happen in publish order
+        self.persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-registry")
+        if writable:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    # ---------------------------------------------------------------
+    # Paths
+    # ---------------------------------------------------------------
+
+    def _current_path(self, model_type: str) -> str:
+        return os.path.join(self.model_dir, self.formats[model_type].file_name)
+
+    def _checkpoint_path(self, model_type: str, version: int) -> str:
+        stem, extension = os.path.splitext(self.formats[model_type].file_name)
+        return os.path.join(self.checkpoint_dir, f"{stem}.v{version}{extension}")
+
+    def _manifest_path(self, model_type: str) -> str:
+        stem, _ = os.path.splitext(self.formats[model_type].file_name)
+        return os.path.join(self.checkpoint_dir, f"{stem}.json")
+
+    # ---------------------------------------------------------------
+    # Serving
+    # ---------------------------------------------------------------
+
+    def get(self, model_type: str) -> Optional[Any]:
+        """
+        Return the current model of `model_type`, or None if there is none.
+        """
+        entry = self.current.get(model_type)
+        return entry.model if entry is not None else None
+
+    def entry(self, model_type: str, version: Optional[int] = None) -> Optional[ModelVersion]:
+        """
+        Return the current version of `model_type`, or the given `version` if it
+        is still held in memory, else None.
+        """
+        if version is None:
+            return self.current.get(model_type)
+        return next((entry for entry in self.history[model_type] if entry.version == version), None)
+
+    def version(self, model_type: str) -> int:
+        """
+        Return the current version number of `model_type` (0 if none is loaded).
+        """
+        entry = self.current.get(model_type)
+        return entry.version if entry is not None else 0
+
+    def versions(self, model_type: str) -> List[Dict[str, Any]]:
+        """
+        Describe the retained versions of `model_type`, newest first.
+        """
+        manifest = self.manifests.get(model_type, {"versions": []})
+        described = {entry["version"]: entry for entry in manifest["versions"]}
+        for entry in self.history[model_type]:
+            described[entry.version] = entry.describe()
+
+        current_version = self.version(model_type)
+        return [
+            {**described[version], "current": version == current_version}
+            for version in sorted(described, reverse=True)
+        ]
+
+    # ---------------------------------------------------------------
+    # Loading, publishing and rolling back
+    # ---------------------------------------------------------------
+
+    def load(self, model_type: str, new_model: Callable[[], Any]) -> ModelVersion:
+        """
+        Install the model saved for `model_type`, or publish `new_model()` if
+        nothing has been saved yet. Called once at startup.
+        """
+        manifest = self._read_manifest(model_type)
+        if manifest is not None:
+            self.manifests[model_type] = manifest
+            self.latest_versions[model_type] = max(
+                (entry["version"] for entry in manifest["versions"]), default=0
+            )
+
+        current_path = self._current_path(model_type)
+        if not os.path.exists(current_path):
+            return self.publish(model_type, new_model())
+
+        manifest = self.manifests.get(model_type, {})
+        version = manifest.get("current", 0)
+        metadata = next(
+            (entry for entry in manifest.get("versions", []) if entry["version"] == version), {}
+        )
+        entry = ModelVersion(
+            model_type,
+            version,
+            self.formats[model_type].load(current_path),
+            created_at=metadata.get("created_at", os.path.getmtime(current_path)),
+            metrics=metadata.get("metrics", {}),
+        )
+        self._install(entry)
+        return entry
+
+    def publish(
+        self,
+        model_type: str,
+        model: Any,
+        metrics: Optional[Dict[str, Any]] = None,
+    ) -> ModelVersion:
+        """
+        Make `model` the current version of `model_type` and save it in the
+        background. The model must not be mutated afterwards.
+
+        A read-only registry serves `model` as version 0, without saving it,
+        until it syncs to a version published by the writable registry.
+        """
+        if not self.writable:
+            entry = ModelVersion(model_type, 0, model, metrics=metrics or {})
+            self._install(entry)
+            return entry
+
+        self.latest_versions[model_type] += 1
+        entry = ModelVersion(model_type, self.latest_versions[model_type], model, metrics=metrics or {})
+        self._install(entry)
+        self.persist_executor.submit(self._persist, entry)
+        return entry
+
+    async def rollback(self, model_type: str, version: Optional[int] = None) -> ModelVersion:
+        """
+        Make a previous version of `model_type` current again. Without a
+        `version`, the version published before the current one is restored.
+
+        Raises
+        ------
+        KeyError
+            If the requested version is not retained.
+        RuntimeError
+            If the registry is read-only.
+        """
+        if not self.writable:
+            raise RuntimeError("Only the writable registry can roll back models")
+        if version is None:
+            previous = [
+                entry["version"] for entry in self.versions(model_type)
+                if entry["version"] < self.version(model_type)
+            ]
+            if not previous:
+                raise KeyError(f"No version of {model_type!r} before {self.version(model_type)}")
+            version = previous[0]
+
+        entry = self.entry(model_type, version)
+        if entry is None:
+            # Older than the in-memory history: read it back from its checkpoint
+            checkpoint_path = self._checkpoint_path(model_type, version)
+            if not os.path.exists(checkpoint_path):
+                raise KeyError(f"Version {version} of {model_type!r} is not retained")
+            loop = asyncio.get_running_loop()
+            model = await loop.run_in_executor(
+                self.persist_executor, self.formats[model_type].load, checkpoint_path
+            )
+            metadata = next(
+                (item for item in self.versions(model_type) if item["version"] == version), {}
+            )
+            entry = ModelVersion(
+                model_type,
+                version,
+                model,
+                created_at=metadata.get("created_at", time.time()),
+                metrics=metadata.get("metrics", {}),
+            )
+
+        self._install(entry)
+        self.persist_executor.submit(self._persist, entry)
+        return entry
+
+    async def sync(
+        self,
+        model_type: str,
+        prepare: Optional[Callable[[ModelVersion], Awaitable[None]]] = None,
+    ) -> Optional[ModelVersion]:
+        """
+        Install the version of `model_type` that the manifest marks as current,
+        if it is not the one installed here. The checkpoint is read in the
+        background and, before it is swapped in, passed to `prepare` (e.g. to
+        compile it for serving).
+
+        Returns
+        -------
+        Optional[ModelVersion]
+            The newly installed version, or None if there was nothing new.
+        """
+        loop = asyncio.get_running_loop()
+        manifest = await loop.run_in_executor(self.persist_executor, self._read_manifest, model_type)
+        if manifest is None or manifest["current"] == self.version(model_type):
+            return None
+
+        version = manifest["current"]
+        model = await loop.run_in_executor(
+            self.persist_executor, self.formats[model_type].load, self._checkpoint_path(model_type, version)
+        )
+        metadata = next((item for item in manifest["versions"] if item["version"] == version), {})
+        entry = ModelVersion(
+            model_type,
+            version,
+            model,
+            created_at=metadata.get("created_at", time.time()),
+            metrics=metadata.get("metrics", {}),
+        )
+        if prepare is not None:
+            await prepare(entry)
+
+        self.manifests[model_type] = manifest
+        self.latest_versions[model_type] = max(item["version"] for item in manifest["versions"])
+        self._install(entry)
+        return entry
+
+    def flush(self) -> Future:
+        """
+        Return a future that completes once every pending save has been written.
+        """
+        return self.persist_executor.submit(lambda: None)
+
+    def close(self) -> None:
+        """
+        Finish pending saves and stop the writer thread.
+        """
+        self.persist_executor.shutdown(wait=True)
+
+    def _install(self, entry: ModelVersion) -> None:
+        # The swap is a single reference assignment, atomic for readers
+        self.current[entry.model_type] = entry
+
+        history = [item for item in self.history[entry.model_type] if item.version != entry.version]
+        history.append(entry)
+        self.history[entry.model_type] = history[-self.max_history:]
+
+    # ---------------------------------------------------------------
+    # Persistence (runs on the writer thread)
+    # ---------------------------------------------------------------
+
+    def _read_manifest(self, model_type: str) -> Optional[Dict[str, Any]]:
+        manifest_path = self._manifest_path(model_type)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    def _persist(self, entry: ModelVersion) -> None:
+        model_type = entry.model_type
+        checkpoint_path = self._checkpoint_path(model_type, entry.version)
+        if not os.path.exists(checkpoint_path):
+            with span("model.save"):
+                self.formats[model_type].save(entry.model, checkpoint_path + ".tmp")
+            os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+        # Point the current model file at this version
+        current_path = self._current_path(model_type)
+        shutil.copyfile(checkpoint_path, current_path + ".tmp")
+        os.replace(current_path + ".tmp", current_path)
+
+        # Record the version and drop checkpoints that fell out of the history
+        manifest = self.manifests.get(model_type, {"versions": []})
+        versions = {item["version"]: item for item in manifest["versions"]}
+        versions[entry.version] = entry.describe()
+        retained = sorted(versions)[-self.max_history:]
+        for version in set(versions) - set(retained):
+            if version != entry.version and os.path.exists(self._checkpoint_path(model_type, version)):
+                os.remove(self._checkpoint_path(model_type, version))
+        if entry.version not in retained:
+            retained.append(entry.version)
+
+        manifest = {
+            "current": entry.version,
+            "versions": [versions[version] for version in sorted(retained)],
+        }
+        manifest_path = self._manifest_path(model_type)
+        with open(manifest_path + ".tmp", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        self.manifests[model_type] = manifest
@@ -0,0 +1,41 @@
+"""
+PyTorch network architectures served by the FastAPI application.
+
+Kept separate from `main.py` so that training worker processes can import the
+architecture without starting the server, connecting to MongoDB, or loading models.
+"""
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+# Specify Mel Spectrogram CNN Architecture
+class MelSpectrogramCNN(nn.Module):
+    def __init__(self, n_mels, n_frames):
+        super(MelSpectrogramCNN, self).__init__()
+        self.n_mels = n_mels
+        self.n_frames = n_frames
+        self.conv1 = nn.Conv2d(1, 32, kernel_size=(3, 3), stride=(1, 1), padding=(1, 1))
+        self.conv2 = nn.Conv2d(32, 64, kernel_size=(3, 3), stride=(1, 1), padding=(1, 1))
+        self.pool = nn.MaxPool2d(kernel_size=(2, 2), stride=(2, 2), padding=(1, 1))
+
+        # Calculate the size of the layer before the fully connected layer from
+        # the input shape, e.g. 64 * 33 * 12 = 25344 for 128 Mel bands x 44 frames
+        with torch.no_grad():
+            self.fc_input_size = self.conv_features(torch.zeros(1, 1, n_mels, n_frames)).size(1)
+
+        self.fc1 = nn.Linear(self.fc_input_size, 500)
+        self.fc2 = nn.Linear(500, 2)  # 2 classes
+
+    def conv_features(self, x):
+        x = self.pool(F.relu(self.conv1(x)))
+        x = self.pool(F.relu(self.conv2(x)))
+        flat_size = x.size(1) * x.size(2) * x.size(3) # Correctly calculate the flattened size
+        return x.view(-1, flat_size)  # Flatten the tensor
+
+    def forward(self, x):
+        x = self.conv_features(x)
+        x = F.relu(self.fc1(x))
+        x = self.fc2(x)
+        return x
@@ -0,0 +1,91 @@
+"""
+Online (incremental) learning for the Logistic Regression path.
+
+`OnlineLogisticRegression` wraps an SGD-trained logistic model so that each new
+labeled upload only costs a `partial_fit` on the new points, while an optional
+periodic full refit over the whole dataset keeps the model from drifting.
+"""
+
+from typing import Optional
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+
+class OnlineLogisticRegression:
+    """
+    Logistic regression trained with SGD and updated incrementally.
+
+    Parameters
+    ----------
+    classes : np.ndarray
+        All encoded class labels, required by `partial_fit` up front.
+    refit_interval : int
+        Number of incremental updates after which the next update is a full
+        refit over the whole dataset. `0` disables periodic refits.
+    """
+
+    def __init__(self, classes: np.ndarray, refit_interval: int = 0):
+        self.classes = np.asarray(classes)
+        self.refit_interval = refit_interval
+        self.model: Optional[SGDClassifier] = None
+        self.updates_since_refit = 0
+
+        # Running (prequential) accuracy: each new point is scored before the
+        # model is updated on it, so the estimate costs O(new points) per upload
+        self.correct = 0
+        self.seen = 0
+
+    @staticmethod
+    def _new_estimator() -> SGDClassifier:
+        return SGDClassifier(loss="log_loss")
+
+    def needs_full_refit(self) -> bool:
+        """
+        Whether the next update should be a full refit instead of a `partial_fit`.
+        """
+        if self.model is None:
+            return True
+        return 0 < self.refit_interval <= self.updates_since_refit
+
+    def full_refit(self, features: np.ndarray, labels: np.ndarray) -> float:
+        """
+        Fit a fresh estimator on the full dataset and return its resubstitution accuracy.
+        """
+        model = self._new_estimator()
+        if np.unique(labels).size > 1:
+            model.fit(features, labels)
+        else:
+            model.partial_fit(features, labels, classes=self.classes)
+        self.model = model
+        self.updates_since_refit = 0
+
+        # Seed the running accuracy with the resubstitution accuracy of the refit
+        self.seen = len(labels)
+        self.correct = int(np.sum(model.predict(features) == labels))
+        return self.accuracy
+
+    def partial_update(self, features: np.ndarray, labels: np.ndarray) -> float:
+        """
+        Update the estimator on new points only and return the running accuracy.
+        """
+        self.seen += len(labels)
+        self.correct += int(np.sum(self.model.predict(features) == labels))
+        self.model.partial_fit(features, labels, classes=self.classes)
+        self.updates_since_refit += 1
+        return self.accuracy
+
+    @property
+    def accuracy(self) -> float:
+        """
+        Running accuracy as a percentage.
+        """
+        if self.seen == 0:
+            return 0.0
+        return 100 * self.correct / self.seen
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self.model.predict(features)
+
+    def score(self, features: np.ndarray, labels: np.ndarray) -> float:
+        return self.model.score(features, labels)
@@ -0,0 +1,107 @@
+#!usr/bin/python
+"""
+Profile the compute and latency cost of Spectrogram CNN analysis windows.
+
+For each window length this builds a `MelSpectrogramCNN` of the matching input
+width and reports its parameter count, multiply-accumulates per clip, and the
+median single-request latency of featurization and of the forward pass (eager
+and in the served inference variant). Deploy a window with `CNN_WINDOW_MS`;
+its accuracy can then be compared with `/model_accuracies/` after retraining.
+
+Usage:
+    python profile_window_sizes.py [--windows-ms 50 100 250 500]
+                                   [--variant float] [--repeats 50] [--json]
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from featurizer import MEL_SPECTROGRAM_PARAMS, mel_frame_count, mel_spectrogram_transform
+from inference import INFERENCE_VARIANTS, compile_model, measure_latency_ms
+from networks import MelSpectrogramCNN
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows-ms", type=float, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--variant", default="float", choices=INFERENCE_VARIANTS)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args()
+
+
+def count_multiply_accumulates(model: nn.Module, inputs: torch.Tensor) -> int:
+    """
+    Count the multiply-accumulates of the Conv2d and Linear layers for one forward pass.
+    """
+    total = 0
+
+    def count(module: nn.Module, _: Any, output: torch.Tensor) -> None:
+        nonlocal total
+        if isinstance(module, nn.Conv2d):
+            kernel_height, kernel_width = module.kernel_size
+            total += output.numel() * (module.in_channels // module.groups) * kernel_height * kernel_width
+        elif isinstance(module, nn.Linear):
+            total += output.numel() * module.in_features
+
+    hooks = [
+        module.register_forward_hook(count)
+        for module in model.modules()
+        if isinstance(module, (nn.Conv2d, nn.Linear))
+    ]
+    with torch.inference_mode():
+        model(inputs)
+    for hook in hooks:
+        hook.remove()
+    return total
+
+
+def profile_window(window_ms: float, variant: str, repeats: int) -> Dict[str, Any]:
+    """
+    Measure the cost of one analysis window length.
+    """
+    window_samples = int(round(MEL_SPECTROGRAM_PARAMS["sample_rate"] * window_ms / 1000))
+    n_frames = mel_frame_count(window_samples)
+    model = MelSpectrogramCNN(n_mels=MEL_SPECTROGRAM_PARAMS["n_mels"], n_frames=n_frames).eval()
+
+    clip = torch.from_numpy(np.random.default_rng(0).standard_normal((1, window_samples)).astype(np.float32))
+    transform = mel_spectrogram_transform()
+    inputs = transform(clip).unsqueeze(1)
+
+    return {
+        "window_ms": window_ms,
+        "window_samples": window_samples,
+        "n_frames": n_frames,
+        "parameters": sum(parameter.numel() for parameter in model.parameters()),
+        "multiply_accumulates": count_multiply_accumulates(model, inputs),
+        "featurize_ms": round(measure_latency_ms(transform, clip, repeats), 3),
+        "eager_forward_ms": round(measure_latency_ms(model, inputs, repeats), 3),
+        f"{variant}_forward_ms": round(measure_latency_ms(compile_model(model, variant), inputs, repeats), 3),
+    }
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    torch.manual_seed(0)
+
+    results: List[Dict[str, Any]] = []
+    for window_ms in arguments.windows_ms:
+        results.append(profile_window(window_ms, arguments.variant, arguments.repeats))
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = list(results[0])
+    print("  ".join(f"{column:>20}" for column in columns))
+    for result in results:
+        print("  ".join(f"{result[column]:>20}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
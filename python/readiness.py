@@ -0,0 +1,112 @@
+"""
+Startup readiness of the served models.
+
+Models are loaded, compiled and warmed up in the background after the server
+starts, so a new worker accepts connections right away. `ModelReadiness` tracks
+each model type through "loading", "warming" and "ready" (or "failed"), the time
+every step took, and the cold start of the whole process against a time budget.
+`/readyz` reports it, and only succeeds once every model is ready, so a load
+balancer sends traffic to a worker only when it is warm.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional
+
+from metrics import COLD_START_SECONDS, MODEL_READY
+
+MODEL_STATUSES = ("loading", "warming", "ready", "failed")
+
+
+@dataclass
+class ModelState:
+    """
+    Startup progress of one model type.
+    """
+    status: str = "loading"
+    timings: Dict[str, float] = field(default_factory=dict)  # Seconds per step
+    error: Optional[str] = None
+    settled: asyncio.Event = field(default_factory=asyncio.Event)  # Set once ready or failed
+
+
+class ModelReadiness:
+    """
+    Readiness of every model type and the cold-start timings of the process.
+
+    Parameters
+    ----------
+    model_types : Iterable[str]
+        Model types that must all be ready before the server takes traffic.
+    started_at : float
+        `time.perf_counter()` value at which the process started importing.
+    budget_s : float
+        Cold-start time budget, from `started_at` until every model is ready.
+    """
+
+    def __init__(self, model_types: Iterable[str], started_at: float, budget_s: float):
+        self.models: Dict[str, ModelState] = {model_type: ModelState() for model_type in model_types}
+        self.started_at = started_at
+        self.budget_s = budget_s
+        self.phases: Dict[str, float] = {}
+        for model_type in self.models:
+            MODEL_READY.set(0, model_type=model_type)
+
+    def mark_phase(self, phase: str) -> float:
+        """
+        Record that the cold-start `phase` (e.g. "import", "ready") finished
+        now, and return the seconds since the process started.
+        """
+        elapsed = time.perf_counter() - self.started_at
+        self.phases[phase] = round(elapsed, 3)
+        COLD_START_SECONDS.set(elapsed, phase=phase)
+        return elapsed
+
+    def set_status(self, model_type: str, status: str, error: Optional[str] = None) -> None:
+        state = self.models[model_type]
+        state.status = status
+        state.error = error
+        if status in ("ready", "failed"):
+            state.settled.set()
+        MODEL_READY.set(1 if status == "ready" else 0, model_type=model_type)
+
+    def record(self, model_type: str, step: str, seconds: float) -> None:
+        self.models[model_type].timings[f"{step}_s"] = round(seconds, 3)
+
+    def is_ready(self, model_type: Optional[str] = None) -> bool:
+        """
+        Whether `model_type` (or, without one, every model type) is ready.
+        """
+        if model_type is None:
+            return all(state.status == "ready" for state in self.models.values())
+        state = self.models.get(model_type)
+        return state is not None and state.status == "ready"
+
+    async def wait(self, model_type: str) -> None:
+        """
+        Wait until `model_type` has finished loading.
+
+        Raises
+        ------
+        RuntimeError
+            If the model failed to load.
+        """
+        state = self.models[model_type]
+        await state.settled.wait()
+        if state.status == "failed":
+            raise RuntimeError(f"{model_type} failed to load: {state.error}")
+
+    def describe(self) -> Dict[str, Any]:
+        ready_s = self.phases.get("ready")
+        return {
+            "ready": self.is_ready(),
+            "models": {
+                model_type: {"status": state.status, **state.timings, "error": state.error}
+                for model_type, state in self.models.items()
+            },
+            "cold_start": {
+                **{f"{phase}_s": seconds for phase, seconds in self.phases.items()},
+                "budget_s": self.budget_s,
+                "within_budget": ready_s <= self.budget_s if ready_s is not None else None,
+            },
+        }
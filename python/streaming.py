@@ -0,0 +1,98 @@
+"""
+Incremental Mel Spectrogram computation for streaming inference.
+
+A `StreamingMelSpectrogram` is fed a continuous PCM stream in arbitrary-sized
+chunks. It keeps only the samples that still belong to an unfinished STFT frame,
+computes the Mel frames that become complete as samples arrive, and keeps the
+most recent `window_frames` of them in a ring buffer. Each sample therefore goes
+through the STFT about `n_fft / hop_length` times in total, instead of once per
+prediction as when the spectrogram of the whole window is rebuilt from scratch.
+
+The window and Mel filterbank are taken from the featurizer's shared
+`T.MelSpectrogram`, so interior frames are identical to the offline features. Frames
+are not centered (there is no reflect padding at the start of a stream).
+"""
+
+from typing import Dict, Any
+
+import numpy as np
+import torch
+
+from featurizer import mel_spectrogram_transform
+
+
+class StreamingMelSpectrogram:
+    """
+    Per-connection incremental STFT / Mel Spectrogram state.
+
+    Parameters
+    ----------
+    mel_spectrogram_params : Dict[str, Any]
+        Keyword arguments of `T.MelSpectrogram`, shared with the offline featurizer.
+    window_frames : int
+        Number of most recent Mel frames kept, i.e. the width of the CNN input.
+    """
+
+    def __init__(self, mel_spectrogram_params: Dict[str, Any], window_frames: int):
+        transform = mel_spectrogram_transform(mel_spectrogram_params)
+        self.n_fft: int = transform.spectrogram.n_fft
+        self.hop_length: int = transform.spectrogram.hop_length
+        self.power: float = transform.spectrogram.power
+        self.window: torch.Tensor = transform.spectrogram.window
+        self.filterbank: torch.Tensor = transform.mel_scale.fb  # (n_freqs, n_mels)
+        self.window_frames = window_frames
+
+        # Samples not yet consumed by a complete frame (starts at the next frame)
+        self.pending = np.zeros(0, dtype=np.float32)
+
+        # Ring buffer of the most recent Mel frames, shape (n_mels, window_frames);
+        # the oldest frame is at `next_frame`, which the next new frame overwrites
+        n_mels = self.filterbank.size(1)
+        self.frames = torch.zeros(n_mels, window_frames)
+        self.next_frame = 0
+        self.total_frames = 0
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Whether enough audio has arrived to fill a whole analysis window.
+        """
+        return self.total_frames >= self.window_frames
+
+    def push(self, samples: np.ndarray) -> int:
+        """
+        Append PCM samples and compute the Mel frames they complete.
+
+        Returns
+        -------
+        int
+            The number of new Mel frames.
+        """
+        self.pending = np.concatenate([self.pending, np.asarray(samples, dtype=np.float32)])
+        if self.pending.size < self.n_fft:
+            return 0
+
+        # Frame only the new, complete STFT windows
+        frames = torch.from_numpy(self.pending).unfold(0, self.n_fft, self.hop_length)
+        n_new = frames.size(0)
+        spectrum = torch.fft.rfft(frames * self.window, dim=-1).abs().pow(self.power)
+        mel_frames = (spectrum @ self.filterbank).T  # (n_mels, n_new)
+
+        # Keep the overlap with the next frame, drop fully consumed samples
+        self.pending = self.pending[n_new * self.hop_length:]
+
+        # Write the new frames over the oldest ones; only the last window's worth can survive
+        kept = min(n_new, self.window_frames)
+        positions = (self.next_frame + torch.arange(n_new - kept, n_new)) % self.window_frames
+        self.frames[:, positions] = mel_frames[:, n_new - kept:]
+        self.next_frame = (self.next_frame + n_new) % self.window_frames
+        self.total_frames += n_new
+        return n_new
+
+    def current_window(self) -> np.ndarray:
+        """
+        Return the Mel Spectrogram of the current window, shape (1, n_mels, window_frames),
+        oldest frame first. The result is a copy, so later pushes do not change it.
+        """
+        window = torch.cat([self.frames[:, self.next_frame:], self.frames[:, :self.next_frame]], dim=1)
+        return window.unsqueeze(0).numpy()
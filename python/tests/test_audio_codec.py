@@ -0,0 +1,58 @@
+import base64
+
+import numpy as np
+import pytest
+
+from audio_codec import decode_audio_fields, decode_base64_pcm, decode_float_list, decode_pcm
+
+
+def test_decode_pcm_float32_round_trip():
+    waveform = np.array([0.0, 0.5, -1.0], dtype="<f4")
+    decoded = decode_pcm(waveform.tobytes(), "float32")
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, waveform)
+
+
+def test_decode_pcm_scales_int16():
+    payload = np.array([0, 16384, -32768], dtype="<i2").tobytes()
+    np.testing.assert_array_equal(decode_pcm(payload, "int16"), np.array([0.0, 0.5, -1.0], dtype=np.float32))
+
+
+@pytest.mark.parametrize(
+    "payload, encoding",
+    [
+        (b"", "float32"),
+        (b"\x00" * 6, "float32"),
+        (b"\x00" * 3, "int16"),
+    ],
+)
+def test_decode_pcm_rejects_partial_samples(payload, encoding):
+    with pytest.raises(ValueError, match="whole number"):
+        decode_pcm(payload, encoding)
+
+
+@pytest.mark.parametrize("encoding", ["float64", "uint8", "FLOAT32"])
+def test_decode_pcm_rejects_unknown_encodings(encoding):
+    with pytest.raises(ValueError, match="Unsupported audio encoding"):
+        decode_pcm(b"\x00" * 8, encoding)
+
+
+def test_decode_base64_pcm_rejects_invalid_base64():
+    with pytest.raises(ValueError, match="base64"):
+        decode_base64_pcm("not base64!")
+
+
+@pytest.mark.parametrize("raw_audio", [[], [[0.1, 0.2]], ["a", "b"], [{"x": 1}]])
+def test_decode_float_list_rejects_malformed_lists(raw_audio):
+    with pytest.raises(ValueError):
+        decode_float_list(raw_audio)
+
+
+def test_decode_audio_fields_requires_exactly_one_field():
+    text = base64.b64encode(np.zeros(4, dtype="<f4").tobytes()).decode()
+    with pytest.raises(ValueError, match="Exactly one"):
+        decode_audio_fields(None, None)
+    with pytest.raises(ValueError, match="Exactly one"):
+        decode_audio_fields([0.0], text)
+    np.testing.assert_array_equal(decode_audio_fields(None, text), np.zeros(4, dtype=np.float32))
+    np.testing.assert_array_equal(decode_audio_fields([0.25], None), np.array([0.25], dtype=np.float32))
@@ -0,0 +1,72 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from batching import InferenceExecutor, MicroBatcher, Overloaded, predict_grouped
+
+
+def test_predict_grouped_batches_each_shape_and_keeps_order():
+    batch_shapes = []
+
+    def predict_batch(batch):
+        batch_shapes.append(batch.shape)
+        return [float(row.sum()) for row in batch]
+
+    items = [np.full(3, 1.0), np.full(5, 2.0), np.full(3, 3.0), np.full(3, 4.0), np.full(5, 5.0)]
+    predictions = predict_grouped(predict_batch, items, max_batch_size=2)
+
+    assert predictions == [3.0, 10.0, 9.0, 12.0, 25.0]
+    assert sorted(batch_shapes) == [(1, 3), (2, 3), (2, 5)]
+
+
+def test_predict_grouped_isolates_a_failing_batch():
+    def predict_batch(batch):
+        if batch.shape[1] == 4:
+            raise RuntimeError("bad shape")
+        return list(batch[:, 0])
+
+    items = [np.zeros(2), np.ones(4), np.ones(2)]
+    predictions = predict_grouped(predict_batch, items, max_batch_size=8)
+
+    assert predictions[0] == 0.0 and predictions[2] == 1.0
+    assert isinstance(predictions[1], RuntimeError)
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+def test_micro_batcher_fans_out_results_and_errors(use_executor):
+    batch_sizes = []
+
+    def predict_batch(batch):
+        batch_sizes.append(len(batch))
+        if batch.shape[1] == 1:
+            raise ValueError("too short")
+        return list(batch[:, 0])
+
+    async def run():
+        executor = InferenceExecutor(max_workers=1) if use_executor else None
+        batcher = MicroBatcher(predict_batch, max_batch_size=8, max_wait_ms=20, executor=executor)
+        items = [np.array([1.0, 0.0]), np.array([2.0, 0.0]), np.array([3.0])]
+        try:
+            return await asyncio.gather(*(batcher.predict(item) for item in items), return_exceptions=True)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    first, second, third = asyncio.run(run())
+    assert (first, second) == (1.0, 2.0)
+    assert isinstance(third, ValueError)
+    assert sorted(batch_sizes) == [1, 2]
+
+
+def test_inference_executor_rejects_work_beyond_its_backlog():
+    executor = InferenceExecutor(max_workers=1, max_queued=2)
+    try:
+        executor.reserve(2)
+        with pytest.raises(Overloaded):
+            executor.reserve()
+        executor.release(2)
+        # A single oversized request is admitted into an empty backlog
+        executor.reserve(5)
+    finally:
+        executor.shutdown()
@@ -0,0 +1,112 @@
+import asyncio
+import base64
+import json
+import struct
+from typing import AsyncIterator, List
+
+import numpy as np
+import pytest
+
+from bulk_upload import read_archive_clips, read_ndjson_clips
+
+
+async def chunked(body: bytes, size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def read_all(reader, body: bytes, chunk_size: int = 7) -> List:
+    async def collect():
+        return [clip async for clip in reader(chunked(body, chunk_size))]
+
+    return asyncio.run(collect())
+
+
+def ndjson_line(**record) -> bytes:
+    return json.dumps(record).encode() + b"\n"
+
+
+def archive_record(header, payload: bytes) -> bytes:
+    header_bytes = json.dumps(header).encode()
+    return struct.pack("<I", len(header_bytes)) + header_bytes + payload
+
+
+def test_ndjson_clips_are_decoded_and_blank_lines_skipped():
+    samples = np.array([100, -200], dtype="<i2").tobytes()
+    body = (
+        ndjson_line(raw_audio=[0.5, 0.25], audio_label="Reece", ml_model_type="Logistic Regression")
+        + b"\n   \n"
+        + ndjson_line(
+            raw_audio_b64=base64.b64encode(samples).decode(),
+            audio_encoding="int16",
+            audio_label="Eric",
+            ml_model_type="Spectrogram CNN",
+        ).rstrip(b"\n")
+    )
+    clips = read_all(read_ndjson_clips, body)
+
+    assert [(clip.audio_label, clip.model_type) for clip in clips] == [
+        ("Reece", "Logistic Regression"),
+        ("Eric", "Spectrogram CNN"),
+    ]
+    np.testing.assert_allclose(clips[1].waveform, np.array([100, -200]) / 32768.0)
+
+
+@pytest.mark.parametrize(
+    "bad_line, message",
+    [
+        (b"{not json", "Line 2"),
+        (b"[1, 2, 3]", "Line 2: Expected a JSON object"),
+        (ndjson_line(raw_audio=[0.1], ml_model_type="Spectrogram CNN"), "Line 2: Missing string field 'audio_label'"),
+        (ndjson_line(raw_audio=[0.1], audio_label=3, ml_model_type="Spectrogram CNN"), "Line 2: Missing string"),
+        (ndjson_line(raw_audio={"a": 1}, audio_label="Reece", ml_model_type="Spectrogram CNN"), "Line 2"),
+        (ndjson_line(raw_audio_b64=5, audio_label="Reece", ml_model_type="Spectrogram CNN"), "Line 2"),
+        (ndjson_line(audio_label="Reece", ml_model_type="Spectrogram CNN"), "Line 2: Exactly one"),
+    ],
+)
+def test_ndjson_malformed_records_name_their_line(bad_line, message):
+    good_line = ndjson_line(raw_audio=[0.1], audio_label="Reece", ml_model_type="Spectrogram CNN")
+    with pytest.raises(ValueError, match=message):
+        read_all(read_ndjson_clips, good_line + bad_line)
+
+
+def test_archive_clips_are_decoded():
+    body = archive_record(
+        {"audio_label": "Reece", "ml_model_type": "Spectrogram CNN", "n_samples": 2},
+        np.array([0.5, -0.5], dtype="<f4").tobytes(),
+    ) + archive_record(
+        {"audio_label": "Eric", "ml_model_type": "Spectrogram CNN", "audio_encoding": "int16", "n_samples": 1},
+        np.array([16384], dtype="<i2").tobytes(),
+    )
+    clips = read_all(read_archive_clips, body, chunk_size=3)
+
+    assert [clip.audio_label for clip in clips] == ["Reece", "Eric"]
+    np.testing.assert_array_equal(clips[0].waveform, np.array([0.5, -0.5], dtype=np.float32))
+    np.testing.assert_array_equal(clips[1].waveform, np.array([0.5], dtype=np.float32))
+
+
+GOOD_HEADER = {"audio_label": "Reece", "ml_model_type": "Spectrogram CNN", "n_samples": 2}
+GOOD_PAYLOAD = np.zeros(2, dtype="<f4").tobytes()
+
+
+@pytest.mark.parametrize(
+    "bad_record, message",
+    [
+        (archive_record(GOOD_HEADER, GOOD_PAYLOAD[:5]), "Record 2: Body ended"),
+        (archive_record(GOOD_HEADER, b""), "Record 2: Body ended"),
+        (b"\x05\x00", "Record 2: Body ended"),
+        (struct.pack("<I", 0), "Record 2: Header length 0 is out of range"),
+        (struct.pack("<I", 1 << 30), "Record 2: Header length"),
+        (struct.pack("<I", 5) + b"{oops", "Record 2"),
+        (archive_record([1, 2], GOOD_PAYLOAD), "Record 2: Expected a JSON object header"),
+        (archive_record({**GOOD_HEADER, "audio_encoding": "float64"}, GOOD_PAYLOAD), "Record 2: Unsupported"),
+        (archive_record({**GOOD_HEADER, "audio_encoding": ["int16"]}, GOOD_PAYLOAD), "Record 2"),
+        (archive_record({**GOOD_HEADER, "n_samples": "2"}, GOOD_PAYLOAD), "Record 2: Missing positive integer"),
+        (archive_record({**GOOD_HEADER, "n_samples": 0}, b""), "Record 2: Missing positive integer"),
+        (archive_record({**GOOD_HEADER, "audio_label": None}, GOOD_PAYLOAD), "Record 2: Missing string field"),
+    ],
+)
+def test_archive_malformed_records_name_their_record(bad_record, message):
+    body = archive_record(GOOD_HEADER, GOOD_PAYLOAD) + bad_record
+    with pytest.raises(ValueError, match=message):
+        read_all(read_archive_clips, body)
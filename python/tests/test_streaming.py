@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import torch
+import torchaudio.transforms as T
+
+from featurizer import MEL_SPECTROGRAM_PARAMS
+from streaming import StreamingMelSpectrogram
+
+WINDOW_FRAMES = 16
+
+
+def offline_frames(signal: np.ndarray) -> np.ndarray:
+    # Streams have no reflect padding at their start, so compare with uncentered frames
+    transform = T.MelSpectrogram(**MEL_SPECTROGRAM_PARAMS, center=False)
+    return transform(torch.from_numpy(signal)).numpy()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streaming_window_matches_offline_mel_spectrogram(seed):
+    rng = np.random.default_rng(seed)
+    signal = rng.standard_normal(MEL_SPECTROGRAM_PARAMS["hop_length"] * 40).astype(np.float32)
+    stream = StreamingMelSpectrogram(MEL_SPECTROGRAM_PARAMS, WINDOW_FRAMES)
+
+    position = 0
+    while position < len(signal):
+        size = int(rng.integers(1, 3000))
+        stream.push(signal[position:position + size])
+        position += size
+
+    expected = offline_frames(signal)
+    assert stream.total_frames == expected.shape[1]
+    assert stream.is_full
+    window = stream.current_window()
+    assert window.shape == (1, MEL_SPECTROGRAM_PARAMS["n_mels"], WINDOW_FRAMES)
+    np.testing.assert_allclose(window[0], expected[:, -WINDOW_FRAMES:], rtol=1e-4, atol=1e-4)
+
+
+def test_streaming_window_is_a_copy_and_fills_gradually():
+    hop_length = MEL_SPECTROGRAM_PARAMS["hop_length"]
+    stream = StreamingMelSpectrogram(MEL_SPECTROGRAM_PARAMS, WINDOW_FRAMES)
+
+    assert stream.push(np.ones(MEL_SPECTROGRAM_PARAMS["n_fft"] - 1, dtype=np.float32)) == 0
+    assert stream.push(np.ones(1, dtype=np.float32)) == 1
+    assert not stream.is_full
+
+    window = stream.current_window()
+    snapshot = window.copy()
+    stream.push(np.ones(hop_length * WINDOW_FRAMES, dtype=np.float32))
+    np.testing.assert_array_equal(window, snapshot)
+    assert stream.is_full
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import torch
+import torchaudio.transforms as T
+
+from featurizer import MEL_SPECTROGRAM_PARAMS
+from transcription import compute_mel_spectrogram_frames, merge_segments, transcribe
+
+LABELS = ["Reece", "Eric"]
+
+
+def test_merge_segments_merges_runs_of_one_label():
+    segments = merge_segments(
+        np.array([0, 0, 1, 1, 1, 0]),
+        np.array([0.9, 0.7, 0.8, 0.8, 0.5, 0.6]),
+        LABELS,
+        window_s=0.2,
+        hop_s=0.1,
+    )
+    assert [(s["label"], s["start_s"], s["end_s"], s["windows"]) for s in segments] == [
+        ("Reece", 0.05, 0.25, 2),
+        ("Eric", 0.25, 0.55, 3),
+        ("Reece", 0.55, 0.65, 1),
+    ]
+    assert segments[0]["confidence"] == pytest.approx(0.8)
+
+
+def test_merge_segments_splits_on_low_confidence_windows():
+    segments = merge_segments(
+        np.array([0, 0, 0]), np.array([0.9, 0.1, 0.9]), LABELS, window_s=0.2, hop_s=0.1, min_confidence=0.5
+    )
+    assert [(s["start_s"], s["end_s"]) for s in segments] == [(0.05, 0.15), (0.25, 0.35)]
+
+
+def test_merge_segments_clips_to_duration_and_drops_later_segments():
+    segments = merge_segments(
+        np.array([0, 0, 1, 1]), np.ones(4), LABELS, window_s=0.2, hop_s=0.1, duration_s=0.2
+    )
+    assert [(s["label"], s["start_s"], s["end_s"]) for s in segments] == [("Reece", 0.05, 0.2)]
+
+
+def test_compute_mel_spectrogram_frames_matches_torchaudio():
+    signal = np.random.default_rng(0).standard_normal(10_000).astype(np.float32)
+    expected = T.MelSpectrogram(**MEL_SPECTROGRAM_PARAMS)(torch.from_numpy(signal)).numpy()
+    np.testing.assert_allclose(
+        compute_mel_spectrogram_frames(signal, MEL_SPECTROGRAM_PARAMS), expected, rtol=1e-4, atol=1e-4
+    )
+
+
+def test_transcribe_clips_notes_of_a_recording_shorter_than_a_window():
+    window_samples = MEL_SPECTROGRAM_PARAMS["hop_length"] * 8
+    n_samples = 10
+
+    def classify(batch):
+        return torch.tensor([[5.0, 0.0]]).repeat(len(batch), 1)
+
+    result = transcribe(
+        np.zeros(n_samples, dtype=np.float32), classify, LABELS, MEL_SPECTROGRAM_PARAMS, window_samples, hop_s=0.01
+    )
+
+    duration_s = n_samples / MEL_SPECTROGRAM_PARAMS["sample_rate"]
+    assert result["n_windows"] == 1
+    assert result["duration_s"] == round(duration_s, 4)
+    # The lone window's note lies past the end of the 10-sample recording
+    assert all(note["end_s"] <= result["duration_s"] for note in result["notes"])
@@ -0,0 +1,222 @@
+"""
+CPU-bound training routines executed in the training process pool.
+
+Every function here is a plain, top-level function that takes and returns
+picklable values (NumPy arrays, scikit-learn estimators, PyTorch state dicts),
+so it can be shipped to a worker process by `concurrent.futures`. The CNN
+streams its training data from MongoDB itself, see `dataset_loader.py`.
+"""
+
+from typing import Any, Dict, Tuple, Union
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.linear_model import LogisticRegression
+from torch.utils.data import DataLoader
+
+from dataset_loader import MongoFeatureDataset
+from featurizer import CNN_WINDOW_FRAMES, MEL_SPECTROGRAM_PARAMS
+from networks import MelSpectrogramCNN
+from online_learning import OnlineLogisticRegression
+
+
+def initialize_training_worker(torch_threads: int) -> None:
+    """
+    Process pool initializer that caps the number of intra-op threads used by
+    PyTorch, so training does not starve the serving process of cores.
+    """
+    torch.set_num_threads(torch_threads)
+
+
+def retrain_logistic_regression_model(
+    model: Union[LogisticRegression, OnlineLogisticRegression],
+    features: np.ndarray,
+    labels: np.ndarray,
+) -> Tuple[Union[LogisticRegression, OnlineLogisticRegression], float]:
+    """
+    Retrain the Logistic Regression model using the provided features and labels.
+    """
+    if isinstance(model, OnlineLogisticRegression):
+        accuracy = model.full_refit(features, labels)
+        return model, accuracy
+
+    model.fit(features, labels)
+
+    # Evaluate training accuracy
+    accuracy = 100 * model.score(features, labels)
+
+    return model, accuracy
+
+
+def update_logistic_regression_model(
+    model: OnlineLogisticRegression,
+    features: np.ndarray,
+    labels: np.ndarray,
+) -> Tuple[OnlineLogisticRegression, float]:
+    """
+    Incrementally update an online Logistic Regression model on new points only.
+    """
+    accuracy = model.partial_update(features, labels)
+    return model, accuracy
+
+
+def retrain_pytorch_model(
+    state_dict: Dict[str, torch.Tensor],
+    dataset: MongoFeatureDataset,
+    shuffle_buffer_size: int = 1024,
+) -> Tuple[Dict[str, torch.Tensor], float]:
+    """
+    Retrain the Spectrogram CNN, starting from `state_dict`, on features streamed
+    from MongoDB by `dataset`. Returns the new state dict and the resubstitution
+    accuracy. Memory use is bounded by the batch and shuffle buffer sizes, not by
+    the number of stored data points.
+    """
+    model = MelSpectrogramCNN(n_mels=MEL_SPECTROGRAM_PARAMS["n_mels"], n_frames=CNN_WINDOW_FRAMES)
+    model.load_state_dict(state_dict)
+
+    # Stream shuffled batches for training, and batches in storage order for evaluation
+    train_dataloader = DataLoader(dataset.shuffled(shuffle_buffer_size), batch_size=32)
+    eval_dataloader = DataLoader(dataset, batch_size=32)
+
+    # Define loss function and optimizer
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+
+    # Training loop
+    for epoch in range(5):  # Train for 5 epochs
+        for batch_features, batch_labels in train_dataloader:
+            # Forward pass
+            outputs = model(batch_features)
+            loss = criterion(outputs, batch_labels)
+
+            # Backward and optimize
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+    # Evaluate accuracy
+    with torch.no_grad():
+        correct: int = 0
+        total: int = 0
+        for batch_features, batch_labels in eval_dataloader:
+            # Make predictions with batch of features
+            outputs = model(batch_features)
+            _, predicted = torch.max(outputs.data, 1)
+
+            # Increment total correct and total logged in batch accordingly
+            total += batch_labels.size(0)
+            correct += (predicted == batch_labels).sum().item()
+
+    # Calculate accuracy and return both the trained weights and accuracy
+    accuracy = (correct / total) * 100
+    return model.state_dict(), accuracy
+
+
+def fine_tune_pytorch_model(
+    state_dict: Dict[str, torch.Tensor],
+    new_features: np.ndarray,
+    new_labels: np.ndarray,
+    replay_features: np.ndarray,
+    replay_labels: np.ndarray,
+    max_steps: int = 30,
+    batch_size: int = 32,
+    holdout_fraction: float = 0.2,
+    eval_interval: int = 5,
+    patience: int = 2,
+) -> Tuple[Dict[str, torch.Tensor], int, Dict[str, Any]]:
+    """
+    Fine-tune the Spectrogram CNN, starting from `state_dict`, on new points
+    mixed with a replay sample of earlier ones, in at most `max_steps` steps.
+
+    Each minibatch holds up to half new points and fills the rest from the
+    replay sample. A `holdout_fraction` of the replay sample is held out; every
+    `eval_interval` steps, and after the last step, the loss on it is checked,
+    and training stops once it has not improved `patience` times in a row. The checkpoint with the lowest
+    held-out loss is returned, which limits how much the model can forget of
+    the earlier data while it fits the new points.
+
+    Returns
+    -------
+    Tuple[Dict[str, torch.Tensor], int, Dict[str, Any]]
+        The new state dict, the number of new points the model classified
+        correctly before the fine-tune, and the steps taken and held-out loss.
+    """
+    model = MelSpectrogramCNN(n_mels=MEL_SPECTROGRAM_PARAMS["n_mels"], n_frames=CNN_WINDOW_FRAMES)
+    model.load_state_dict(state_dict)
+    new_inputs, new_targets = torch.from_numpy(new_features), torch.from_numpy(new_labels).long()
+
+    # Score the new points before training on them, for the running accuracy
+    model.eval()
+    with torch.no_grad():
+        correct = int((model(new_inputs).argmax(dim=1) == new_targets).sum())
+
+    # Hold out part of the replay sample to stop on, if it is big enough to tell
+    generator = torch.Generator().manual_seed(0)
+    order = torch.randperm(len(replay_labels), generator=generator)
+    n_holdout = int(len(order) * holdout_fraction) if len(order) >= 5 else 0
+    holdout_inputs = torch.from_numpy(replay_features[order[:n_holdout].numpy()])
+    holdout_targets = torch.from_numpy(replay_labels[order[:n_holdout].numpy()]).long()
+    replay_inputs = torch.from_numpy(replay_features[order[n_holdout:].numpy()])
+    replay_targets = torch.from_numpy(replay_labels[order[n_holdout:].numpy()]).long()
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.0005)
+
+    def snapshot() -> Dict[str, torch.Tensor]:
+        return {name: tensor.clone() for name, tensor in model.state_dict().items()}
+
+    def checkpoint() -> bool:
+        """
+        Keep the current weights if their held-out loss is the lowest so far.
+        """
+        nonlocal best_loss, best_state
+        model.eval()
+        with torch.no_grad():
+            loss = float(criterion(model(holdout_inputs), holdout_targets))
+        model.train()
+        if loss < best_loss:
+            best_loss, best_state = loss, snapshot()
+            return True
+        return False
+
+    # The first evaluation always takes a checkpoint, so the new points are learned from
+    best_loss = float("inf") if n_holdout else None
+    best_state = snapshot()
+    evaluations_without_improvement = 0
+    n_new = min(len(new_targets), batch_size // 2 if len(replay_targets) else batch_size)
+    n_replay = min(len(replay_targets), batch_size - n_new)
+
+    model.train()
+    steps = 0
+    while steps < max_steps:
+        new_index = torch.randperm(len(new_targets), generator=generator)[:n_new]
+        replay_index = torch.randperm(len(replay_targets), generator=generator)[:n_replay]
+        batch_inputs = torch.cat([new_inputs[new_index], replay_inputs[replay_index]])
+        batch_targets = torch.cat([new_targets[new_index], replay_targets[replay_index]])
+
+        loss = criterion(model(batch_inputs), batch_targets)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        steps += 1
+
+        if best_loss is not None and steps % eval_interval == 0:
+            if checkpoint():
+                evaluations_without_improvement = 0
+            else:
+                evaluations_without_improvement += 1
+                if evaluations_without_improvement >= patience:
+                    break
+    else:
+        # Evaluate the steps since the last evaluation too (all of them if
+        # `max_steps < eval_interval`), unless training stopped early
+        if best_loss is not None and steps % eval_interval != 0:
+            checkpoint()
+
+    # Without a held-out slice there is nothing to stop on: keep the last weights
+    if best_loss is None:
+        best_state = model.state_dict()
+    if best_loss == float("inf"):
+        best_loss = None  # No steps were taken
+    return best_state, correct, {"steps": steps, "holdout_loss": best_loss}
@@ -0,0 +1,288 @@
+"""
+Background training job scheduler.
+
+Uploads no longer retrain inline. Each upload is attached to a training job for
+its model type and the endpoint returns the job id immediately. Jobs for the same
+model type run one at a time; while one is running, any further uploads are
+coalesced into a single queued job, so a burst of N uploads costs at most two
+retrains instead of N.
+
+The CPU-bound work of a job is expected to run in a process pool (see
+`training.py`); this module only manages job bookkeeping on the event loop.
+
+`TrainingJobScheduler` keeps jobs in memory, for a single server process.
+`SharedTrainingJobScheduler` keeps them in MongoDB, so that when several server
+processes share one dataset, uploads to any of them are trained on by a single
+trainer process, and any of them can report a job's status.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+from metrics import TRAINING_JOBS, TRAINING_SECONDS
+
+
+@dataclass
+class TrainingJob:
+    """
+    A (possibly coalesced) retrain request for one model type.
+    """
+    model_type: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # "queued", "running", "succeeded", "failed"
+    instance_ids: List[Any] = field(default_factory=list)
+    full_retrain: bool = False  # Retrain on all data even if an incremental update would do
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def coalesced_uploads(self) -> int:
+        return len(self.instance_ids)
+
+
+class TrainingJobScheduler:
+    """
+    Coalescing, per-model-type serial scheduler for training jobs.
+
+    Parameters
+    ----------
+    run_job : Callable[[TrainingJob], Awaitable[Dict[str, Any]]]
+        Coroutine that performs the retrain for a job and returns its result.
+    max_finished_jobs : int
+        Number of finished jobs kept around for status queries.
+    """
+
+    def __init__(
+        self,
+        run_job: Callable[[TrainingJob], Awaitable[Dict[str, Any]]],
+        max_finished_jobs: int = 1000,
+    ):
+        self.run_job = run_job
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self.queued: Dict[str, TrainingJob] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+
+    async def submit(
+        self,
+        model_type: str,
+        instance_ids: Sequence[Any] = (),
+        full_retrain: bool = False,
+    ) -> TrainingJob:
+        """
+        Attach newly inserted instances to the queued job for `model_type`,
+        creating the job if needed, and make sure a worker is draining the queue.
+        With `full_retrain`, the queued job retrains on all data.
+        """
+        job = self.queued.get(model_type)
+        if job is None:
+            job = TrainingJob(model_type=model_type)
+            self.queued[model_type] = job
+            self.jobs[job.id] = job
+            self._evict_finished_jobs()
+        job.instance_ids.extend(instance_ids)
+        job.full_retrain = job.full_retrain or full_retrain
+
+        if model_type not in self.workers:
+            self.workers[model_type] = asyncio.create_task(self._drain(model_type))
+        return job
+
+    async def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self.jobs.get(job_id)
+
+    async def queue_depth(self, model_type: str) -> int:
+        """
+        Return the number of uploads waiting in the queued job for `model_type`.
+        """
+        job = self.queued.get(model_type)
+        return job.coalesced_uploads if job is not None else 0
+
+    async def _drain(self, model_type: str) -> None:
+        """
+        Run queued jobs for `model_type` one after another until none are left.
+        """
+        while model_type in self.queued:
+            job = self.queued.pop(model_type)
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self.run_job(job)
+                job.status = "succeeded"
+            except Exception as error:
+                job.error = repr(error)
+                job.status = "failed"
+            job.finished_at = time.time()
+            TRAINING_JOBS.inc(model_type=model_type, status=job.status)
+            TRAINING_SECONDS.observe(job.finished_at - job.started_at, model_type=model_type)
+        del self.workers[model_type]
+
+    def _evict_finished_jobs(self) -> None:
+        finished = [
+            job_id for job_id, job in self.jobs.items()
+            if job.status in ("succeeded", "failed")
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+
+class SharedTrainingJobScheduler:
+    """
+    Coalescing, per-model-type serial scheduler for training jobs, shared by
+    several server processes through a MongoDB collection.
+
+    Any process can submit uploads and look up jobs; only the process that
+    calls `start` (the trainer) claims and runs them. Uploads join the queued
+    job of their model type, and the trainer claims a job by atomically moving
+    it to "running", so later uploads start a new queued job, as in
+    `TrainingJobScheduler`. Two processes creating a queued job at the same
+    moment can at worst leave two queued jobs, which then run one after another.
+
+    Parameters
+    ----------
+    collection : AsyncIOMotorCollection
+        Collection holding one document per job.
+    run_job : Callable[[TrainingJob], Awaitable[Dict[str, Any]]]
+        Coroutine that performs the retrain for a job and returns its result.
+    poll_interval_s : float
+        How often the trainer looks for jobs submitted by other processes.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        run_job: Callable[[TrainingJob], Awaitable[Dict[str, Any]]],
+        poll_interval_s: float = 0.5,
+    ):
+        self.collection = collection
+        self.run_job = run_job
+        self.poll_interval_s = poll_interval_s
+        self.wake_events: Dict[str, asyncio.Event] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+
+    async def submit(
+        self,
+        model_type: str,
+        instance_ids: Sequence[Any] = (),
+        full_retrain: bool = False,
+    ) -> TrainingJob:
+        """
+        Attach newly inserted instances to the queued job for `model_type`,
+        creating the job if needed. With `full_retrain`, the queued job
+        retrains on all data.
+        """
+        update: Dict[str, Any] = {
+            "$setOnInsert": {"_id": uuid.uuid4().hex, "created_at": time.time()},
+        }
+        if instance_ids:
+            update["$push"] = {"instance_ids": {"$each": list(instance_ids)}}
+        if full_retrain:
+            update["$set"] = {"full_retrain": True}
+        document = await self.collection.find_one_and_update(
+            {"model_type": model_type, "status": "queued"},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        # Start a job right away if it was submitted to the trainer itself
+        if model_type in self.wake_events:
+            self.wake_events[model_type].set()
+        return _job_from_document(document)
+
+    async def get(self, job_id: str) -> Optional[TrainingJob]:
+        document = await self.collection.find_one({"_id": job_id})
+        return _job_from_document(document) if document is not None else None
+
+    async def queue_depth(self, model_type: str) -> int:
+        """
+        Return the number of uploads waiting in the queued job for `model_type`.
+        """
+        document = await self.collection.find_one(
+            {"model_type": model_type, "status": "queued"}, {"instance_ids": 1}
+        )
+        return len(document.get("instance_ids", [])) if document is not None else 0
+
+    def start(self, model_types: Iterable[str]) -> None:
+        """
+        Make this process the trainer: claim and run the jobs of `model_types`.
+        """
+        for model_type in model_types:
+            self.wake_events[model_type] = asyncio.Event()
+            self.workers[model_type] = asyncio.create_task(self._work(model_type))
+
+    async def stop(self) -> None:
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+
+    async def _work(self, model_type: str) -> None:
+        """
+        Run the jobs of `model_type` one after another, oldest first.
+        """
+        # Jobs left running by a trainer that stopped are run again
+        await self.collection.update_many(
+            {"model_type": model_type, "status": "running"},
+            {"$set": {"status": "queued", "started_at": None}},
+        )
+
+        wake_event = self.wake_events[model_type]
+        while True:
+            wake_event.clear()
+            document = await self.collection.find_one_and_update(
+                {"model_type": model_type, "status": "queued"},
+                {"$set": {"status": "running", "started_at": time.time()}},
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if document is None:
+                try:
+                    await asyncio.wait_for(wake_event.wait(), self.poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job = _job_from_document(document)
+            try:
+                job.result = await self.run_job(job)
+                job.status = "succeeded"
+            except Exception as error:
+                job.error = repr(error)
+                job.status = "failed"
+            job.finished_at = time.time()
+            TRAINING_JOBS.inc(model_type=model_type, status=job.status)
+            TRAINING_SECONDS.observe(job.finished_at - job.started_at, model_type=model_type)
+
+            await self.collection.update_one(
+                {"_id": job.id},
+                {"$set": {
+                    "status": job.status,
+                    "finished_at": job.finished_at,
+                    "result": job.result,
+                    "error": job.error,
+                }},
+            )
+
+
+def _job_from_document(document: Dict[str, Any]) -> TrainingJob:
+    return TrainingJob(
+        model_type=document["model_type"],
+        id=document["_id"],
+        status=document.get("status", "queued"),
+        instance_ids=document.get("instance_ids", []),
+        full_retrain=document.get("full_retrain", False),
+        created_at=document.get("created_at", time.time()),
+        started_at=document.get("started_at"),
+        finished_at=document.get("finished_at"),
+        result=document.get("result"),
+        error=document.get("error"),
+    )
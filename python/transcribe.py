@@ -0,0 +1,159 @@
+#!usr/bin/python
+"""
+Transcribe a long recording into a time-stamped sequence of labels.
+
+The recording is cut into overlapping windows that are classified in large
+batches, with the Mel Spectrogram of the whole recording computed only once
+(see `transcription.py`). Two models are supported:
+
+    server -> the Spectrogram CNN served by `main.py` (CNN_WINDOW_MS windows)
+    pitch  -> the 12-class pitch model exported by `export_to_coreml.py` (100 ms windows)
+
+The recording must be a PCM WAV file or a 1-D `.npy` array, at 44.1 kHz.
+
+Usage:
+    python transcribe.py recording.wav [--model server] [--weights PATH]
+                         [--hop-ms 50] [--batch-size 32] [--min-confidence 0.0]
+                         [--output notes.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+import wave
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from featurizer import (
+    CNN_WINDOW_FRAMES,
+    CNN_WINDOW_SAMPLES,
+    COREML_MEL_SPECTROGRAM_PARAMS,
+    COREML_WINDOW_SAMPLES,
+    MEL_SPECTROGRAM_PARAMS,
+)
+from transcription import PITCH_CLASS_NAMES, transcribe
+
+# Default weights of each model, relative to this directory
+DEFAULT_WEIGHTS = {
+    "server": "../ml_models/mel_spectrogram_cnn.pth",
+    "pitch": "./pytorch_model/mel_spectrogram_cnn.pth",
+}
+
+# Class names of the served Spectrogram CNN, in the label encoder order of `main.py`
+SERVER_LABELS: Tuple[str, ...] = ("Chris", "Reece")
+
+# Scale of each WAV sample width onto [-1.0, 1.0)
+_WAV_DTYPES = {1: (np.uint8, 128.0), 2: (np.dtype("<i2"), 32768.0), 4: (np.dtype("<i4"), 2147483648.0)}
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording", help="PCM WAV file or 1-D .npy array")
+    parser.add_argument("--model", default="server", choices=sorted(DEFAULT_WEIGHTS))
+    parser.add_argument("--weights", help="State dict of the model (default depends on --model)")
+    parser.add_argument("--labels", help="Comma-separated class names, in class order")
+    parser.add_argument("--hop-ms", type=float, default=50.0, help="Time between window starts")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-confidence", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, help="PyTorch intra-op threads")
+    parser.add_argument("--output", help="Write the JSON result here instead of to stdout")
+    return parser.parse_args()
+
+
+def read_recording(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Read a mono float32 signal and its sample rate from a PCM WAV file, mixing
+    down multiple channels, or from a `.npy` array (assumed to be at 44.1 kHz).
+    """
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float32).reshape(-1), MEL_SPECTROGRAM_PARAMS["sample_rate"]
+
+    with wave.open(path, "rb") as recording:
+        sample_width = recording.getsampwidth()
+        if sample_width not in _WAV_DTYPES:
+            raise ValueError(f"Unsupported WAV sample width of {sample_width} bytes")
+        n_channels = recording.getnchannels()
+        sample_rate = recording.getframerate()
+        payload = recording.readframes(recording.getnframes())
+
+    dtype, scale = _WAV_DTYPES[sample_width]
+    samples = np.frombuffer(payload, dtype=dtype).reshape(-1, n_channels)
+    signal = samples.mean(axis=1, dtype=np.float32)
+    if sample_width == 1:
+        signal -= 128.0
+    return signal / np.float32(scale), sample_rate
+
+
+def load_model(
+    name: str, weights: str
+) -> Tuple[Callable[[torch.Tensor], torch.Tensor], Dict[str, Any], int, Sequence[str]]:
+    """
+    Load a model and return its classifier over Mel Spectrogram windows, its
+    Mel Spectrogram parameters, window length in samples, and class names.
+    """
+    state_dict = torch.load(weights, map_location="cpu")
+    if name == "pitch":
+        from export_to_coreml import MelSpectrogramCNN as PitchCNN
+
+        model = PitchCNN()
+        model.load_state_dict(state_dict)
+        model.eval()
+        return model.classify_mel_spectrogram, COREML_MEL_SPECTROGRAM_PARAMS, COREML_WINDOW_SAMPLES, PITCH_CLASS_NAMES
+
+    from networks import MelSpectrogramCNN
+
+    model = MelSpectrogramCNN(n_mels=MEL_SPECTROGRAM_PARAMS["n_mels"], n_frames=CNN_WINDOW_FRAMES)
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model, MEL_SPECTROGRAM_PARAMS, CNN_WINDOW_SAMPLES, SERVER_LABELS
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    if arguments.threads:
+        torch.set_num_threads(arguments.threads)
+
+    classify, mel_spectrogram_params, window_samples, labels = load_model(
+        arguments.model, arguments.weights or DEFAULT_WEIGHTS[arguments.model]
+    )
+    if arguments.labels:
+        labels = arguments.labels.split(",")
+
+    signal, sample_rate = read_recording(arguments.recording)
+    if sample_rate != mel_spectrogram_params["sample_rate"]:
+        sys.exit(
+            f"{arguments.recording} is sampled at {sample_rate} Hz; "
+            f"the model expects {mel_spectrogram_params['sample_rate']} Hz"
+        )
+
+    start = time.perf_counter()
+    result = transcribe(
+        signal,
+        classify,
+        labels,
+        mel_spectrogram_params,
+        window_samples,
+        hop_s=arguments.hop_ms / 1000,
+        batch_size=arguments.batch_size,
+        min_confidence=arguments.min_confidence,
+    )
+    seconds = time.perf_counter() - start
+
+    output = json.dumps(result, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+    print(
+        f"Transcribed {result['duration_s']:.1f} s of audio ({result['n_windows']} windows) "
+        f"in {seconds:.2f} s, {result['duration_s'] / seconds:.0f}x real time",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Offline transcription of long recordings with batched sliding-window inference.
+
+The models classify one fixed-size window of audio at a time. To label a whole
+recording, it is cut into overlapping windows every `hop` and each window is
+classified. Featurizing every window separately would compute each STFT frame
+`window / hop` times over, so instead:
+
+1. The Mel Spectrogram of the whole recording is computed once, a block of
+   frames at a time. The STFT frames are a strided view of the (reflect padded)
+   signal, so framing copies nothing, and memory is bounded by the block size.
+   With the same centering, window and filterbank as `T.MelSpectrogram`, the
+   frames are those the featurizer computes.
+2. The Mel Spectrogram of every window is a strided view of that matrix,
+   `window_frames` wide and `hop_frames` apart, so windows copy nothing either.
+3. The windows go through the CNN `batch_size` at a time, and consecutive
+   windows with the same label are merged into time-stamped segments.
+
+A window's frames are identical to those of the clip on its own, except near
+the window's edges, where they see the neighbouring audio instead of padding.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from featurizer import mel_spectrogram_transform
+
+# Names of the 12 pitch classes of the on-device pitch model, in class order
+PITCH_CLASS_NAMES: Tuple[str, ...] = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# Number of STFT frames computed together when building the whole-signal Mel Spectrogram
+MEL_BLOCK_FRAMES = 4096
+
+
+def window_frame_count(window_samples: int, mel_spectrogram_params: Dict[str, Any]) -> int:
+    """
+    Return the number of Mel frames of a window of `window_samples` samples.
+    """
+    return 1 + window_samples // mel_spectrogram_params["hop_length"]
+
+
+def compute_mel_spectrogram_frames(signal: np.ndarray, mel_spectrogram_params: Dict[str, Any]) -> np.ndarray:
+    """
+    Compute the Mel Spectrogram of a whole signal, shape (n_mels, 1 + n_samples // hop_length),
+    equal to `T.MelSpectrogram(**mel_spectrogram_params)(signal)`.
+    """
+    transform = mel_spectrogram_transform(mel_spectrogram_params)
+    n_fft: int = transform.spectrogram.n_fft
+    hop_length: int = transform.spectrogram.hop_length
+    power: float = transform.spectrogram.power
+    window = transform.spectrogram.window.numpy()
+    filterbank = transform.mel_scale.fb  # (n_freqs, n_mels)
+
+    # Center the frames like `torch.stft(center=True)`, with reflect padding
+    signal = np.asarray(signal, dtype=np.float32)
+    padded = np.pad(signal, n_fft // 2, mode="reflect" if len(signal) > n_fft // 2 else "constant")
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+
+    mel_frames = np.empty((filterbank.size(1), len(frames)), dtype=np.float32)
+    with torch.inference_mode():
+        for start in range(0, len(frames), MEL_BLOCK_FRAMES):
+            block = torch.from_numpy(frames[start:start + MEL_BLOCK_FRAMES] * window)
+            spectrum = torch.fft.rfft(block, dim=-1).abs().pow(power)
+            mel_frames[:, start:start + len(block)] = (spectrum @ filterbank).T.numpy()
+    return mel_frames
+
+
+def sliding_mel_windows(mel_frames: np.ndarray, window_frames: int, hop_frames: int) -> np.ndarray:
+    """
+    Return a read-only strided view of the Mel Spectrogram windows of
+    `mel_frames`, shape (n_windows, 1, n_mels, window_frames).
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(mel_frames, window_frames, axis=1)[:, ::hop_frames]
+    return windows.transpose(1, 0, 2)[:, np.newaxis]
+
+
+def classify_windows(
+    classify: Callable[[torch.Tensor], torch.Tensor],
+    windows: np.ndarray,
+    batch_size: int = 32,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classify the Mel Spectrogram `windows` in batches of `batch_size`.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The predicted class index and its softmax probability, per window.
+    """
+    predictions = np.empty(len(windows), dtype=np.int64)
+    confidences = np.empty(len(windows), dtype=np.float32)
+    with torch.inference_mode():
+        for start in range(0, len(windows), batch_size):
+            # The only copy of a window's features, one batch at a time
+            batch = torch.from_numpy(np.array(windows[start:start + batch_size]))
+            probabilities = torch.softmax(classify(batch), dim=1)
+            confidence, prediction = probabilities.max(dim=1)
+            predictions[start:start + len(batch)] = prediction.numpy()
+            confidences[start:start + len(batch)] = confidence.numpy()
+    return predictions, confidences
+
+
+def merge_segments(
+    predictions: np.ndarray,
+    confidences: np.ndarray,
+    labels: Sequence[str],
+    window_s: float,
+    hop_s: float,
+    min_confidence: float = 0.0,
+    duration_s: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Merge runs of consecutive windows with the same label into segments.
+
+    Window `i` stands for the `hop_s` seconds around its center, so segments
+    tile the recording without overlapping. Windows classified with less than
+    `min_confidence` end the current segment and are left out. Given the
+    `duration_s` of the recording, segments are clipped to it, and those that
+    lie past its end (e.g. for a recording shorter than one window, which was
+    zero-padded) are dropped.
+    """
+    segments: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for index, (prediction, confidence) in enumerate(zip(predictions, confidences)):
+        if confidence < min_confidence:
+            current = None
+            continue
+        center = index * hop_s + window_s / 2
+        label = labels[prediction]
+        if current is not None and current["label"] == label:
+            current["end_s"] = center + hop_s / 2
+            current["confidence"] += float(confidence)
+            current["windows"] += 1
+            continue
+        current = {
+            "label": label,
+            "start_s": max(0.0, center - hop_s / 2),
+            "end_s": center + hop_s / 2,
+            "confidence": float(confidence),
+            "windows": 1,
+        }
+        segments.append(current)
+
+    if duration_s is not None:
+        for segment in segments:
+            segment["start_s"] = min(segment["start_s"], duration_s)
+            segment["end_s"] = min(segment["end_s"], duration_s)
+        segments = [segment for segment in segments if segment["end_s"] > segment["start_s"]]
+
+    for segment in segments:
+        segment["start_s"] = round(segment["start_s"], 4)
+        segment["end_s"] = round(segment["end_s"], 4)
+        segment["confidence"] = round(segment["confidence"] / segment["windows"], 4)
+    return segments
+
+
+def transcription_hop_frames(hop_s: float, mel_spectrogram_params: Dict[str, Any]) -> int:
+    """
+    Return the window hop in Mel frames closest to `hop_s` seconds (at least 1).
+    """
+    hop_samples = hop_s * mel_spectrogram_params["sample_rate"]
+    return max(1, int(round(hop_samples / mel_spectrogram_params["hop_length"])))
+
+
+def transcription_window_count(
+    n_samples: int,
+    window_samples: int,
+    hop_frames: int,
+    mel_spectrogram_params: Dict[str, Any],
+) -> int:
+    """
+    Return the number of windows a recording of `n_samples` samples is cut into.
+    """
+    n_frames = 1 + max(n_samples, window_samples) // mel_spectrogram_params["hop_length"]
+    window_frames = window_frame_count(window_samples, mel_spectrogram_params)
+    return 1 + (n_frames - window_frames) // hop_frames
+
+
+def transcribe(
+    signal: np.ndarray,
+    classify: Callable[[torch.Tensor], torch.Tensor],
+    labels: Sequence[str],
+    mel_spectrogram_params: Dict[str, Any],
+    window_samples: int,
+    hop_s: float = 0.05,
+    batch_size: int = 32,
+    min_confidence: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Label a long recording window by window with a CNN over Mel Spectrograms.
+
+    Parameters
+    ----------
+    signal : np.ndarray
+        The recording, 1-D, at the sample rate of `mel_spectrogram_params`.
+    classify : Callable[[torch.Tensor], torch.Tensor]
+        Maps a batch of windows, shape (batch_size, 1, n_mels, window_frames), to logits.
+    labels : Sequence[str]
+        Name of every class index.
+    mel_spectrogram_params : Dict[str, Any]
+        Keyword arguments of the `T.MelSpectrogram` the model was trained with.
+    window_samples : int
+        Length of the model's analysis window. Shorter recordings are zero-padded,
+        and notes are clipped to the recording's own duration.
+    hop_s : float
+        Time between the starts of consecutive windows, rounded to whole Mel frames.
+    batch_size : int
+        Windows classified together.
+    min_confidence : float
+        Windows classified with a lower softmax probability are left out.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The segments, with start and end times in seconds, their label, and mean
+        confidence, plus the number of windows, the effective hop and window
+        lengths, and the duration of the recording.
+    """
+    sample_rate: int = mel_spectrogram_params["sample_rate"]
+    signal = np.asarray(signal, dtype=np.float32)
+    duration_s = len(signal) / sample_rate
+    if len(signal) < window_samples:
+        signal = np.pad(signal, (0, window_samples - len(signal)))
+
+    hop_frames = transcription_hop_frames(hop_s, mel_spectrogram_params)
+    hop_s = hop_frames * mel_spectrogram_params["hop_length"] / sample_rate
+    window_s = window_samples / sample_rate
+
+    mel_frames = compute_mel_spectrogram_frames(signal, mel_spectrogram_params)
+    windows = sliding_mel_windows(
+        mel_frames, window_frame_count(window_samples, mel_spectrogram_params), hop_frames
+    )
+    predictions, confidences = classify_windows(classify, windows, batch_size)
+
+    return {
+        "notes": merge_segments(predictions, confidences, labels, window_s, hop_s, min_confidence, duration_s),
+        "n_windows": len(windows),
+        "hop_s": round(hop_s, 6),
+        "window_s": round(window_s, 6),
+        "duration_s": round(duration_s, 4),
+    }